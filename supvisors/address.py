@@ -17,6 +17,8 @@
 # limitations under the License.
 # ======================================================================
 
+import json
+
 from supervisor.xmlrpc import capped_int
 
 from supvisors.ttypes import AddressStates, InvalidTransition
@@ -30,7 +32,8 @@ class AddressStatus(object):
     - state: the state of the Supervisor instance in AddressStates,
     - remote_time: the last date received from the Supvisors instance,
     - local_time: the last date received from the Supvisors instance, in the local reference time,
-    - processes: the list of processes that are available on this address. """
+    - processes: the list of processes that are available on this address,
+    - version: a counter incremented each time the state or the published loading changes. """
 
     def __init__(self, address_name, logger):
         """ Initialization of the attributes. """
@@ -42,6 +45,12 @@ class AddressStatus(object):
         self.remote_time = 0
         self.local_time = 0
         self.processes = {}
+        self.version = 0
+        # loading as of the last refresh, used for publication
+        self._loading = 0
+        # JSON template of the serial form, valid for the version stored along
+        self._encoded = None
+        self._encoded_version = None
 
     # accessors / mutators
     @property
@@ -54,6 +63,7 @@ class AddressStatus(object):
         if self._state != newState:
             if self.check_transition(newState):
                 self._state = newState
+                self.version += 1
                 self.logger.info('Address {} is {}'.format(self.address_name, self.state_string()))
             else:
                 raise InvalidTransition('Address: transition rejected {} to {}'.format(self.state_string(), AddressStates._to_string(newState)))
@@ -65,6 +75,16 @@ class AddressStatus(object):
             'remote_time': capped_int(self.remote_time), 'local_time': capped_int(self.local_time),
             'loading': self.loading() }
 
+    def encoded(self):
+        """ Return the serial form of the AddressStatus encoded in JSON, using the loading of the last refresh.
+        The encoding is cached as long as the version is unchanged, so that only the times are formatted. """
+        if self._encoded_version != self.version:
+            encoded = json.dumps({'address_name': self.address_name, 'statecode': self.state,
+                'statename': self.state_string(), 'loading': self._loading})
+            self._encoded = encoded[:-1].replace('%', '%%') + ', "remote_time": %d, "local_time": %d}'
+            self._encoded_version = self.version
+        return self._encoded % (capped_int(self.remote_time), capped_int(self.local_time))
+
     # methods
     def state_string(self):
         """ Return the application state as a string. """
@@ -107,6 +127,14 @@ class AddressStatus(object):
         self.logger.debug('address={} loading={}'.format(self.address_name, loading))
         return loading
 
+    def refresh_loading(self):
+        """ Update the loading used for publication and increment the version if it has changed.
+        To be called when the state of a process running on this address may have changed. """
+        loading = self.loading()
+        if loading != self._loading:
+            self._loading = loading
+            self.version += 1
+
     # dictionary for transitions
     _Transitions = {
         AddressStates.UNKNOWN: (AddressStates.CHECKING, AddressStates.ISOLATING, AddressStates.SILENT),
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from collections import namedtuple
+
+import zmq
+
+from supvisors.supvisorszmq import EventSubscriber
+from supvisors.utils import EventHeaders
+
+
+# typed events, with the fields of the serial forms published by Supvisors
+SupvisorsStatusEvent = namedtuple('SupvisorsStatusEvent', 'statecode statename')
+AddressStatusEvent = namedtuple('AddressStatusEvent',
+    'address_name statecode statename remote_time local_time loading')
+ApplicationStatusEvent = namedtuple('ApplicationStatusEvent',
+    'application_name statecode statename major_failure minor_failure')
+ProcessStatusEvent = namedtuple('ProcessStatusEvent',
+    'application_name process_name statecode statename expected_exit last_event_time addresses')
+HeartbeatEvent = namedtuple('HeartbeatEvent', 'address_name remote_time local_time')
+
+_EVENT_TYPES = {EventHeaders.SUPVISORS: SupvisorsStatusEvent,
+    EventHeaders.ADDRESS: AddressStatusEvent,
+    EventHeaders.APPLICATION: ApplicationStatusEvent,
+    EventHeaders.PROCESS: ProcessStatusEvent,
+    EventHeaders.HEARTBEAT: HeartbeatEvent}
+
+
+def make_event(header, data):
+    """ Return the typed event corresponding to the header and the data received.
+    The fields missing in the data are set to None. None is returned for an unknown header. """
+    event_type = _EVENT_TYPES.get(header)
+    if event_type:
+        return event_type(*[data.get(field) for field in event_type._fields])
+
+
+class SupvisorsEventStream(object):
+    """ The SupvisorsEventStream receives the events published by **Supvisors** without any thread.
+
+    The SupvisorsEventStream requires:
+
+        - a ZeroMQ context,
+        - the event port number used by **Supvisors** to publish its events,
+        - a logger reference to log traces,
+        - optionally, the snapshot port number used by **Supvisors** to provide its current state,
+        - optionally, the compact flag, to receive the events in the compact format, e.g. over a slow link.
+          The event port number is then the one used by **Supvisors** to publish the compact events.
+
+    The events can be got:
+
+        - by iterating the instance, which blocks until the next typed event,
+        - by calling ``receive`` from any event loop, when the file descriptor returned by ``fileno``
+          is readable.
+
+    When the snapshot port is set, the current state is provided before the first event and after any
+    subscription change. Whenever a gap is detected in the sequence numbers of the events received,
+    the missed events are requested again to **Supvisors**, and the current state is provided if they are
+    not available anymore.
+    If **Supvisors** does not provide the current state after a few attempts, the events are passed through
+    without it, until the next gap or subscription change.
+
+    Attributes:
+
+        - logger: the reference to the logger,
+        - subscriber: the wrapper of the ZeroMQ socket connected to **Supvisors**,
+        - sequences: the sequence number of the last event received per header,
+          None when a snapshot is expected,
+        - snapshot_failures: the number of consecutive snapshot requests without reply.
+
+    Constants:
+
+        - _Poll_timeout: duration used to time out the ZeroMQ poller while iterating, set to 1000 milli-seconds,
+        - _Snapshot_attempts: the number of snapshot requests without reply before the events are passed through.
+    """
+
+    _Poll_timeout = 1000
+    _Snapshot_attempts = 3
+
+    def __init__(self, zmq_context, event_port, logger, snapshot_port=None, compact=False):
+        """ Initialization of the attributes. """
+        self.logger = logger
+        self.subscriber = EventSubscriber(zmq_context, event_port, logger, snapshot_port, compact)
+        self.sequences = None
+        self.snapshot_failures = 0
+
+    def close(self):
+        """ Close the ZeroMQ sockets. """
+        self.subscriber.close()
+
+    # subscription part
+    def subscribe(self, code):
+        """ Subscription to the events whose header starts with code.
+        The current state of these events is provided again if a snapshot port is set. """
+        self.subscriber.subscribe(code)
+        if self.subscriber.snapshot_socket:
+            self.sequences = None
+
+    def unsubscribe(self, code):
+        """ Remove subscription to the events whose header starts with code. """
+        self.subscriber.unsubscribe(code)
+
+    # reception part
+    def fileno(self):
+        """ Return the file descriptor to be watched for reading in an event loop.
+        WARN: the notification is edge-triggered, so receive must be called until it returns an empty list. """
+        return self.subscriber.socket.getsockopt(zmq.FD)
+
+    def receive(self, timeout=0):
+        """ Return the list of headers and data received, waiting until timeout (in milli-seconds)
+        for the first event if none is ready.
+        The events already included in a snapshot are discarded. """
+        events = []
+        # subscription is done before the snapshot so that no event is missed in between
+        if self.sequences is None:
+            self.synchronize(events)
+        if self.subscriber.pending or self.subscriber.socket.poll(timeout):
+            while self.subscriber.ready():
+                try:
+                    header, sequence, data = self.subscriber.receive()
+                except Exception, e:
+                    self.logger.error('failed to get data from subscriber: {}'.format(e.message))
+                else:
+                    if self.check_sequence(header, sequence, events):
+                        events.append((header, data))
+        return events
+
+    def __iter__(self):
+        """ Yield the typed events until the stream is closed. """
+        while not self.subscriber.socket.closed:
+            for header, data in self.receive(self._Poll_timeout):
+                event = make_event(header, data)
+                if event:
+                    yield event
+
+    def synchronize(self, events):
+        """ Add the current state got from **Supvisors** to the events and reset the sequence numbers.
+        Without snapshot port, or if no snapshot has been received after _Snapshot_attempts requests,
+        the sequence numbers are just reset. """
+        if not self.subscriber.snapshot_socket:
+            self.sequences = {}
+            return
+        snapshot = self.subscriber.snapshot(self._Poll_timeout)
+        if snapshot:
+            sequences, entries = snapshot
+            events.extend((header, data) for header, data in entries if self.subscriber.subscribed(header))
+            self.sequences = sequences
+            self.snapshot_failures = 0
+        else:
+            self.snapshot_failures += 1
+            if self.snapshot_failures >= self._Snapshot_attempts:
+                self.logger.error('no snapshot received after {} attempts: events passed through without current state'
+                    .format(self.snapshot_failures))
+                self.sequences = {}
+                self.snapshot_failures = 0
+
+    def check_sequence(self, header, sequence, events):
+        """ Return True if the event is to be notified, considering its sequence number.
+        The events already included in the last snapshot are discarded.
+        A gap in the sequence numbers triggers a replay of the missed events, which are added to events,
+        or a new snapshot if the replay is not possible.
+        The heartbeats are not replayed, so a gap in their sequence numbers is ignored. """
+        if self.sequences is None:
+            # waiting for a snapshot. the event will be included
+            return False
+        last_sequence = self.sequences.get(header)
+        if last_sequence is not None:
+            if sequence <= last_sequence:
+                return False
+            if sequence > last_sequence + 1 and header != EventHeaders.HEARTBEAT:
+                self.logger.warn('missed {} events {} to {}'.format(header, last_sequence + 1, sequence - 1))
+                if self.subscriber.snapshot_socket:
+                    replayed = self.subscriber.replay({header: last_sequence}, self._Poll_timeout)
+                    if replayed is None:
+                        self.sequences = None
+                        return False
+                    # the events published after this one are still to be received from the subscriber
+                    events.extend((header, data) for _, replayed_sequence, data in replayed
+                        if replayed_sequence < sequence)
+        self.sequences[header] = sequence
+        return True
@@ -201,6 +201,8 @@ public class SupvisorsEventSubscriber implements Runnable {
             if (poller.pollin(0)) {
                 // get the data
                 String header = this.subscriber.recvStr();
+                // the sequence number is not used yet
+                String sequence = this.subscriber.recvStr();
                 String body = this.subscriber.recvStr();
 
                 // notify subscribers if any
@@ -0,0 +1,150 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from supervisor.options import make_namespec
+
+from supvisors.client.eventstream import (SupvisorsStatusEvent, AddressStatusEvent, ApplicationStatusEvent,
+    ProcessStatusEvent, HeartbeatEvent)
+
+
+class SupvisorsReplica(object):
+    """ The SupvisorsReplica maintains a local view of the **Supvisors** state from the typed events
+    provided by a SupvisorsEventStream.
+
+    The processes are indexed by state, by address and by application, so that the queries
+    do not need to scan all the processes. The listeners are notified of every change.
+
+    Attributes:
+
+        - supvisors: the last SupvisorsStatusEvent received,
+        - addresses: the last AddressStatusEvent received per address name,
+        - applications: the last ApplicationStatusEvent received per application name,
+        - processes: the last ProcessStatusEvent received per namespec,
+        - addresses_by_state: the address names per state code,
+        - applications_by_state: the application names per state code,
+        - processes_by_state: the process namespecs per state code,
+        - processes_by_address: the process namespecs per address where they are running,
+        - processes_by_application: the process namespecs per application name,
+        - listeners: the functions called on every change, with the previous event (or None) and the new event.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.supvisors = None
+        self.addresses = {}
+        self.applications = {}
+        self.processes = {}
+        self.addresses_by_state = {}
+        self.applications_by_state = {}
+        self.processes_by_state = {}
+        self.processes_by_address = {}
+        self.processes_by_application = {}
+        self.listeners = []
+
+    # listeners
+    def add_listener(self, listener):
+        """ Add a function to be called on every change. """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """ Remove a function previously added. """
+        self.listeners.remove(listener)
+
+    # feeding part
+    def follow(self, stream):
+        """ Apply the events of the stream until it is closed. """
+        for event in stream:
+            self.apply(event)
+
+    def apply(self, event):
+        """ Update the replica with a typed event and notify the listeners if something has changed. """
+        if isinstance(event, ProcessStatusEvent):
+            previous = self.update_process(event)
+        elif isinstance(event, ApplicationStatusEvent):
+            previous = self.update_entity(self.applications, self.applications_by_state, event.application_name, event)
+        elif isinstance(event, AddressStatusEvent):
+            previous = self.update_entity(self.addresses, self.addresses_by_state, event.address_name, event)
+        elif isinstance(event, HeartbeatEvent):
+            previous = self.addresses.get(event.address_name)
+            if not previous:
+                return
+            event = previous._replace(remote_time=event.remote_time, local_time=event.local_time)
+            self.addresses[event.address_name] = event
+        elif isinstance(event, SupvisorsStatusEvent):
+            previous, self.supvisors = self.supvisors, event
+        else:
+            return
+        if previous != event:
+            for listener in self.listeners:
+                listener(previous, event)
+
+    @staticmethod
+    def update_entity(entities, by_state, name, event):
+        """ Store the event of an entity and update the state index. Return the previous event. """
+        previous = entities.get(name)
+        entities[name] = event
+        if previous:
+            if previous.statecode == event.statecode:
+                return previous
+            by_state[previous.statecode].discard(name)
+        by_state.setdefault(event.statecode, set()).add(name)
+        return previous
+
+    def update_process(self, event):
+        """ Store the event of a process and update the process indexes. Return the previous event. """
+        namespec = make_namespec(event.application_name, event.process_name)
+        previous = self.update_entity(self.processes, self.processes_by_state, namespec, event)
+        if not previous:
+            self.processes_by_application.setdefault(event.application_name, set()).add(namespec)
+        old_addresses = set(previous.addresses or []) if previous else set()
+        new_addresses = set(event.addresses or [])
+        for address_name in old_addresses - new_addresses:
+            self.processes_by_address[address_name].discard(namespec)
+        for address_name in new_addresses - old_addresses:
+            self.processes_by_address.setdefault(address_name, set()).add(namespec)
+        return previous
+
+    # query part
+    def address_names(self, state):
+        """ Return the names of the addresses in the state. """
+        return list(self.addresses_by_state.get(state, ()))
+
+    def application_names(self, state):
+        """ Return the names of the applications in the state. """
+        return list(self.applications_by_state.get(state, ()))
+
+    def namespecs(self, state=None, address_name=None, application_name=None):
+        """ Return the namespecs of the processes matching all the criteria set.
+        The processes with no address are not selected when address_name is set. """
+        selections = []
+        if state is not None:
+            selections.append(self.processes_by_state.get(state, set()))
+        if address_name is not None:
+            selections.append(self.processes_by_address.get(address_name, set()))
+        if application_name is not None:
+            selections.append(self.processes_by_application.get(application_name, set()))
+        if not selections:
+            return self.processes.keys()
+        # start from the smallest selection
+        selections.sort(key=len)
+        return list(selections[0].intersection(*selections[1:]))
+
+    def select_processes(self, state=None, address_name=None, application_name=None):
+        """ Return the ProcessStatusEvent of the processes matching all the criteria set. """
+        return [self.processes[namespec] for namespec in self.namespecs(state, address_name, application_name)]
@@ -18,11 +18,11 @@
 # ======================================================================
 
 import threading
-import zmq
 
 from supervisor.loggers import LevelsByName, getLogger
 
-from supvisors.supvisorszmq import EventSubscriber, create_zmq_context
+from supvisors.client.eventstream import SupvisorsEventStream
+from supvisors.supvisorszmq import create_zmq_context
 from supvisors.utils import EventHeaders
 
 
@@ -42,10 +42,16 @@ class SupvisorsEventInterface(threading.Thread):
 
         - a ZeroMQ context,
         - the event port number used by **Supvisors** to publish its events,
-        - a logger reference to log traces.
+        - a logger reference to log traces,
+        - optionally, the snapshot port number used by **Supvisors** to provide its current state,
+        - optionally, the compact flag, to receive the events in the compact format.
 
     This event port number MUST correspond to the ``event_port`` value set in the ``[supvisors]``
-    section of the Supervisor configuration file.
+    section of the Supervisor configuration file, or to the ``compact_event_port`` value when the compact flag
+    is set. The same applies to the snapshot port number and the ``snapshot_port`` value.
+
+    When the snapshot port is set, the current state is notified before the first event and again
+    whenever a gap is detected in the sequence numbers of the events received.
 
     The default behaviour is to print the messages received.
     For any other behaviour, just specialize the methods `on_xxx_status`.
@@ -53,6 +59,7 @@ class SupvisorsEventInterface(threading.Thread):
     Attributes:
 
         - logger: the reference to the logger,
+        - stream: the non-threaded reception of the events,
         - subscriber: the wrapper of the ZeroMQ socket connected to **Supvisors**,
         - loop: when set to False, breaks the infinite loop of the thread.
     
@@ -63,14 +70,15 @@ class SupvisorsEventInterface(threading.Thread):
 
     _Poll_timeout = 1000
 
-    def __init__(self, zmq_context, event_port, logger):
+    def __init__(self, zmq_context, event_port, logger, snapshot_port=None, compact=False):
         """ Initialization of the attributes. """
         # thread attributes
         threading.Thread.__init__(self)
         # keep a reference to the logger
         self.logger = logger
-        # create event socket
-        self.subscriber = EventSubscriber(zmq_context, event_port, logger)
+        # create event stream
+        self.stream = SupvisorsEventStream(zmq_context, event_port, logger, snapshot_port, compact)
+        self.subscriber = self.stream.subscriber
 
     def stop(self):
         """ This method stops the main loop of the thread. """
@@ -79,32 +87,27 @@ class SupvisorsEventInterface(threading.Thread):
 
     def run(self):
         """ Main loop of the thread. """
-        # create poller and register event subscriber
-        poller = zmq.Poller()
-        poller.register(self.subscriber.socket, zmq.POLLIN) 
         # poll events every seconds
         self.loop = True
         self.logger.info('entering main loop')
         while self.loop:
-            socks = dict(poller.poll(self._Poll_timeout))
-            # check if something happened on the socket
-            if self.subscriber.socket in socks and socks[self.subscriber.socket] == zmq.POLLIN:
-                self.logger.debug('got message on subscriber')
-                try:
-                    message = self.subscriber.receive()
-                except Exception, e:
-                    self.logger.error('failed to get data from subscriber: {}'.format(e.message))
-                else:
-                    if message[0] == EventHeaders.SUPVISORS:
-                        self.on_supvisors_status(message[1])
-                    elif message[0] == EventHeaders.ADDRESS:
-                        self.on_address_status(message[1])
-                    elif message[0] == EventHeaders.APPLICATION:
-                        self.on_application_status(message[1])
-                    elif message[0] == EventHeaders.PROCESS:
-                        self.on_process_status(message[1])
+            for header, data in self.stream.receive(self._Poll_timeout):
+                self.dispatch(header, data)
         self.logger.warn('exiting main loop')
-        self.subscriber.close()
+        self.stream.close()
+
+    def dispatch(self, header, data):
+        """ Call the method corresponding to the header of the event. """
+        if header == EventHeaders.SUPVISORS:
+            self.on_supvisors_status(data)
+        elif header == EventHeaders.ADDRESS:
+            self.on_address_status(data)
+        elif header == EventHeaders.APPLICATION:
+            self.on_application_status(data)
+        elif header == EventHeaders.PROCESS:
+            self.on_process_status(data)
+        elif header == EventHeaders.HEARTBEAT:
+            self.on_heartbeat(data)
 
     def on_supvisors_status(self, data):
         """ Just logs the contents of the SupvisorsStatus message. """
@@ -122,17 +125,25 @@ class SupvisorsEventInterface(threading.Thread):
         """ Just logs the contents of the ProcessStatus message. """
         self.logger.info('got ApplicationStatus message: {}'.format(data))
 
+    def on_heartbeat(self, data):
+        """ Just logs the contents of the Heartbeat message. """
+        self.logger.info('got Heartbeat message: {}'.format(data))
+
 
 if __name__ == '__main__':
     # get arguments
     import argparse, time
     parser = argparse.ArgumentParser(description='Start a subscriber to Supvisors events.')
     parser.add_argument('-p', '--port', type=int, default=60002, help="the event port of Supvisors")
+    parser.add_argument('-n', '--snapshot-port', type=int, help="the snapshot port of Supvisors")
+    parser.add_argument('-c', '--compact', action='store_true',
+        help="receive the events in the compact format (the port is then the compact event port)")
     parser.add_argument('-s', '--sleep', type=int, metavar='SEC', default=10,
         help="the duration of the subscription")
     args = parser.parse_args()
     # create test subscriber
-    loop = SupvisorsEventInterface(create_zmq_context(), args.port, create_logger())
+    loop = SupvisorsEventInterface(create_zmq_context(), args.port, create_logger(), args.snapshot_port,
+        args.compact)
     loop.subscriber.subscribe_all()
     # start thread and sleep for a while
     loop.start()
@@ -0,0 +1,296 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import json
+import struct
+import zlib
+
+from supvisors.ttypes import AddressStates, ApplicationStates, ProcessStates, SupvisorsStates
+from supvisors.utils import EventHeaders, InternalEventHeaders, StatisticsFrames
+
+
+# Binary codec of the messages exchanged on the internal event bus.
+# A message is a multi-part ZeroMQ message made of:
+#     - a topic frame packing the codec version and the event type, followed by the origin address,
+#       encoded in UTF-8 and terminated by a null character,
+#     - the body, whose layout depends on the event type.
+# The topic frame is designed for ZeroMQ prefix filtering: the subscribers may select an event type,
+# or an event type from a given origin.
+# All numeric values are packed in network byte order.
+# Strings are packed as an unsigned short length followed by the UTF-8 bytes.
+
+# version of the wire format. to be incremented on any change in the layouts below
+CODEC_VERSION = 4
+
+# precompiled layouts
+_HEADER = struct.Struct('!BB')
+_STRING_LENGTH = struct.Struct('!H')
+_COUNT = struct.Struct('!I')
+_TICK = struct.Struct('!Q')
+_PROCESS = struct.Struct('!iqi?')
+_STATISTICS_FRAME = struct.Struct('!BI')
+_STATISTICS = struct.Struct('!ddI')
+_CPU = struct.Struct('!dd')
+_IO = struct.Struct('!QQ')
+_PROC = struct.Struct('!idd')
+
+
+class CodecError(ValueError):
+    """ Exception raised when a message cannot be decoded. """
+
+
+# string helpers
+def _pack_string(value):
+    """ Pack a string as a length-prefixed UTF-8 sequence. """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return _STRING_LENGTH.pack(len(value)) + value
+
+def _unpack_string(buffer, offset):
+    """ Unpack a length-prefixed UTF-8 sequence.
+    Return the unicode string and the offset of the next field. """
+    length, = _STRING_LENGTH.unpack_from(buffer, offset)
+    offset += _STRING_LENGTH.size
+    end = offset + length
+    return buffer[offset:end].decode('utf-8'), end
+
+
+# TICK body
+def encode_tick(payload):
+    """ Pack the tick payload. """
+    return _TICK.pack(payload['when'])
+
+def decode_tick(body):
+    """ Unpack the tick payload. """
+    when, = _TICK.unpack(body)
+    return {'when': when}
+
+
+# PROCESS body
+def encode_process(payload):
+    """ Pack the process payload. """
+    return ''.join([_PROCESS.pack(payload['state'], payload['now'], payload['pid'], payload['expected']),
+        _pack_string(payload['groupname']), _pack_string(payload['processname'])])
+
+def decode_process(body):
+    """ Unpack the process payload. """
+    state, now, pid, expected = _PROCESS.unpack_from(body)
+    group_name, offset = _unpack_string(body, _PROCESS.size)
+    process_name, offset = _unpack_string(body, offset)
+    return {'processname': process_name, 'groupname': group_name, 'state': state,
+        'now': now, 'pid': pid, 'expected': expected}
+
+
+# STATISTICS body
+def _pack_strings(values):
+    """ Pack a list of strings. """
+    return _COUNT.pack(len(values)) + ''.join(_pack_string(value) for value in values)
+
+def _unpack_strings(buffer, offset):
+    """ Unpack a list of strings.
+    Return the list of unicode strings and the offset of the next field. """
+    count, = _COUNT.unpack_from(buffer, offset)
+    offset += _COUNT.size
+    values = []
+    for _ in range(count):
+        value, offset = _unpack_string(buffer, offset)
+        values.append(value)
+    return values, offset
+
+def _pack_snapshot(date, cpu_stats, mem_stats, io_stats, proc_stats):
+    """ Pack the measures of a statistics snapshot. """
+    parts = [_STATISTICS.pack(date, mem_stats, len(cpu_stats))]
+    parts.extend(_CPU.pack(work, idle) for work, idle in cpu_stats)
+    parts.append(_COUNT.pack(len(io_stats)))
+    for intf, (recv_bytes, sent_bytes) in io_stats.items():
+        parts.append(_pack_string(intf))
+        parts.append(_IO.pack(recv_bytes, sent_bytes))
+    parts.append(_COUNT.pack(len(proc_stats)))
+    for process_name, (pid, (work, memory)) in proc_stats.items():
+        parts.append(_pack_string(process_name))
+        parts.append(_PROC.pack(pid, work, memory))
+    return ''.join(parts)
+
+def _unpack_snapshot(body, offset):
+    """ Unpack the measures of a statistics snapshot.
+    Return the measures and the offset of the next field. """
+    date, mem_stats, nb_cpu = _STATISTICS.unpack_from(body, offset)
+    offset += _STATISTICS.size
+    cpu_stats = []
+    for _ in range(nb_cpu):
+        cpu_stats.append(_CPU.unpack_from(body, offset))
+        offset += _CPU.size
+    nb_intf, = _COUNT.unpack_from(body, offset)
+    offset += _COUNT.size
+    io_stats = {}
+    for _ in range(nb_intf):
+        intf, offset = _unpack_string(body, offset)
+        io_stats[intf] = _IO.unpack_from(body, offset)
+        offset += _IO.size
+    nb_proc, = _COUNT.unpack_from(body, offset)
+    offset += _COUNT.size
+    proc_stats = {}
+    for _ in range(nb_proc):
+        process_name, offset = _unpack_string(body, offset)
+        pid, work, memory = _PROC.unpack_from(body, offset)
+        proc_stats[process_name] = pid, (work, memory)
+        offset += _PROC.size
+    return (date, cpu_stats, mem_stats, io_stats, proc_stats), offset
+
+def encode_statistics(payload):
+    """ Pack the statistics payload, as returned by StatisticsEncoder.encode.
+    A keyframe body is a full snapshot, as returned by statistics.instant_statistics.
+    A delta body is a partial snapshot followed by the lists of removed interfaces and processes. """
+    frame, sequence, body = payload
+    parts = [_STATISTICS_FRAME.pack(frame, sequence), _pack_snapshot(*body[:5])]
+    if frame == StatisticsFrames.DELTA:
+        parts.append(_pack_strings(body[5]))
+        parts.append(_pack_strings(body[6]))
+    return ''.join(parts)
+
+def decode_statistics(body):
+    """ Unpack the statistics payload. """
+    frame, sequence = _STATISTICS_FRAME.unpack_from(body)
+    snapshot, offset = _unpack_snapshot(body, _STATISTICS_FRAME.size)
+    if frame == StatisticsFrames.KEYFRAME:
+        return frame, sequence, snapshot
+    if frame == StatisticsFrames.DELTA:
+        io_removed, offset = _unpack_strings(body, offset)
+        proc_removed, offset = _unpack_strings(body, offset)
+        return frame, sequence, snapshot + (io_removed, proc_removed)
+    raise CodecError('unknown statistics frame: {}'.format(frame))
+
+
+# schema: body codec per event type
+_BODY_CODECS = {InternalEventHeaders.TICK: (encode_tick, decode_tick),
+    InternalEventHeaders.PROCESS: (encode_process, decode_process),
+    InternalEventHeaders.STATISTICS: (encode_statistics, decode_statistics)}
+
+
+# message level
+def encode_topic(event_type, origin=None):
+    """ Return the topic of the event.
+    If origin is not set, the result is the prefix of the topics for this event type, whatever the origin. """
+    header = _HEADER.pack(CODEC_VERSION, event_type)
+    if origin is None:
+        return header
+    return header + origin.encode('utf-8') + '\0'
+
+def encode_event(event_type, origin, payload):
+    """ Return the list of frames corresponding to the event. """
+    encoder, _ = _BODY_CODECS[event_type]
+    return [encode_topic(event_type, origin), encoder(payload)]
+
+def peek_statistics(frames):
+    """ Return the origin, the frame type and the keyframe sequence of a statistics message, without decoding its body.
+    A CodecError is raised if the message is not a statistics message compliant with the current codec version. """
+    try:
+        topic, body = frames
+        version, event_type = _HEADER.unpack_from(topic)
+        frame, sequence = _STATISTICS_FRAME.unpack_from(body)
+    except (ValueError, struct.error):
+        raise CodecError('unexpected statistics message layout')
+    if version != CODEC_VERSION or event_type != InternalEventHeaders.STATISTICS or not topic.endswith('\0'):
+        raise CodecError('unexpected statistics message topic')
+    return topic[_HEADER.size:-1], frame, sequence
+
+def decode_event(frames):
+    """ Return the event type, the origin and the payload from the list of frames.
+    A CodecError is raised if the message is not compliant with the current codec version. """
+    try:
+        topic, body = frames
+        version, event_type = _HEADER.unpack_from(topic)
+    except (ValueError, struct.error):
+        raise CodecError('unexpected internal message layout')
+    if version != CODEC_VERSION:
+        raise CodecError('unsupported codec version: {} (expected {})'.format(version, CODEC_VERSION))
+    if not topic.endswith('\0'):
+        raise CodecError('unterminated internal message topic')
+    origin = topic[_HEADER.size:-1]
+    try:
+        _, decoder = _BODY_CODECS[event_type]
+    except KeyError:
+        raise CodecError('unknown internal event type: {}'.format(event_type))
+    try:
+        return event_type, origin.decode('utf-8'), decoder(body)
+    except (struct.error, UnicodeDecodeError), e:
+        raise CodecError('corrupted internal message: {}'.format(e))
+
+
+# Compact codec of the events published to the external clients.
+# A compact message is a three-parts ZeroMQ message made of:
+#     - the header of the events, prefixed with COMPACT_PREFIX,
+#     - the sequence number of the first event,
+#     - a flag telling if the body is compressed, followed by the body.
+# The body is the list of events having consecutive sequence numbers, encoded in JSON.
+# Every event is encoded as the list of its values, so that the field id of a value is its position in the schema
+# of the header. The state names are not sent as they are deduced from the state codes.
+
+COMPACT_PREFIX = u'~'
+
+# flags of the body
+COMPACT_PLAIN = 'j'
+COMPACT_ZLIB = 'z'
+
+# the bodies shorter than this size in bytes are not compressed
+COMPACT_COMPRESSION_THRESHOLD = 512
+
+# schema: field names and state enumeration per header
+_COMPACT_SCHEMAS = {EventHeaders.SUPVISORS: (('statecode', ), SupvisorsStates),
+    EventHeaders.ADDRESS: (('address_name', 'statecode', 'remote_time', 'local_time', 'loading'), AddressStates),
+    EventHeaders.APPLICATION: (('application_name', 'statecode', 'major_failure', 'minor_failure'),
+        ApplicationStates),
+    EventHeaders.PROCESS: (('application_name', 'process_name', 'statecode', 'expected_exit', 'last_event_time',
+        'addresses'), ProcessStates),
+    EventHeaders.HEARTBEAT: (('address_name', 'remote_time', 'local_time'), None)}
+
+
+def encode_compact_event(header, serial):
+    """ Return the list of values of the event, as defined in the schema of the header. """
+    fields, _ = _COMPACT_SCHEMAS[header]
+    return [serial[field] for field in fields]
+
+def decode_compact_event(header, values):
+    """ Return the serial form of the event from its list of values, including the state name. """
+    fields, states = _COMPACT_SCHEMAS[header]
+    serial = dict(zip(fields, values))
+    if states:
+        serial['statename'] = states._to_string(serial['statecode'])
+    return serial
+
+def encode_compact_body(events, compression=True):
+    """ Return the body of a compact message, compressed if requested and worthwhile. """
+    body = json.dumps(events, separators=(',', ':'))
+    if compression and len(body) >= COMPACT_COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(body)
+        if len(compressed) < len(body):
+            return COMPACT_ZLIB + compressed
+    return COMPACT_PLAIN + body
+
+def decode_compact_body(body):
+    """ Return the list of events from the body of a compact message.
+    A CodecError is raised if the body cannot be decoded. """
+    try:
+        if body[:1] == COMPACT_ZLIB:
+            return json.loads(zlib.decompress(body[1:]))
+        if body[:1] == COMPACT_PLAIN:
+            return json.loads(body[1:])
+    except (ValueError, zlib.error), e:
+        raise CodecError('corrupted compact message: {}'.format(e))
+    raise CodecError('unknown compact message flag: {}'.format(body[:1]))
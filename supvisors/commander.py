@@ -21,6 +21,7 @@ import time
 
 from supervisor.childutils import get_asctime
 from supervisor.states import ProcessStates
+from supervisor.xmlrpc import Faults
 
 from supvisors.strategy import get_address
 from supvisors.ttypes import DeploymentStrategies, StartingFailureStrategies
@@ -77,6 +78,11 @@ class Commander(object):
         """ Simple form of process_list, so that it can be printed. """
         return [process.namespec() for process in processes]
 
+    def find_current_job(self, namespec):
+        """ Return the process corresponding to namespec in the current jobs. """
+        return next((process for processes in self.current_jobs.values() for process in processes
+            if process.namespec() == namespec), None)
+
     def initial_jobs(self):
         """ Initializes the planning of the jobs (start or stop). """
         self.logger.debug('planned_sequence={}'.format(self.printable_planned_sequence()))
@@ -262,19 +268,22 @@ class Starter(Commander):
                     jobs.remove(process)
                     # decide to continue deployment or not
                     self.process_failure(process, 'unexpected crash')
-                # check if there are remaining jobs in progress for this application
-                if not jobs:
-                    # remove application entry from current_jobs
-                    del self.current_jobs[process.application_name]
-                    # trigger next job for aplication
-                    if process.application_name in self.planned_jobs:
-                        self.process_application_jobs(process.application_name)
-                    else:
-                        self.logger.info('starting completed for application {}'.format(process.application_name))
-                        # check if there are planned jobs
-                        if not self.planned_jobs:
-                            # trigger next sequence of applications
-                            self.initial_jobs()
+                self.check_application_jobs(process.application_name)
+
+    def check_application_jobs(self, application_name):
+        """ Trigger the next jobs of the application if there are no more jobs in progress for this application. """
+        if not self.current_jobs[application_name]:
+            # remove application entry from current_jobs
+            del self.current_jobs[application_name]
+            # trigger next job for aplication
+            if application_name in self.planned_jobs:
+                self.process_application_jobs(application_name)
+            else:
+                self.logger.info('starting completed for application {}'.format(application_name))
+                # check if there are planned jobs
+                if not self.planned_jobs:
+                    # trigger next sequence of applications
+                    self.initial_jobs()
 
     def store_application_start_sequence(self, application):
         """ Copy the start sequence and remove programs that are not meant to be
@@ -310,6 +319,19 @@ class Starter(Commander):
         if reset_flag:
             process.ignore_wait_exit = False
 
+    def on_request_failure(self, namespec, address, fault_code, fault_string):
+        """ Triggers the failure of a start request rejected by the Supervisor of address.
+        A process that is already started is not considered as a failure.
+        As no event is expected for the process, it is removed from the jobs and the start sequence goes on. """
+        if fault_code != Faults.ALREADY_STARTED:
+            process = self.find_current_job(namespec)
+            if process:
+                process.ignore_wait_exit = False
+                self.current_jobs[process.application_name].remove(process)
+                # decide to continue deployment or not
+                self.process_failure(process, 'start request failed on {}: {}'.format(address, fault_string))
+                self.check_application_jobs(process.application_name)
+
     def process_failure(self, process, reason, force_fatal=None):
         """ Updates the start sequencing when a process could not be started. """
         application_name = process.application_name
@@ -448,6 +470,12 @@ class Stopper(Commander):
                             # trigger next sequence of applications
                             self.initial_jobs()
 
+    def on_request_failure(self, namespec, address, fault_code, fault_string):
+        """ Triggers the failure of a stop request rejected by the Supervisor of address.
+        A process that is not running is not considered as a failure. """
+        if fault_code != Faults.NOT_RUNNING and self.find_current_job(namespec):
+            self.process_failure(namespec, 'stop request failed on {}: {}'.format(address, fault_string))
+
     def process_failure(self, namespec, reason):
         """ Updates the stop sequencing when a process could not be stopped. """
         # publish the process state as UNKNOWN to all Supvisors instances
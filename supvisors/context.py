@@ -32,7 +32,8 @@ class Context(object):
     - applications: the dictionary of all ApplicationStatus (key is application name),
     - processes: the dictionary of all ProcessStatus (key is process namespec),
     - master_address: the address of the Supvisors master,
-    - master: a boolean telling if the local address is the master address. """
+    - master: a boolean telling if the local address is the master address,
+    - dirty_applications: the names of the applications whose status is to be published. """
 
     def __init__(self, supvisors):
         """ Initialization of the attributes. """
@@ -46,6 +47,7 @@ class Context(object):
         self.processes = {}
         self._master_address = ''
         self.master = False
+        self.dirty_applications = set()
 
     @property
     def master_address(self):
@@ -92,8 +94,16 @@ class Context(object):
         else:
             status.state = AddressStates.SILENT
         # invalidate address in concerned processes
+        address_names = {status.address_name}
         for process in status.running_processes():
+            address_names.update(process.addresses)
             process.invalidate_address(status.address_name)
+        self.refresh_loadings(address_names)
+
+    def refresh_loadings(self, address_names):
+        """ Refresh the published loading of the addresses whose processes may have changed. """
+        for address_name in address_names:
+            self.addresses[address_name].refresh_loading()
 
     # methods on applications / processes
     def process_from_info(self, info):
@@ -139,6 +149,7 @@ class Context(object):
         # get AddressStatus corresponding to address
         status = self.addresses[address]
         # store processes into their application entry
+        address_names = {address}
         for info in all_info:
             try:
                 process = self.process_from_info(info)
@@ -150,9 +161,15 @@ class Context(object):
                 self.processes[process.namespec()] = process
                 self.applications[process.application_name].add_process(process)
             # update the current entry
+            address_names.update(process.addresses)
             process.add_info(address, info)
             # share the instance to the Supervisor instance that holds it
             status.add_process(process)
+            # publish ProcessStatus event so that it is part of the snapshots
+            # ApplicationStatus event is deferred to publish_applications
+            self.supvisors.zmq.publisher.send_process_status(process)
+            self.dirty_applications.add(process.application_name)
+        self.refresh_loadings(address_names)
 
     # methods on events
     def on_authorization(self, address_name, authorized):
@@ -207,17 +224,27 @@ class Context(object):
                     # process not found. normal when no tick yet received from this address
                     self.logger.debug('reject event {} from location={}'.format(event, address))
                 else:
+                    address_names = process.addresses | {address}
                     process.update_info(address, event)
+                    self.refresh_loadings(address_names)
                     # refresh application status
                     application = self.applications[process.application_name]
                     application.update_status()
-                    # publish ProcessStatus and ApplicationStatus events
+                    # publish ProcessStatus event
+                    # ApplicationStatus event is deferred to publish_applications
                     self.supvisors.zmq.publisher.send_process_status(process)
-                    self.supvisors.zmq.publisher.send_application_status(application)
+                    self.dirty_applications.add(application.application_name)
                     return process
         else:
             self.logger.error('got process event from unexpected location={}'.format(addresses))
 
+    def publish_applications(self):
+        """ Publish the ApplicationStatus events deferred since the last call.
+        This coalesces the process events of a batch into one publication per application. """
+        for application_name in self.dirty_applications:
+            self.supvisors.zmq.publisher.send_application_status(self.applications[application_name])
+        self.dirty_applications.clear()
+
     def on_timer_event(self):
         """ Check that all Supvisors instances are still publishing.
         Supvisors considers that there a Supvisors instance is not active if no tick received in last 10s. """
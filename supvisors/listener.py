@@ -17,17 +17,16 @@
 # limitations under the License.
 # ======================================================================
 
-import json
 import time
+import traceback
 
 from supervisor import events
-from supervisor.datatypes import boolean
 from supervisor.options import split_namespec
 
-from supvisors.mainloop import SupvisorsMainLoop
-from supvisors.statistics import instant_statistics
+from supvisors.mainloop import SupervisorEventQueue, SupvisorsMainLoop
+from supvisors.statistics import StatisticsCollector
 from supvisors.ttypes import ProcessStates
-from supvisors.utils import (supvisors_short_cuts, InternalEventHeaders, RemoteCommEvents)
+from supvisors.utils import (supvisors_short_cuts, DeferredRequestHeaders, InternalEventHeaders, RemoteCommEvents)
 from supvisors.supvisorszmq import SupvisorsZmq
 
 
@@ -39,6 +38,8 @@ class SupervisorListener(object):
         - supvisors: a reference to the Supvisors context,
         - address: the address name where this process is running,
         - main_loop: the Supvisors' event thread,
+        - event_queue: the queue used by the Supvisors' event thread to hand off the events to the Supervisor thread,
+        - collector: the thread sampling the local statistics, published as keyframes and deltas,
         - publisher: the ZeroMQ socket used to publish Supervisor events to all Supvisors threads.
     """
 
@@ -46,14 +47,13 @@ class SupervisorListener(object):
         """ Initialization of the attributes. """
         self.supvisors = supvisors
         # shortcuts for source code readability
-        supvisors_short_cuts(self, ['fsm', 'info_source', 'logger', 'statistician'])
+        supvisors_short_cuts(self, ['context', 'fsm', 'info_source', 'logger', 'statistician'])
         self.address = self.supvisors.address_mapper.local_address
         # subscribe to internal events
         events.subscribe(events.SupervisorRunningEvent, self.on_running)
         events.subscribe(events.SupervisorStoppingEvent, self.on_stopping)
         events.subscribe(events.ProcessStateEvent, self.on_process)
         events.subscribe(events.Tick5Event, self.on_tick)
-        events.subscribe(events.RemoteCommunicationEvent, self.on_remote_event)
 
     def on_running(self, event):
         """ Called when Supervisor is RUNNING.
@@ -65,9 +65,16 @@ class SupervisorListener(object):
         self.supvisors.zmq = SupvisorsZmq(self.supvisors)
         # keep a reference to the internal events publisher
         self.publisher = self.supvisors.zmq.internal_publisher
+        # create the in-process queue used by the main loop to wake up the Supervisor thread
+        self.event_queue = SupervisorEventQueue(self.logger, self.on_remote_event)
         # start the main loop
-        self.main_loop = SupvisorsMainLoop(self.supvisors)
+        self.main_loop = SupvisorsMainLoop(self.supvisors, self.event_queue)
         self.main_loop.start()
+        # start the statistics sampling, whose snapshots are handed off through the event queue
+        # statistics are published as deltas between keyframes
+        self.collector = StatisticsCollector(5, self.supvisors.options.stats_keyframe_period / 5,
+            lambda publication: self.event_queue.put(RemoteCommEvents.SUPVISORS_STATISTICS, publication))
+        self.collector.start()
 
     def on_stopping(self, event):
         """ Called when Supervisor is STOPPING.
@@ -77,8 +84,11 @@ class SupervisorListener(object):
         events.clear()
         # force Supervisor to close HTTP servers
         self.info_source.close_httpservers()
-        # stop and join the main loop
+        # stop and join the statistics sampling and the main loop
+        self.collector.stop()
         self.main_loop.stop()
+        # remove the event queue from the Supervisor socket map
+        self.event_queue.close()
         # close zmq sockets
         self.supvisors.zmq.close()
         # finally, close logger
@@ -102,30 +112,46 @@ class SupervisorListener(object):
     def on_tick(self, event):
         """ Called when a TickEvent is notified.
         The event is published to all Supvisors instances.
-        Statistics are also published. """
+        The processes to be sampled by the statistics collector are also updated. """
         self.logger.debug('got Tick event from supervisord: {}'.format(event))
         payload = {'when': event.when}
         self.publisher.send_tick_event(payload)
-        # get and publish statistics at tick time
         status = self.supvisors.context.addresses[self.address]
-        self.publisher.send_statistics(instant_statistics(status.pid_processes()))
+        self.collector.set_processes(status.pid_processes())
 
-    def on_remote_event(self, event):
-        """ Called when a RemoteCommunicationEvent is notified.
+    def on_remote_event(self, event_type, event_data):
+        """ Called when an event is handed off by the Supvisors thread through the event queue.
         This is used to sequence the events received from the Supvisors thread
         with the other events handled by the local Supervisor."""
-        if event.type == RemoteCommEvents.SUPVISORS_AUTH:
-            self.authorization(event.data)
-        elif event.type == RemoteCommEvents.SUPVISORS_EVENT:
-            self.unstack_event(event.data)
-        elif event.type == RemoteCommEvents.SUPVISORS_INFO:
-            self.unstack_info(event.data)
-        elif event.type == RemoteCommEvents.SUPVISORS_TASK:
+        if event_type == RemoteCommEvents.SUPVISORS_AUTH:
+            self.authorization(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_EVENT:
+            self.unstack_event(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_INFO:
+            self.unstack_info(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_RESULT:
+            self.unstack_results(event_data)
+        elif event_type == RemoteCommEvents.SUPVISORS_TASK:
             self.periodic_task()
-
-    def unstack_event(self, message):
-        """ Unstack and process one event from the event queue. """
-        event_type, event_address, event_data = json.loads(message)
+        elif event_type == RemoteCommEvents.SUPVISORS_STATISTICS:
+            self.publisher.send_statistics(event_data)
+        # send the compact events resulting from this event
+        self.supvisors.zmq.publisher.flush()
+
+    def unstack_event(self, batch):
+        """ Unstack and process a batch of events from the event queue.
+        The application events resulting from the batch are published once at the end. """
+        for message in batch:
+            # a failure on one event must not prevent the processing of the next ones
+            try:
+                self.process_event(message)
+            except:
+                self.logger.critical('failed to process event {}: {}'.format(message, traceback.format_exc()))
+        self.context.publish_applications()
+
+    def process_event(self, message):
+        """ Process one event received from the event queue. """
+        event_type, event_address, event_data = message
         if event_type == InternalEventHeaders.TICK:
             self.logger.blather('got tick event from {}: {}'.format(event_address, event_data))
             self.fsm.on_tick_event(event_address, event_data)
@@ -139,31 +165,52 @@ class SupervisorListener(object):
     def unstack_info(self, message):
         """ Unstack the process info received. """
         # unstack the queue for process info
-        address_name, info = json.loads(message)
+        address_name, info = message
         self.logger.blather('got process info event from {}'.format(address_name))
         self.fsm.on_process_info(address_name, info)
+        self.context.publish_applications()
+
+    def unstack_results(self, message):
+        """ Unstack the results of the start / stop requests and inform the commanders of the failures. """
+        address_name, results = message
+        self.logger.blather('got request results from {}: {}'.format(address_name, results))
+        for header, namespec, fault in results:
+            if fault:
+                if header == DeferredRequestHeaders.START_PROCESS:
+                    self.supvisors.starter.on_request_failure(namespec, address_name, *fault)
+                else:
+                    self.supvisors.stopper.on_request_failure(namespec, address_name, *fault)
 
     def authorization(self, data):
         """ Extract authorization and address from data and process event. """
         self.logger.blather('got authorization event: {}'.format(data))
-        # split the line received
-        address_name, authorized = tuple(x.split(':')[1] for x in data.split())
-        self.fsm.on_authorization(address_name, boolean(authorized))
+        address_name, authorized = data
+        self.fsm.on_authorization(address_name, authorized)
 
     def periodic_task(self):
         """ Periodic task that mainly checks that addresses are still operating. """
         self.logger.blather('got periodic task event')
+        self.logger.debug('internal counters: {}'.format(self.counters()))
         addresses = self.fsm.on_timer_event()
         # pushes isolated addresses to main loop
         self.supvisors.zmq.pusher.send_isolate_addresses(addresses)
 
+    def counters(self):
+        """ Return the counters on the internal processing of Supvisors. """
+        return {'event_batches': self.main_loop.batch_counters.serial(),
+            'statistics_conflation': self.main_loop.conflation_counters.serial(),
+            'proxy_pool': self.main_loop.proxy_pool.counters.serial(),
+            'pending_requests': self.main_loop.workers.pending(),
+            'publication': self.supvisors.zmq.publisher.counters.serial(),
+            'statistics_sampling': self.collector.counters.serial()}
+
     def force_process_fatal(self, namespec):
         """ Publishes a fake process event showing a FATAL state for the process. """
-        self.force_process_state(ProcessStates.FATAL)
+        self.force_process_state(namespec, ProcessStates.FATAL)
 
     def force_process_unknown(self, namespec):
         """ Publishes a fake process event showing an UNKNOWN state for the process. """
-        self.force_process_state(ProcessStates.UNKNOWN)
+        self.force_process_state(namespec, ProcessStates.UNKNOWN)
 
     def force_process_state(self, namespec, state):
         """ Publishes a fake process event showing a state for the process. """
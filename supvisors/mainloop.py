@@ -17,15 +17,266 @@
 # limitations under the License.
 # ======================================================================
 
-import json
+import errno
+import fcntl
+import os
 import time
+import traceback
+import xmlrpclib
 import zmq
 
+from collections import deque
+from Queue import Queue
 from threading import Thread
 
-from supvisors.rpcrequests import getRPCInterface
+from supervisor.medusa.asyncore_25 import file_dispatcher
+from supervisor.xmlrpc import Faults
+
+from supvisors.codec import decode_event, peek_statistics
+from supvisors.recorder import EventRecorder
+from supvisors.rpcrequests import RPCProxyPool
 from supvisors.ttypes import AddressStates
-from supvisors.utils import (supvisors_short_cuts, DeferredRequestHeaders, RemoteCommEvents)
+from supvisors.utils import (supvisors_short_cuts, DeferredRequestHeaders, RemoteCommEvents, StatisticsFrames)
+
+
+class SupervisorEventQueue(file_dispatcher):
+    """ In-process hand-off of the events from the Supvisors main loop to the Supervisor thread.
+
+    The events are pushed into a thread-safe queue by the main loop.
+    The read end of a pipe is registered in the asyncore socket map of Supervisor, so that writing
+    to the pipe wakes up the Supervisor thread, which drains the queue and calls the callback
+    for every event, in the order of reception.
+
+    Attributes:
+        - logger: a reference to the Supvisors logger,
+        - callback: the function called in the Supervisor thread with the event type and data,
+        - queue: the queue of pending events,
+        - wakeup_fd: the write end of the pipe.
+    """
+
+    def __init__(self, logger, callback):
+        """ Initialization of the attributes.
+        This MUST be called from the Supervisor thread as the instance is added to the asyncore socket map. """
+        self.logger = logger
+        self.callback = callback
+        self.queue = deque()
+        read_fd, self.wakeup_fd = os.pipe()
+        # the write end is non-blocking so that the main loop is never blocked by a full pipe
+        # in that case, a wakeup is already pending and the event will be processed anyway
+        file_dispatcher.__init__(self, read_fd)
+        flags = fcntl.fcntl(self.wakeup_fd, fcntl.F_GETFL, 0)
+        fcntl.fcntl(self.wakeup_fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def put(self, event_type, event_data):
+        """ Push an event into the queue and wake up the Supervisor thread.
+        Called from the main loop thread. """
+        self.queue.append((event_type, event_data))
+        try:
+            os.write(self.wakeup_fd, 'x')
+        except OSError, e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def readable(self):
+        """ The pipe is always polled by Supervisor. """
+        return True
+
+    def writable(self):
+        """ Nothing to write on the pipe from the Supervisor thread. """
+        return False
+
+    def handle_read(self):
+        """ Drain the pipe and process all the pending events. """
+        try:
+            self.recv(4096)
+        except OSError, e:
+            if e.errno != errno.EAGAIN:
+                raise
+        # consider only the events present when entering the method
+        # the events pushed in the meantime come with their own wakeup
+        for _ in range(len(self.queue)):
+            event_type, event_data = self.queue.popleft()
+            # a failure on one event must not prevent the processing of the next ones
+            try:
+                self.callback(event_type, event_data)
+            except:
+                self.logger.critical('failed to process internal event {}: {}'.format(
+                    event_type, traceback.format_exc()))
+
+    def handle_error(self):
+        """ Log the error without closing the pipe. """
+        self.logger.critical('failed to process internal event: {}'.format(traceback.format_exc()))
+
+    def close(self):
+        """ Remove the pipe from the asyncore socket map and close the file descriptors. """
+        file_dispatcher.close(self)
+        os.close(self.wakeup_fd)
+
+
+class BatchCounters(object):
+    """ Counters on the batches of internal events handed off to the Supervisor thread.
+
+    Attributes:
+        - batches: the number of batches handed off,
+        - events: the total number of events handed off,
+        - max_batch_size: the size of the largest batch,
+        - queue_depth: the number of hand-offs pending in the event queue when the last batch was pushed,
+        - max_queue_depth: the largest value of queue_depth.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.clear()
+
+    def clear(self):
+        """ Reset all counters. """
+        self.batches = 0
+        self.events = 0
+        self.max_batch_size = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+
+    def add(self, batch_size, queue_depth):
+        """ Take into account a new batch. """
+        self.batches += 1
+        self.events += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.queue_depth = queue_depth
+        self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def mean_batch_size(self):
+        """ Return the average size of the batches. """
+        return float(self.events) / self.batches if self.batches else 0.0
+
+    def serial(self):
+        """ Return a serializable form of the counters. """
+        return {'batches': self.batches, 'events': self.events,
+            'mean_batch_size': self.mean_batch_size(), 'max_batch_size': self.max_batch_size,
+            'queue_depth': self.queue_depth, 'max_queue_depth': self.max_queue_depth}
+
+
+def conflate_statistics(messages):
+    """ Return the statistics messages that remain relevant, among the raw messages received.
+    Per origin, only the latest snapshot is kept. As a delta can only be applied to the keyframe it refers to,
+    a keyframe is kept together with the latest delta that refers to it. """
+    latest = {}
+    for index, frames in enumerate(messages):
+        try:
+            origin, frame, sequence = peek_statistics(frames)
+        except:
+            # corrupted message
+            continue
+        if frame == StatisticsFrames.KEYFRAME:
+            latest[origin] = [(index, frame, sequence, frames)]
+        else:
+            kept = [entry for entry in latest.get(origin, [])
+                if entry[1] == StatisticsFrames.KEYFRAME and entry[2] == sequence]
+            kept.append((index, frame, sequence, frames))
+            latest[origin] = kept
+    # keep the reception order
+    return [frames for _, _, _, frames in sorted(entry for entries in latest.values() for entry in entries)]
+
+
+class ConflationCounters(object):
+    """ Counters on the conflation of the statistics messages.
+
+    Attributes:
+        - received: the number of statistics messages received,
+        - delivered: the number of statistics messages handed off to the Supervisor thread,
+            the difference with received being the number of outdated messages discarded,
+        - max_backlog: the largest number of statistics messages read at once.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.clear()
+
+    def clear(self):
+        """ Reset all counters. """
+        self.received = 0
+        self.delivered = 0
+        self.max_backlog = 0
+
+    def add(self, received):
+        """ Take into account new statistics messages. """
+        self.received += received
+        self.max_backlog = max(self.max_backlog, received)
+
+    def serial(self):
+        """ Return a serializable form of the counters. """
+        return {'received': self.received, 'delivered': self.delivered,
+            'conflated': self.received - self.delivered, 'max_backlog': self.max_backlog}
+
+
+class RequestWorkers(object):
+    """ Bounded pool of threads performing the deferred XML-RPC requests.
+
+    Each worker has its own queue and the requests are dispatched to the workers according to their address,
+    so that the requests to the same address are performed in sequence whereas requests to different
+    addresses may be performed in parallel.
+    A failure of the handler is logged and reported to the failure handler, if any, and the worker goes on.
+
+    Attributes:
+        - handler: the function called with the header and the body of the requests,
+        - logger: a reference to the Supvisors logger,
+        - failure_handler: the function called with the header and the body of the requests whose handler failed,
+        - queues: the request queues, one per worker,
+        - threads: the worker threads.
+    """
+
+    def __init__(self, nb_workers, handler, logger, failure_handler=None):
+        """ Initialization of the attributes. """
+        self.handler = handler
+        self.logger = logger
+        self.failure_handler = failure_handler
+        self.queues = [Queue() for _ in range(nb_workers)]
+        self.threads = [Thread(target=self.work, args=(queue, )) for queue in self.queues]
+        for thread in self.threads:
+            thread.daemon = True
+
+    def start(self):
+        """ Start the worker threads. """
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        """ Stop the worker threads once the pending requests have been performed. """
+        for queue in self.queues:
+            queue.put(None)
+        for thread in self.threads:
+            if thread.is_alive():
+                thread.join()
+
+    def push(self, address_name, header, body):
+        """ Push the request to the worker in charge of the address. """
+        self.queues[hash(address_name) % len(self.queues)].put((header, body))
+
+    def pending(self):
+        """ Return the number of requests waiting for a worker. """
+        return sum(queue.qsize() for queue in self.queues)
+
+    def work(self, queue):
+        """ Perform the requests of the queue until the stop request. """
+        while True:
+            request = queue.get()
+            if request is None:
+                break
+            # the handler is expected to deal with its own errors
+            # the worker must survive anyway
+            try:
+                self.handler(*request)
+            except Exception:
+                self.logger.critical('failed to perform request {}: {}'.format(request, traceback.format_exc()))
+                self.fail(request)
+
+    def fail(self, request):
+        """ Report the failure of the request to the failure handler, if any. """
+        if self.failure_handler:
+            try:
+                self.failure_handler(*request)
+            except Exception:
+                self.logger.critical('failed to report the failure of request {}: {}'.format(
+                    request, traceback.format_exc()))
 
 
 class SupvisorsMainLoop(Thread):
@@ -33,24 +284,55 @@ class SupvisorsMainLoop(Thread):
 
     Attributes:
         - supvisors: a reference to the Supvisors context,
+        - event_queue: the in-process queue used to hand off the events to the Supervisor thread,
         - subscriber: a reference to the internal event subscriber,
+        - snapshot_server: a reference to the server of the snapshots requested by the event subscribers,
+        - batch_size: the maximum number of internal events read before a hand-off,
+        - batch_counters: the counters on the batches handed off,
+        - conflation_counters: the counters on the conflation of the statistics,
+        - pending_statistics: the raw statistics messages held back until the Supervisor thread is ready,
+        - proxy_pool: the pool of persistent XML-RPC proxies used for the deferred requests,
+        - workers: the threads performing the deferred requests,
+        - multicall_window: the time in seconds during which start / stop requests to an address are coalesced,
+        - pending_requests: the start / stop requests being coalesced, stored per address with their flush date,
+        - recorder: the recorder of the internal events, the deferred requests and their replies, if any,
         - loop: the infinite loop flag.
     """
 
-    def __init__(self, supvisors):
+    def __init__(self, supvisors, event_queue):
         """ Initialization of the attributes. """
         # thread attributes
         Thread.__init__(self)
         # shortcuts
         self.supvisors = supvisors
         supvisors_short_cuts(self, ['info_source', 'logger'])
+        self.event_queue = event_queue
         # keep a reference of zmq sockets
         self.subscriber = supvisors.zmq.internal_subscriber
         self.puller = supvisors.zmq.puller
+        self.snapshot_server = supvisors.zmq.snapshot_server
+        # batching of internal events
+        self.batch_size = supvisors.options.internal_batch_size
+        self.batch_counters = BatchCounters()
+        self.conflation_counters = ConflationCounters()
+        self.pending_statistics = []
         # keep a reference to the environment
         self.env = self.info_source.get_env()
-        # create a xml-rpc client to the local Supervisor instance
-        self.proxy = getRPCInterface('localhost', self.env)
+        # persistent proxies for the deferred requests
+        self.proxy_pool = RPCProxyPool(self.env, supvisors.options.rpc_pool_size,
+            supvisors.options.rpc_idle_timeout, supvisors.options.rpc_timeout)
+        # the deferred requests are performed outside the polling thread
+        self.workers = RequestWorkers(supvisors.options.rpc_workers, self.execute_request, self.logger,
+            self.fail_request)
+        # start / stop requests to the same address are coalesced into a single system.multicall
+        self.multicall_window = supvisors.options.rpc_multicall_window / 1000.0
+        self.pending_requests = {}
+        # the inputs of the main loop are recorded on demand, to be replayed offline
+        self.recorder = None
+        if supvisors.options.internal_record_file:
+            self.recorder = EventRecorder(supvisors.options.internal_record_file, supvisors)
+            self.subscriber.recorder = self.recorder
+            self.puller.recorder = self.recorder
 
     def stop(self):
         """ Request to stop the infinite loop by resetting its flag. """
@@ -66,57 +348,185 @@ class SupvisorsMainLoop(Thread):
         poller = zmq.Poller()
         # register sockets
         poller.register(self.subscriber.socket, zmq.POLLIN) 
+        poller.register(self.subscriber.stats_socket, zmq.POLLIN) 
         poller.register(self.puller.socket, zmq.POLLIN) 
+        poller.register(self.snapshot_server.socket, zmq.POLLIN) 
         timer_event_time = time.time()
+        # start the threads that perform the deferred requests
+        self.workers.start()
         # poll events every seconds
         self.loop = True
         while self.loop:
-            socks = dict(poller.poll(500))
+            socks = dict(poller.poll(self.poll_timeout()))
             # Need to test loop flag again as its value may have changed in the last second.
             if self.loop:
                 # check tick and process events
+                batch = []
                 if self.subscriber.socket in socks and socks[self.subscriber.socket] == zmq.POLLIN:
-                    try:
-                        message = self.subscriber.receive()
-                    except:
-                        # failed to get data from subscriber
-                        pass
-                    else:
-                        # The events received are not processed directly in this thread because it may conflict with
-                        # the Supvisors functions triggered from the Supervisor thread, as they use the same data.
-                        # That's why a RemoteCommunicationEvent is used to process the event in the Supervisor thread.
-                        self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_EVENT, json.dumps(message))
+                    batch.extend(self.receive_events())
+                # check statistics, after the other events as they matter less
+                if self.subscriber.stats_socket in socks and socks[self.subscriber.stats_socket] == zmq.POLLIN:
+                    self.receive_statistics()
+                batch.extend(self.release_statistics())
+                if batch:
+                    # The events received are not processed directly in this thread because it may conflict with
+                    # the Supvisors functions triggered from the Supervisor thread, as they use the same data.
+                    # That's why the events are handed off to the Supervisor thread through the event queue.
+                    self.batch_counters.add(len(batch), len(self.event_queue.queue))
+                    self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_EVENT, batch)
                 # check xml-rpc requests
                 if self.puller.socket in socks and socks[self.puller.socket] == zmq.POLLIN:
-                    try:
-                        header, body = self.puller.receive()
-                    except:
-                        # failed to get data from subscriber
-                        pass
-                    else:
+                    for header, body in self.receive_requests():
                         self.send_request(header, body)
+                # check snapshot requests
+                if self.snapshot_server.socket in socks and socks[self.snapshot_server.socket] == zmq.POLLIN:
+                    self.serve_snapshots()
+                # push the coalesced requests whose window has expired
+                self.flush_requests(time.time())
                 # check periodic task
                 if timer_event_time + 5 < time.time():
-                    self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_TASK, '')
+                    self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_TASK, None)
+                    # close the connections that are not used anymore
+                    self.proxy_pool.evict_idle()
+                    if self.recorder:
+                        self.recorder.flush()
                     # set date for next task
                     timer_event_time = time.time()
         # close resources gracefully
         self.logger.info('end of main loop')
         poller.unregister(self.subscriber.socket)
+        poller.unregister(self.subscriber.stats_socket)
+        poller.unregister(self.snapshot_server.socket)
+        self.flush_requests()
+        self.workers.stop()
+        self.proxy_pool.close()
+        if self.recorder:
+            self.recorder.close()
+
+    def receive_events(self):
+        """ Read all the internal events ready on the subscriber, within the limit of the batch size. """
+        batch = []
+        for _ in range(self.batch_size):
+            try:
+                batch.append(self.subscriber.receive(zmq.NOBLOCK))
+            except zmq.Again:
+                # no more message ready
+                break
+            except:
+                # failed to get data from subscriber
+                pass
+        return batch
+
+    def receive_statistics(self):
+        """ Read all the statistics ready on the subscriber, within the limit of the batch size.
+        The raw messages are kept aside and conflated, until the Supervisor thread is ready to process them. """
+        messages = []
+        for _ in range(self.batch_size):
+            try:
+                messages.append(self.subscriber.receive_statistics(zmq.NOBLOCK))
+            except zmq.Again:
+                # no more message ready
+                break
+            except:
+                # failed to get data from subscriber
+                pass
+        self.conflation_counters.add(len(messages))
+        self.pending_statistics = conflate_statistics(self.pending_statistics + messages)
+
+    def release_statistics(self):
+        """ Return the decoded statistics kept aside if the Supervisor thread has processed all the previous events.
+        Otherwise, the statistics are held back so that outdated ones can be discarded. """
+        statistics = []
+        if self.pending_statistics and not self.event_queue.queue:
+            for frames in self.pending_statistics:
+                try:
+                    statistics.append(decode_event(frames))
+                except:
+                    # corrupted message
+                    pass
+            self.conflation_counters.delivered += len(self.pending_statistics)
+            self.pending_statistics = []
+        return statistics
+
+    def receive_requests(self):
+        """ Read all the requests ready on the puller, within the limit of the batch size. """
+        requests = []
+        for _ in range(self.batch_size):
+            try:
+                requests.append(self.puller.receive(zmq.NOBLOCK))
+            except zmq.Again:
+                # no more message ready
+                break
+            except:
+                # failed to get data from puller
+                pass
+        return requests
+
+    def serve_snapshots(self):
+        """ Reply to all the snapshot requests pending on the snapshot socket.
+        The snapshot is read from the last values kept by the EventPublisher, under its lock,
+        so no hand-off to the Supervisor thread is needed. """
+        while True:
+            try:
+                self.snapshot_server.serve(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+
+    def poll_timeout(self):
+        """ Return the poll timeout in milliseconds, so that the coalesced requests are pushed in time
+        and the statistics held back are checked regularly. """
+        timeout = 50 if self.pending_statistics else 500
+        if self.pending_requests:
+            next_flush = min(flush_date for flush_date, _ in self.pending_requests.values())
+            return max(0, min(timeout, int((next_flush - time.time()) * 1000)))
+        return timeout
 
     def send_request(self, header, body):
+        """ Perform the request according to the header.
+        The XML-RPC requests are deferred to the worker in charge of the address.
+        Start / stop requests are coalesced per address during the multicall window. """
+        if header == DeferredRequestHeaders.ISOLATE_ADDRESSES:
+            # the subscriber socket must be used from this thread only
+            self.subscriber.disconnect(body)
+        elif header in [DeferredRequestHeaders.START_PROCESS, DeferredRequestHeaders.STOP_PROCESS] \
+                and self.multicall_window > 0:
+            address_name = body[0]
+            _, requests = self.pending_requests.setdefault(address_name,
+                (time.time() + self.multicall_window, []))
+            requests.append((header, body))
+        else:
+            # keep the order of the requests to this address
+            self.flush_requests(address_name=body[0])
+            self.workers.push(body[0], header, body)
+
+    def flush_requests(self, now=None, address_name=None):
+        """ Push the coalesced requests to the workers.
+        The selection is made on the flush date if now is set, or on the address if address_name is set.
+        All requests are pushed otherwise. """
+        if address_name is not None:
+            address_names = [address_name] if address_name in self.pending_requests else []
+        elif now is not None:
+            address_names = [address for address, (flush_date, _) in self.pending_requests.items()
+                if flush_date <= now]
+        else:
+            address_names = self.pending_requests.keys()
+        for address in address_names:
+            _, requests = self.pending_requests.pop(address)
+            if len(requests) == 1:
+                self.workers.push(address, *requests[0])
+            else:
+                self.workers.push(address, DeferredRequestHeaders.MULTICALL, (address, requests))
+
+    def execute_request(self, header, body):
         """ Perform the XML-RPC according to the header. """
         if header == DeferredRequestHeaders.CHECK_ADDRESS:
             address_name, = body
             self.check_address(address_name)
-        elif header == DeferredRequestHeaders.ISOLATE_ADDRESSES:
-            self.subscriber.disconnect(body)
-        elif header == DeferredRequestHeaders.START_PROCESS:
-            address_name, namespec, extra_args = body
-            self.start_process(address_name, namespec, extra_args)
-        elif header == DeferredRequestHeaders.STOP_PROCESS:
-            address_name, namespec = body
-            self.stop_process(address_name, namespec)
+        elif header in [DeferredRequestHeaders.START_PROCESS, DeferredRequestHeaders.STOP_PROCESS]:
+            self.start_stop(body[0], [(header, body)])
+        elif header == DeferredRequestHeaders.MULTICALL:
+            address_name, requests = body
+            self.start_stop(address_name, requests)
         elif header == DeferredRequestHeaders.RESTART:
             address_name, = body
             self.restart(address_name)
@@ -124,59 +534,85 @@ class SupvisorsMainLoop(Thread):
             address_name, = body
             self.shutdown(address_name)
 
+    def fail_request(self, header, body):
+        """ Hand off a failure result for the start / stop requests that could not be performed,
+        so that the commanders do not wait for them. """
+        if header in [DeferredRequestHeaders.START_PROCESS, DeferredRequestHeaders.STOP_PROCESS]:
+            address_name, requests = body[0], [(header, body)]
+        elif header == DeferredRequestHeaders.MULTICALL:
+            address_name, requests = body
+        else:
+            return
+        results = [(request_header, request_body[1], (Faults.FAILED, 'request failed'))
+            for request_header, request_body in requests]
+        self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_RESULT, (address_name, results))
+
     def check_address(self, address_name):
         """ Check isolation and get all process info asynchronously. """
         try:
-            remote_proxy = getRPCInterface(address_name, self.env)
             # check authorization
-            status = remote_proxy.supvisors.get_address_info(address_name)
+            status = self.proxy_pool.call(address_name, 'supvisors.get_address_info', address_name)
             authorized = status['statecode'] not in [AddressStates.ISOLATING, AddressStates.ISOLATED]
             # get process info if authorized
             if authorized:
-                all_info = remote_proxy.supervisor.getAllProcessInfo()
-                self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_INFO, json.dumps((address_name, all_info)))
+                all_info = self.proxy_pool.call(address_name, 'supervisor.getAllProcessInfo')
+                self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_INFO, (address_name, all_info))
             # inform local Supvisors that authorization is available
-            self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_AUTH, 'address_name:{} authorized:{}'.format(address_name, authorized))
+            self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_AUTH, (address_name, authorized))
         except:
             self.logger.error('failed to check address {}'.format(address_name))
 
-    def start_process(self, address_name, namespec, extra_args):
-        """ Start process asynchronously. """
+    def start_stop(self, address_name, requests):
+        """ Start / stop processes asynchronously, using a single system.multicall when there are several requests.
+        The result of every request is handed off to the Supervisor thread. """
+        calls = []
+        for header, body in requests:
+            if header == DeferredRequestHeaders.START_PROCESS:
+                _, namespec, extra_args = body
+                calls.append(('supvisors.start_args', [namespec, extra_args, False]))
+            else:
+                _, namespec = body
+                calls.append(('supervisor.stopProcess', [namespec, False]))
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supvisors.start_args(namespec, extra_args, False)
+            if len(calls) == 1:
+                method, params = calls[0]
+                try:
+                    outputs = [[self.proxy_pool.call(address_name, method, *params)]]
+                except xmlrpclib.Fault, fault:
+                    outputs = [{'faultCode': fault.faultCode, 'faultString': fault.faultString}]
+            else:
+                outputs = self.proxy_pool.call(address_name, 'system.multicall',
+                    [{'methodName': method, 'params': params} for method, params in calls])
         except:
-            self.logger.error('failed to start process {} on {} with {}'.format(namespec, address_name, extra_args))
-
-    def stop_process(self, address_name, namespec):
-        """ Stop process asynchronously. """
-        try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.stopProcess(namespec, False)
-        except:
-            self.logger.error('failed to stop process {} on {}'.format(namespec, address_name))
+            self.logger.error('failed to start / stop processes on {}: {}'.format(address_name,
+                [params[0] for _, params in calls]))
+            outputs = [{'faultCode': Faults.FAILED, 'faultString': 'request failed'}] * len(calls)
+        # a successful call returns a list holding the result, whereas a failed call returns a fault structure
+        results = [(header, body[1], None if isinstance(output, list) else (output['faultCode'], output['faultString']))
+            for (header, body), output in zip(requests, outputs)]
+        self.send_remote_comm_event(RemoteCommEvents.SUPVISORS_RESULT, (address_name, results))
 
     def restart(self, address_name):
         """ Restart a Supervisor instance asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.restart()
+            self.proxy_pool.call(address_name, 'supervisor.restart')
         except:
             self.logger.error('failed to restart address {}'.format(address_name))
 
     def shutdown(self, address_name):
         """ Stop process asynchronously. """
         try:
-            proxy = getRPCInterface(address_name, self.env)
-            proxy.supervisor.shutdown()
+            self.proxy_pool.call(address_name, 'supervisor.shutdown')
         except:
             self.logger.error('failed to shutdown address {}'.format(address_name))
 
     def send_remote_comm_event(self, event_type, event_data):
-        """ Shortcut for the use of sendRemoteCommEvent. """
-        try:
-            self.proxy.supervisor.sendRemoteCommEvent(event_type, event_data)
-        except:
-            # can happen on restart / shutdown
-            # nothing left to do about that
-            pass
+        """ Hand off the event to the Supervisor thread.
+        The results of the deferred requests are recorded, if requested. """
+        if self.recorder and event_type in self._Recorded_replies:
+            self.recorder.record_reply(event_type, event_data)
+        self.event_queue.put(event_type, event_data)
+
+    # the events handed off as a result of a deferred request
+    _Recorded_replies = [RemoteCommEvents.SUPVISORS_AUTH, RemoteCommEvents.SUPVISORS_INFO,
+        RemoteCommEvents.SUPVISORS_RESULT]
@@ -34,13 +34,30 @@ class SupvisorsOptions():
         - address_list: list of host names or IP addresses where supvisors will be running,
         - deployment_file: absolute or relative path to the XML deployment file,
         - internal_port: port number used to publish local events to remote Supvisors instances,
+        - internal_hwm: high-water mark of the ZeroMQ queues used for the internal events,
+        - stats_port: port number used to publish the local statistics to all Supvisors instances,
+        - stats_hwm: high-water mark of the ZeroMQ queues used for the statistics,
+        - internal_batch_size: maximum number of internal events handed off at once to the Supervisor thread,
+        - internal_record_file: path of the file where the internal events and the deferred requests are recorded,
         - event_port: port number used to publish all Supvisors events,
+        - snapshot_port: port number used to provide the current state of Supvisors to the event subscribers,
+        - compact_event_port: port number used to publish all Supvisors events in the compact format,
+        - rpc_pool_size: maximum number of persistent XML-RPC connections kept per address for the deferred requests,
+        - rpc_idle_timeout: time in seconds after which an unused persistent XML-RPC connection is closed,
+        - rpc_workers: number of threads performing the deferred XML-RPC requests,
+        - rpc_timeout: time in seconds allowed to every socket operation of a deferred XML-RPC request,
+        - rpc_multicall_window: time in milliseconds during which start / stop requests to an address are coalesced,
+        - event_heartbeat: when True, an unchanged address status is replaced by a heartbeat in the published events,
+        - event_replay_size: maximum number of data bytes of the last published events kept for replay,
+        - event_compression: when True, the batches of compact events published are compressed with zlib,
         - auto_fence: when True, Supvisors won't try to reconnect to a Supvisors instance that has been inactive,
         - synchro_timeout: time in seconds that Supvisors waits for all expected Supvisors instances to publish,
         - conciliation_strategy: strategy used to solve conflicts when Supvisors has detected that multiple instances of the same program are running,
         - deployment_strategy: strategy used to start applications on addresses,
         - stats_periods: list of periods for which the statistics will be provided in the Supvisors web page,
         - stats_histo: depth of statistics history,
+        - stats_keyframe_period: period in seconds between two full publications of the local statistics,
+        - stats_addresses: list of addresses whose statistics are received ('*' for all addresses),
         - logfile: absolute or relative path of the Supvisors log file,
         - logfile_maxbytes: maximum size of the Supvisors log file,
         - logfile_backups: number of Supvisors backup log files,
@@ -55,12 +72,23 @@ class SupvisorsOptions():
 
     def __str__(self):
         """ Contents as string. """
-        return ('address_list={} deployment_file={} internal_port={} event_port={} auto_fence={} synchro_timeout={} '
+        return ('address_list={} deployment_file={} internal_port={} internal_hwm={} stats_port={} stats_hwm={} '
+            'internal_batch_size={} internal_record_file={} event_port={} snapshot_port={} compact_event_port={} '
+            'event_heartbeat={} event_replay_size={} event_compression={} '
+            'rpc_pool_size={} rpc_idle_timeout={} rpc_workers={} rpc_timeout={} '
+            'rpc_multicall_window={} '
+            'auto_fence={} synchro_timeout={} '
             'conciliation_strategy={} deployment_strategy={} stats_periods={} stats_histo={} '
-            'logfile={} logfile_maxbytes={} logfile_backups={} loglevel={}'.format(self.address_list,
-            self.deployment_file, self.internal_port, self.event_port, self.auto_fence, self.synchro_timeout, 
+            'stats_keyframe_period={} stats_addresses={} logfile={} logfile_maxbytes={} logfile_backups={} loglevel={}'.format(self.address_list,
+            self.deployment_file, self.internal_port, self.internal_hwm, self.stats_port, self.stats_hwm,
+            self.internal_batch_size, self.internal_record_file, self.event_port, self.snapshot_port,
+            self.compact_event_port,
+            self.event_heartbeat, self.event_replay_size, self.event_compression,
+            self.rpc_pool_size, self.rpc_idle_timeout, self.rpc_workers, self.rpc_timeout,
+            self.rpc_multicall_window,
+            self.auto_fence, self.synchro_timeout, 
             self.conciliation_strategy, self.deployment_strategy, self.stats_periods, self.stats_histo,
-            self.logfile, self.logfile_maxbytes, self.logfile_backups, self.loglevel))
+            self.stats_keyframe_period, self.stats_addresses, self.logfile, self.logfile_maxbytes, self.logfile_backups, self.loglevel))
 
 
 class SupvisorsServerOptions(ServerOptions):
@@ -106,7 +134,22 @@ class SupvisorsServerOptions(ServerOptions):
         opt.address_list = list(OrderedDict.fromkeys(filter(None, list_of_strings(parser.getdefault('address_list', gethostname())))))
         opt.deployment_file = existing_dirpath(parser.getdefault('deployment_file', ''))
         opt.internal_port = self.to_port_num(parser.getdefault('internal_port', '65001'))
+        opt.internal_hwm = self.to_hwm(parser.getdefault('internal_hwm', '1000'))
+        opt.stats_port = self.to_port_num(parser.getdefault('stats_port', '65003'))
+        opt.stats_hwm = self.to_hwm(parser.getdefault('stats_hwm', '10'))
+        opt.internal_batch_size = self.to_batch_size(parser.getdefault('internal_batch_size', '100'))
+        opt.internal_record_file = existing_dirpath(parser.getdefault('internal_record_file', ''))
         opt.event_port = self.to_port_num(parser.getdefault('event_port', '65002'))
+        opt.snapshot_port = self.to_port_num(parser.getdefault('snapshot_port', '65004'))
+        opt.compact_event_port = self.to_port_num(parser.getdefault('compact_event_port', '65005'))
+        opt.event_heartbeat = boolean(parser.getdefault('event_heartbeat', 'false'))
+        opt.event_replay_size = byte_size(parser.getdefault('event_replay_size', '1MB'))
+        opt.event_compression = boolean(parser.getdefault('event_compression', 'true'))
+        opt.rpc_pool_size = self.to_pool_size(parser.getdefault('rpc_pool_size', '4'))
+        opt.rpc_idle_timeout = self.to_idle_timeout(parser.getdefault('rpc_idle_timeout', '60'))
+        opt.rpc_workers = self.to_workers(parser.getdefault('rpc_workers', '4'))
+        opt.rpc_timeout = self.to_rpc_timeout(parser.getdefault('rpc_timeout', '10'))
+        opt.rpc_multicall_window = self.to_multicall_window(parser.getdefault('rpc_multicall_window', '50'))
         opt.auto_fence = boolean(parser.getdefault('auto_fence', 'false'))
         opt.synchro_timeout = self.to_timeout(parser.getdefault('synchro_timeout', '15'))
         opt.conciliation_strategy = self.to_conciliation_strategy(parser.getdefault('conciliation_strategy', 'USER'))
@@ -114,6 +157,9 @@ class SupvisorsServerOptions(ServerOptions):
         # configure statistics
         opt.stats_periods = self.to_periods(list_of_strings(parser.getdefault('stats_periods', '10')))
         opt.stats_histo = self.to_histo(parser.getdefault('stats_histo', 200))
+        opt.stats_keyframe_period = self.to_keyframe_period(parser.getdefault('stats_keyframe_period', '60'))
+        opt.stats_addresses = self.to_stats_addresses(list_of_strings(parser.getdefault('stats_addresses', '*')),
+            opt.address_list)
         # configure logger
         opt.logfile = existing_dirpath(parser.getdefault('logfile', '{}.log'.format(self._Section)))
         opt.logfile_maxbytes = byte_size(parser.getdefault('logfile_maxbytes', '50MB'))
@@ -132,6 +178,62 @@ class SupvisorsServerOptions(ServerOptions):
             return value
         raise ValueError('invalid value for port: %d. expected in [1;65535]' % value)
 
+    @staticmethod
+    def to_hwm(value):
+        """ Convert a string into a high-water mark. """
+        value = integer(value)
+        if 0 < value <= 1000000:
+            return value
+        raise ValueError('invalid value for high-water mark: %d. expected in [1;1000000]' % value)
+
+    @staticmethod
+    def to_batch_size(value):
+        """ Convert a string into a batch size. """
+        value = integer(value)
+        if 0 < value <= 10000:
+            return value
+        raise ValueError('invalid value for internal_batch_size: %d. expected in [1;10000]' % value)
+
+    @staticmethod
+    def to_pool_size(value):
+        """ Convert a string into a pool size. """
+        value = integer(value)
+        if 0 < value <= 100:
+            return value
+        raise ValueError('invalid value for rpc_pool_size: %d. expected in [1;100]' % value)
+
+    @staticmethod
+    def to_idle_timeout(value):
+        """ Convert a string into an idle timeout value. """
+        value = integer(value)
+        if 0 < value <= 3600:
+            return value
+        raise ValueError('invalid value for rpc_idle_timeout: %d. expected in [1;3600] (seconds)' % value)
+
+    @staticmethod
+    def to_workers(value):
+        """ Convert a string into a number of workers. """
+        value = integer(value)
+        if 0 < value <= 64:
+            return value
+        raise ValueError('invalid value for rpc_workers: %d. expected in [1;64]' % value)
+
+    @staticmethod
+    def to_rpc_timeout(value):
+        """ Convert a string into an XML-RPC timeout value. """
+        value = integer(value)
+        if 0 < value <= 300:
+            return value
+        raise ValueError('invalid value for rpc_timeout: %d. expected in [1;300] (seconds)' % value)
+
+    @staticmethod
+    def to_multicall_window(value):
+        """ Convert a string into a multicall window value. """
+        value = integer(value)
+        if 0 <= value <= 1000:
+            return value
+        raise ValueError('invalid value for rpc_multicall_window: %d. expected in [0;1000] (milliseconds)' % value)
+
     @staticmethod
     def to_timeout(value):
         """ Convert a string into a timeout value. """
@@ -159,8 +261,6 @@ class SupvisorsServerOptions(ServerOptions):
     @staticmethod
     def to_periods(value):
         """ Convert a string into a list of period values. """
-        if len(value) > 3:
-            raise ValueError('unexpected number of periods: {}. maximum is 3'.format(value))
         periods = [ ]
         for val in value:
             period = integer(val)
@@ -178,3 +278,25 @@ class SupvisorsServerOptions(ServerOptions):
         if 10 <= histo <= 1500:
             return histo
         raise ValueError('invalid value for histo: {}. expected in [10;1500] (seconds)'.format(value))
+
+    @staticmethod
+    def to_keyframe_period(value):
+        """ Convert a string into a keyframe period. """
+        period = integer(value)
+        if 5 > period or period > 3600:
+            raise ValueError('invalid value for stats_keyframe_period: {}. expected in [5;3600] (seconds)'.format(value))
+        if period % 5 != 0:
+            raise ValueError('invalid value for stats_keyframe_period: %d. expected multiple of 5' % period)
+        return period
+
+    @staticmethod
+    def to_stats_addresses(value, address_list):
+        """ Convert a list of strings into a list of addresses taken from address_list, or '*'. """
+        addresses = list(OrderedDict.fromkeys(filter(None, value)))
+        if '*' in addresses:
+            return ['*']
+        unknown_addresses = [address for address in addresses if address not in address_list]
+        if unknown_addresses:
+            raise ValueError('invalid value for stats_addresses: {}. expected in {} or *'.format(
+                unknown_addresses, address_list))
+        return addresses
@@ -34,7 +34,7 @@ class StatisticsPlot(object):
 
     def addPlot(self, title, unit, ydata):
         if len(ydata) > 0:
-            self.ydata[(title, unit)] = ydata
+            self.ydata[(title, unit)] = list(ydata)
 
     def exportImage(self, image_contents):
         if self.ydata:
@@ -0,0 +1,156 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import errno
+import io
+import os
+
+from psutil import AccessDenied, NoSuchProcess
+
+
+class ProcReader(object):
+    """ Batch reader of the Linux /proc files, used as a fast path for the statistics.
+
+    The files are read directly into a reused buffer and parsed in bulk, which avoids the per-call overhead
+    of psutil. The results have the same layout as the psutil-based functions of the statistics module.
+    A reader is not thread-safe, due to its buffer.
+
+    Attributes:
+        - procfs_path: the mount point of the proc filesystem,
+        - clock_ticks: the number of jiffies per second,
+        - page_size: the size in bytes of a memory page,
+        - buffer: the buffer reused for all the reads.
+    """
+
+    # the system files needed by the reader
+    _System_files = ['stat', 'meminfo', 'net/dev']
+    # initial size of the buffer, doubled when a file does not fit
+    _Buffer_size = 16384
+
+    def __init__(self, procfs_path='/proc'):
+        """ Initialization of the attributes. """
+        self.procfs_path = procfs_path
+        self.clock_ticks = float(os.sysconf('SC_CLK_TCK'))
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.buffer = bytearray(self._Buffer_size)
+
+    @classmethod
+    def create(cls, procfs_path='/proc'):
+        """ Return a reader if the proc filesystem provides the system files, None otherwise. """
+        if all(os.path.isfile(os.path.join(procfs_path, filename)) for filename in cls._System_files):
+            return cls(procfs_path)
+
+    def read(self, filename):
+        """ Return the contents of a /proc file. """
+        with io.FileIO(os.path.join(self.procfs_path, filename)) as stream:
+            size = stream.readinto(self.buffer)
+            if size < len(self.buffer):
+                return memoryview(self.buffer)[:size].tobytes()
+            # the buffer is too small: get the rest of the file and take a larger buffer for the next reads
+            contents = self.buffer[:size] + stream.readall()
+            self.buffer = bytearray(2 * len(contents))
+            return str(contents)
+
+    def pids(self):
+        """ Return the pids of the system processes. """
+        return [int(entry) for entry in os.listdir(self.procfs_path) if entry.isdigit()]
+
+    def cpu_times(self):
+        """ Return the instant work+idle jiffies for all the processors, as statistics.instant_cpu_statistics. """
+        work = []
+        idle = []
+        for line in self.read('stat').splitlines():
+            # first line is the sum of all processors
+            if line.startswith('cpu') and not line.startswith('cpu '):
+                # user nice system idle iowait irq softirq steal guest guest_nice
+                # the last fields are not available on old kernels
+                values = [float(value) / self.clock_ticks for value in line.split()[1:10]]
+                values.extend([0.0] * (9 - len(values)))
+                user, nice, system, idle_time, iowait, irq, softirq, steal, guest = values
+                work.append(user + nice + system + irq + softirq + steal + guest)
+                idle.append(idle_time + iowait)
+        # return adding CPU average in front of lists
+        work.insert(0, sum(work) / len(work))
+        idle.insert(0, sum(idle) / len(idle))
+        return zip(work, idle)
+
+    def meminfo(self):
+        """ Return the memory fields of /proc/meminfo, in bytes. """
+        fields = {}
+        for line in self.read('meminfo').splitlines():
+            values = line.split()
+            if len(values) >= 2:
+                fields[values[0]] = int(values[1]) * 1024
+        return fields
+
+    def memory_total(self):
+        """ Return the total physical memory in bytes. """
+        return self.meminfo()['MemTotal:']
+
+    def memory_percent(self):
+        """ Return the percent of memory reserved, as statistics.instant_memory_statistics,
+        or None if the kernel does not provide the available memory (before 3.14). """
+        fields = self.meminfo()
+        total = fields['MemTotal:']
+        available = fields.get('MemAvailable:')
+        if not available or not total:
+            return None
+        if available > total:
+            # symptomatic of a container, as in psutil
+            available = fields['MemFree:']
+        return round(100.0 * (total - available) / total, 1)
+
+    def io_counters(self):
+        """ Return the received / sent bytes per network interface, as statistics.instant_io_statistics. """
+        result = {}
+        # the first 2 lines are headers
+        for line in self.read('net/dev').splitlines()[2:]:
+            colon = line.rfind(':')
+            if colon > 0:
+                fields = line[colon + 1:].split()
+                result[line[:colon].strip()] = int(fields[0]), int(fields[8])
+        return result
+
+    def process_stat(self, pid):
+        """ Return the parent pid, the start time in jiffies since boot and the CPU times in seconds of a process.
+        The CPU times are summed as in psutil: user, system, children user, children system and block I/O delays. """
+        contents = self.read_process(pid, 'stat')
+        # the process name may contain spaces and parentheses
+        fields = contents[contents.rfind(')') + 2:].split()
+        # fields are numbered from 3 (state) in proc(5)
+        jiffies = sum(int(value) for value in fields[11:15])
+        if len(fields) > 39:
+            jiffies += int(fields[39])
+        return int(fields[1]), int(fields[19]), jiffies / self.clock_ticks
+
+    def process_rss(self, pid):
+        """ Return the resident memory of a process in bytes. """
+        return int(self.read_process(pid, 'statm').split()[1]) * self.page_size
+
+    def read_process(self, pid, filename):
+        """ Return the contents of a /proc/<pid> file.
+        The errors are raised as psutil errors, so that the callers deal with them the same way. """
+        try:
+            return self.read(os.path.join(str(pid), filename))
+        except (IOError, OSError), e:
+            if e.errno in (errno.ENOENT, errno.ESRCH):
+                raise NoSuchProcess(pid)
+            if e.errno in (errno.EACCES, errno.EPERM):
+                raise AccessDenied(pid)
+            raise
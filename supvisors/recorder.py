@@ -0,0 +1,167 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+import cPickle
+import json
+import struct
+import time
+
+from threading import Lock
+
+from supvisors.codec import CodecError
+
+
+# Binary layout of the record files.
+# A record file starts with a magic string and the version of the layout, and is then made of records.
+# Every record is made of the reception date, the kind of the record and the number of frames,
+# followed by the frames, each one packed as an unsigned int length followed by the bytes.
+# The file is only appended, so a record file may hold several sessions, each one starting with a SESSION record.
+# All numeric values are packed in network byte order.
+
+# magic string and version of the layout. the version is to be incremented on any change in the layouts below
+RECORD_MAGIC = 'SVRC'
+RECORD_VERSION = 1
+
+# precompiled layouts
+_FILE_HEADER = struct.Struct('!4sB')
+_RECORD = struct.Struct('!dBH')
+_FRAME_LENGTH = struct.Struct('!I')
+
+
+class RecordKinds:
+    """ Enumeration class for the kinds of records.
+        - SESSION: the description of the recording Supvisors instance, encoded in JSON,
+        - EVENT: the raw frames of an internal event (TICK, PROCESS or STATISTICS) received by the main loop,
+        - REQUEST: the pickled deferred request received by the main loop,
+        - REPLY: the pickled event type and data handed off to the Supervisor thread as a result of a deferred request.
+    """
+    SESSION, EVENT, REQUEST, REPLY = range(4)
+
+
+class EventRecorder(object):
+    """ Class recording the inputs of the Supvisors main loop into an append-only binary file.
+
+    The records can be written from the main loop and from the threads performing the deferred requests,
+    so the file is protected by a lock.
+
+    Attributes:
+        - logger: a reference to the Supvisors logger,
+        - filename: the path of the record file,
+        - lock: the lock protecting the file,
+        - stream: the file object,
+        - nb_records: the number of records written,
+        - nb_bytes: the number of bytes written.
+    """
+
+    def __init__(self, filename, supvisors):
+        """ Initialization of the attributes.
+        A SESSION record is written first, with the local address and the address list. """
+        self.logger = supvisors.logger
+        self.filename = filename
+        self.lock = Lock()
+        self.nb_records = 0
+        self.nb_bytes = 0
+        self.logger.info('recording internal events to {}'.format(filename))
+        self.stream = open(filename, 'ab')
+        # append mode sets the position at the end of the file
+        self.stream.seek(0, 2)
+        if self.stream.tell() == 0:
+            self.stream.write(_FILE_HEADER.pack(RECORD_MAGIC, RECORD_VERSION))
+        self.write(RecordKinds.SESSION, [json.dumps({'local_address': supvisors.address_mapper.local_address,
+            'address_list': supvisors.address_mapper.addresses})])
+
+    def close(self):
+        """ Close the record file. """
+        with self.lock:
+            self.stream.close()
+        self.logger.info('{} records written to {} ({} bytes)'.format(self.nb_records, self.filename, self.nb_bytes))
+
+    def flush(self):
+        """ Flush the records written so far. """
+        with self.lock:
+            self.stream.flush()
+
+    def write(self, kind, frames):
+        """ Write a record made of the frames, dated with the current time. """
+        parts = [_RECORD.pack(time.time(), kind, len(frames))]
+        for frame in frames:
+            parts.append(_FRAME_LENGTH.pack(len(frame)))
+            parts.append(frame)
+        data = ''.join(parts)
+        with self.lock:
+            self.stream.write(data)
+            self.nb_records += 1
+            self.nb_bytes += len(data)
+
+    def record_event(self, frames):
+        """ Record the raw frames of an internal event. """
+        self.write(RecordKinds.EVENT, frames)
+
+    def record_request(self, data):
+        """ Record a pickled deferred request. """
+        self.write(RecordKinds.REQUEST, [data])
+
+    def record_reply(self, event_type, event_data):
+        """ Record the event handed off to the Supervisor thread as a result of a deferred request. """
+        self.write(RecordKinds.REPLY, [cPickle.dumps((event_type, event_data), cPickle.HIGHEST_PROTOCOL)])
+
+
+def read_records(stream):
+    """ Yield the date, the kind and the frames of the records read from the stream.
+    A CodecError is raised if the stream is not a record file compliant with the current layout.
+    A truncated record at the end of the stream, e.g. after a crash, is ignored. """
+    header = stream.read(_FILE_HEADER.size)
+    try:
+        magic, version = _FILE_HEADER.unpack(header)
+    except struct.error:
+        raise CodecError('not a record file')
+    if magic != RECORD_MAGIC:
+        raise CodecError('not a record file')
+    if version != RECORD_VERSION:
+        raise CodecError('unsupported record version: {} (expected {})'.format(version, RECORD_VERSION))
+    while True:
+        header = stream.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return
+        date, kind, nb_frames = _RECORD.unpack(header)
+        frames = []
+        for _ in range(nb_frames):
+            length = stream.read(_FRAME_LENGTH.size)
+            if len(length) < _FRAME_LENGTH.size:
+                return
+            length, = _FRAME_LENGTH.unpack(length)
+            frame = stream.read(length)
+            if len(frame) < length:
+                return
+            frames.append(frame)
+        yield date, kind, frames
+
+
+def decode_request(frames):
+    """ Return the header and the body of a REQUEST record. """
+    return cPickle.loads(frames[0])
+
+
+def decode_reply(frames):
+    """ Return the event type and the event data of a REPLY record. """
+    return cPickle.loads(frames[0])
+
+
+def decode_session(frames):
+    """ Return the description of the recording Supvisors instance from a SESSION record. """
+    return json.loads(frames[0])
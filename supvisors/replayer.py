@@ -0,0 +1,354 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+import time
+
+from supvisors.addressmapper import AddressMapper
+from supvisors.codec import CodecError, decode_event
+from supvisors.commander import Starter, Stopper
+from supvisors.context import Context
+from supvisors.options import SupvisorsOptions
+from supvisors.recorder import RecordKinds, decode_reply, decode_request, decode_session, read_records
+from supvisors.sparser import Parser
+from supvisors.statemachine import FiniteStateMachine
+from supvisors.statistics import StatisticsCompiler
+from supvisors.ttypes import ConciliationStrategies, DeploymentStrategies
+from supvisors.utils import DeferredRequestHeaders, InternalEventHeaders, RemoteCommEvents
+
+
+# names of the deferred requests, for the report
+REQUEST_NAMES = {value: name for name, value in vars(DeferredRequestHeaders).items() if not name.startswith('_')}
+
+
+class HandlerTimings(object):
+    """ Durations of the handlers called during a replay.
+
+    Attributes:
+        - counts: the number of calls per handler,
+        - totals: the cumulated duration in seconds per handler,
+        - maxima: the longest duration in seconds per handler.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.clear()
+
+    def clear(self):
+        """ Reset all counters. """
+        self.counts = {}
+        self.totals = {}
+        self.maxima = {}
+
+    def add(self, name, duration):
+        """ Take into account a new call of the handler. """
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.totals[name] = self.totals.get(name, 0.0) + duration
+        self.maxima[name] = max(self.maxima.get(name, 0.0), duration)
+
+    def serial(self):
+        """ Return a serializable form of the counters, with durations in micro-seconds. """
+        return {name: {'count': count, 'total': self.totals[name] * 1e6,
+            'mean': self.totals[name] * 1e6 / count, 'max': self.maxima[name] * 1e6}
+            for name, count in self.counts.items()}
+
+
+class ReplayInfoSource(object):
+    """ Replacement of the Supervisor source of information.
+    No process is configured for automatic restart, and the forced states are only logged. """
+
+    def __init__(self, logger):
+        """ Initialization of the attributes. """
+        self.logger = logger
+
+    def autorestart(self, namespec):
+        """ Return False as there is no Supervisor configuration. """
+        return False
+
+    def force_process_fatal(self, namespec, reason):
+        """ Log the FATAL state that would be forced into Supervisor. """
+        self.logger.info('force {} FATAL: {}'.format(namespec, reason))
+
+    def force_process_unknown(self, namespec, reason):
+        """ Log the UNKNOWN state that would be forced into Supervisor. """
+        self.logger.info('force {} UNKNOWN: {}'.format(namespec, reason))
+
+
+class ReplayPublisher(object):
+    """ Replacement of the EventPublisher, counting the events that would be published.
+
+    Attributes:
+        - published: the number of events per kind of status.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.published = {}
+
+    def add(self, name):
+        """ Take into account a new event. """
+        self.published[name] = self.published.get(name, 0) + 1
+
+    def send_supvisors_status(self, status):
+        self.add('supvisors')
+
+    def send_address_status(self, status):
+        self.add('address')
+
+    def send_application_status(self, status):
+        self.add('application')
+
+    def send_process_status(self, status):
+        self.add('process')
+
+
+class ReplayPusher(object):
+    """ Replacement of the RequestPusher, counting the deferred requests instead of performing them.
+
+    Attributes:
+        - requests: the number of deferred requests per header.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.requests = {}
+
+    def add(self, header):
+        """ Take into account a new request. """
+        self.requests[header] = self.requests.get(header, 0) + 1
+
+    def send_check_address(self, address_name):
+        self.add(DeferredRequestHeaders.CHECK_ADDRESS)
+
+    def send_isolate_addresses(self, address_names):
+        self.add(DeferredRequestHeaders.ISOLATE_ADDRESSES)
+
+    def send_start_process(self, address_name, namespec, extra_args):
+        self.add(DeferredRequestHeaders.START_PROCESS)
+
+    def send_stop_process(self, address_name, namespec):
+        self.add(DeferredRequestHeaders.STOP_PROCESS)
+
+    def send_restart(self, address_name):
+        self.add(DeferredRequestHeaders.RESTART)
+
+    def send_shutdown(self, address_name):
+        self.add(DeferredRequestHeaders.SHUTDOWN)
+
+
+class ReplayZmq(object):
+    """ Replacement of the ZeroMQ sockets. """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.publisher = ReplayPublisher()
+        self.pusher = ReplayPusher()
+
+
+class ReplaySupvisors(object):
+    """ Supvisors context made of the real Context, FiniteStateMachine and StatisticsCompiler,
+    without Supervisor and without ZeroMQ sockets.
+
+    The addresses are taken from the SESSION record. The other options are set to their default value,
+    unless the deployment file and the statistics periods are provided. """
+
+    def __init__(self, session, logger, deployment_file='', stats_periods=None):
+        """ Initialization of the attributes. """
+        self.logger = logger
+        self.options = SupvisorsOptions()
+        self.options.address_list = session['address_list']
+        self.options.deployment_file = deployment_file
+        self.options.auto_fence = False
+        self.options.synchro_timeout = 15
+        self.options.conciliation_strategy = ConciliationStrategies.USER
+        self.options.deployment_strategy = DeploymentStrategies.CONFIG
+        self.options.stats_periods = stats_periods or [10]
+        self.options.stats_histo = 200
+        self.info_source = ReplayInfoSource(logger)
+        self.zmq = ReplayZmq()
+        # the local address is the one of the recording instance
+        self.address_mapper = AddressMapper(logger)
+        self.address_mapper.addresses = self.options.address_list
+        self.address_mapper.local_address = session['local_address']
+        self.context = Context(self)
+        self.starter = Starter(self)
+        self.stopper = Stopper(self)
+        self.statistician = StatisticsCompiler(self)
+        self.fsm = FiniteStateMachine(self)
+        self.parser = None
+        if deployment_file:
+            try:
+                self.parser = Parser(self)
+            except:
+                self.logger.warn('cannot parse deployment file: {}'.format(deployment_file))
+
+
+class EventReplayer(object):
+    """ Class feeding the records of a record file into a ReplaySupvisors, as the Supervisor thread would do.
+
+    The records can be replayed at the recording speed, or faster, or as fast as possible.
+    The periodic task of the main loop is triggered every 5 seconds of recorded time.
+    Every SESSION record starts the replay again from a fresh context, as Supervisor has been restarted.
+
+    Attributes:
+        - logger: the logger used by the replayed Supvisors,
+        - deployment_file: the path of the deployment file used by the replayed Supvisors,
+        - stats_periods: the statistics periods used by the replayed Supvisors,
+        - supvisors: the replayed Supvisors,
+        - timings: the durations of the handlers called,
+        - recorded_requests: the number of deferred requests recorded per header,
+        - nb_records: the number of records replayed,
+        - nb_errors: the number of records that could not be replayed.
+    """
+
+    # period of the periodic task in seconds
+    _Timer_period = 5
+
+    def __init__(self, logger, deployment_file='', stats_periods=None):
+        """ Initialization of the attributes. """
+        self.logger = logger
+        self.deployment_file = deployment_file
+        self.stats_periods = stats_periods
+        self.supvisors = None
+        self.timings = HandlerTimings()
+        self.recorded_requests = {}
+        self.nb_records = 0
+        self.nb_errors = 0
+
+    def replay(self, stream, speed=0):
+        """ Replay the records read from the stream.
+        With a positive speed, the records are replayed at this ratio of the recording speed (1 for real speed).
+        Otherwise they are replayed as fast as possible.
+        Return the duration of the replay in seconds. """
+        start = time.time()
+        first_date = next_timer = None
+        for date, kind, frames in read_records(stream):
+            if first_date is None:
+                first_date = date
+            if speed > 0:
+                delay = start + (date - first_date) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            if kind == RecordKinds.SESSION:
+                self.on_session(decode_session(frames))
+                next_timer = date + self._Timer_period
+            elif self.supvisors is None:
+                self.logger.warn('record ignored before any session')
+                self.nb_errors += 1
+            else:
+                while date >= next_timer:
+                    self.timed('on_timer_event', self.on_timer)
+                    next_timer += self._Timer_period
+                try:
+                    self.on_record(kind, frames)
+                except Exception, e:
+                    self.logger.error('failed to replay record {}: {}'.format(self.nb_records, e))
+                    self.nb_errors += 1
+            self.nb_records += 1
+        return time.time() - start
+
+    def timed(self, name, func, *args):
+        """ Call the handler and store its duration. """
+        start = time.time()
+        result = func(*args)
+        self.timings.add(name, time.time() - start)
+        return result
+
+    def on_session(self, session):
+        """ Create a fresh Supvisors context from the description of the recording instance. """
+        self.logger.info('replay session of {}'.format(session['local_address']))
+        self.supvisors = ReplaySupvisors(session, self.logger, self.deployment_file, self.stats_periods)
+
+    def on_timer(self):
+        """ Periodic task, as triggered by the main loop. """
+        addresses = self.supvisors.fsm.on_timer_event()
+        self.supvisors.zmq.pusher.send_isolate_addresses(addresses)
+
+    def on_record(self, kind, frames):
+        """ Dispatch the record to the relevant handler. """
+        fsm = self.supvisors.fsm
+        if kind == RecordKinds.EVENT:
+            event_type, event_address, event_data = decode_event(frames)
+            if event_type == InternalEventHeaders.TICK:
+                self.timed('on_tick_event', fsm.on_tick_event, event_address, event_data)
+            elif event_type == InternalEventHeaders.PROCESS:
+                self.timed('on_process_event', fsm.on_process_event, event_address, event_data)
+            elif event_type == InternalEventHeaders.STATISTICS:
+                self.timed('push_statistics', self.supvisors.statistician.push_statistics, event_address, event_data)
+            self.timed('publish_applications', self.supvisors.context.publish_applications)
+        elif kind == RecordKinds.REQUEST:
+            header, _ = decode_request(frames)
+            self.recorded_requests[header] = self.recorded_requests.get(header, 0) + 1
+        elif kind == RecordKinds.REPLY:
+            event_type, event_data = decode_reply(frames)
+            if event_type == RemoteCommEvents.SUPVISORS_AUTH:
+                self.timed('on_authorization', fsm.on_authorization, *event_data)
+            elif event_type == RemoteCommEvents.SUPVISORS_INFO:
+                self.timed('on_process_info', fsm.on_process_info, *event_data)
+                self.timed('publish_applications', self.supvisors.context.publish_applications)
+            elif event_type == RemoteCommEvents.SUPVISORS_RESULT:
+                self.timed('on_request_failure', self.on_results, *event_data)
+        else:
+            raise CodecError('unknown record kind: {}'.format(kind))
+
+    def on_results(self, address_name, results):
+        """ Inform the commanders of the failures of the start / stop requests. """
+        for header, namespec, fault in results:
+            if fault:
+                if header == DeferredRequestHeaders.START_PROCESS:
+                    self.supvisors.starter.on_request_failure(namespec, address_name, *fault)
+                else:
+                    self.supvisors.stopper.on_request_failure(namespec, address_name, *fault)
+
+    def report(self):
+        """ Return the lines of the replay report. """
+        lines = ['{} records replayed, {} errors'.format(self.nb_records, self.nb_errors),
+            '    {:<24} {:>8} {:>12} {:>12} {:>12}'.format('handler', 'count', 'total ms', 'mean us', 'max us')]
+        for name, timing in sorted(self.timings.serial().items()):
+            lines.append('    {:<24} {:>8} {:>12.1f} {:>12.1f} {:>12.1f}'.format(name, timing['count'],
+                timing['total'] / 1000, timing['mean'], timing['max']))
+        if self.supvisors:
+            emitted = self.supvisors.zmq.pusher.requests
+            lines.append('    {:<24} {:>8} {:>8}'.format('deferred request', 'recorded', 'replayed'))
+            for header in sorted(set(self.recorded_requests) | set(emitted)):
+                lines.append('    {:<24} {:>8} {:>8}'.format(REQUEST_NAMES[header],
+                    self.recorded_requests.get(header, 0), emitted.get(header, 0)))
+            lines.append('    events published: {}'.format(self.supvisors.zmq.publisher.published))
+        return lines
+
+
+if __name__ == '__main__':
+    # get arguments
+    import argparse
+    from supervisor.loggers import LevelsByName
+    from supvisors.client.subscriber import create_logger
+    parser = argparse.ArgumentParser(description='Replay a Supvisors record file without Supervisor.')
+    parser.add_argument('record_file', help='the file recorded using the internal_record_file option')
+    parser.add_argument('-s', '--speed', type=float, default=0,
+        help='the ratio of the recording speed (1 for real speed, 0 for as fast as possible)')
+    parser.add_argument('-d', '--deployment', default='', help='the deployment file of the recording Supvisors')
+    parser.add_argument('-p', '--periods', type=int, nargs='+', help='the statistics periods')
+    parser.add_argument('-l', '--logfile', default='replayer.log', help='the log file of the replayed Supvisors')
+    args = parser.parse_args()
+    # replay the file and print the report
+    replayer = EventReplayer(create_logger(args.logfile, LevelsByName.INFO, stdout=False),
+        args.deployment, args.periods)
+    with open(args.record_file, 'rb') as stream:
+        duration = replayer.replay(stream, args.speed)
+    print('replay of {} in {:.3f} s'.format(args.record_file, duration))
+    for line in replayer.report():
+        print(line)
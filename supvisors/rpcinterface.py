@@ -21,7 +21,7 @@ import os
 
 from supervisor.http import NOT_DONE_YET
 from supervisor.options import split_namespec
-from supervisor.xmlrpc import Faults, RPCError
+from supervisor.xmlrpc import capped_int, Faults, RPCError
 
 from supvisors.initializer import Supvisors
 from supvisors.ttypes import ApplicationStates, DeploymentStrategies, SupvisorsStates
@@ -168,6 +168,14 @@ class RPCInterface(object):
         return [process.serial() for application in self.context.applications.values()
             for process in application.processes.values() if process.conflicting()]
 
+    def get_internal_counters(self):
+        """ Get the counters on the internal processing of the local **Supvisors** instance.
+        The counters are cumulated since the start of **Supvisors**. The integer values are capped to the XML-RPC limit.
+
+        *@return* ``dict``: a structure containing the counters.
+        """
+        return self._capped_counters(self.supvisors.listener.counters())
+
     # RPC Command methods
     def start_application(self, strategy, application_name, wait=True):
         """ Start the application named application_name iaw the strategy and the rules file.
@@ -543,6 +551,14 @@ class RPCInterface(object):
             raise RPCError(Faults.BAD_NAME, 'process {} unknown in Supvisors'.format(namespec))
         return process
 
+    def _capped_counters(self, counters):
+        """ Return the counters with their integer values capped, so that they can be marshalled in XML-RPC. """
+        if isinstance(counters, dict):
+            return {key: self._capped_counters(value) for key, value in counters.items()}
+        if isinstance(counters, (int, long)) and not isinstance(counters, bool):
+            return capped_int(counters)
+        return counters
+
     def _get_internal_process_rules(self, process):
         """ Return a dictionary with the rules of the process. """
         result = process.rules.serial()
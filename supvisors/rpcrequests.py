@@ -17,13 +17,20 @@
 # limitations under the License.
 # ======================================================================
 
+import httplib
+import select
+import socket
 import xmlrpclib
 
+from collections import deque
+from threading import Lock
+from time import time
+
 from supervisor.xmlrpc import SupervisorTransport
 
 
-def getRPCInterface(address, env):
-    """ The getRPCInterface creates a proxy to a supervisor XML-RPC server.
+def get_transport_args(address, env):
+    """ Return the username, the password and the URL of the supervisor XML-RPC server running on address.
     Information about the HTTP configuration is required in env. """
     # get configuration info from env
     try:
@@ -39,6 +46,234 @@ def getRPCInterface(address, env):
     serverurl = serverurl.split(':')
     serverurl[1] = '//' + address
     serverurl = ':'.join(serverurl)
+    return username, password, serverurl
+
+
+def getRPCInterface(address, env):
+    """ The getRPCInterface creates a proxy to a supervisor XML-RPC server.
+    Information about the HTTP configuration is required in env. """
     # create transport and return proxy
-    transport = SupervisorTransport(username, password, serverurl)
+    transport = SupervisorTransport(*get_transport_args(address, env))
     return xmlrpclib.ServerProxy('http://{}'.format(address), transport)
+
+
+class RPCPoolCounters(object):
+    """ Counters on the use of the XML-RPC proxy pool.
+
+    Attributes:
+        - hits: the number of calls served by a pooled proxy,
+        - misses: the number of calls that required a new proxy,
+        - connections: the number of TCP connections opened,
+        - connect_time: the total time spent in opening TCP connections, in seconds,
+        - max_connect_time: the longest time spent in opening a TCP connection, in seconds,
+        - reconnections: the number of persistent connections replaced because they were closed or broken before a call,
+        - failures: the number of calls that failed,
+        - evictions: the number of idle proxies closed.
+    The counters may be updated from several threads.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self):
+        """ Reset all counters. """
+        self.hits = 0
+        self.misses = 0
+        self.connections = 0
+        self.connect_time = 0.0
+        self.max_connect_time = 0.0
+        self.reconnections = 0
+        self.failures = 0
+        self.evictions = 0
+
+    def increment(self, name, value=1):
+        """ Increment the counter. """
+        with self.lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def connected(self, duration):
+        """ Take into account a new TCP connection. """
+        with self.lock:
+            self.connections += 1
+            self.connect_time += duration
+            self.max_connect_time = max(self.max_connect_time, duration)
+
+    def serial(self):
+        """ Return a serializable form of the counters. """
+        return {'hits': self.hits, 'misses': self.misses, 'connections': self.connections,
+            'mean_connect_time': self.connect_time / self.connections if self.connections else 0.0,
+            'max_connect_time': self.max_connect_time, 'reconnections': self.reconnections,
+            'failures': self.failures, 'evictions': self.evictions}
+
+
+class PooledTransport(SupervisorTransport):
+    """ Persistent transport that measures the time spent in opening the TCP connections.
+    The timeout applies to the connection and to every socket operation of the requests.
+    The sent attribute tells if the last request has been sent entirely to the server. """
+
+    sent = False
+
+    def __init__(self, username, password, serverurl, counters, timeout):
+        """ Initialization of the attributes. """
+        SupervisorTransport.__init__(self, username, password, serverurl)
+        get_connection = self._get_connection
+        def connect():
+            connection = get_connection()
+            connection.timeout = timeout
+            start = time()
+            connection.connect()
+            counters.connected(time() - start)
+            # the response is expected only once the request has been sent
+            getresponse = connection.getresponse
+            def sent_getresponse(*args, **kwargs):
+                self.sent = True
+                return getresponse(*args, **kwargs)
+            connection.getresponse = sent_getresponse
+            return connection
+        self._get_connection = connect
+
+    def request(self, host, handler, request_body, verbose=0):
+        """ Perform the request and record when it has been sent. """
+        self.sent = False
+        return SupervisorTransport.request(self, host, handler, request_body, verbose)
+
+    def is_closed(self):
+        """ Return True if the idle persistent connection has been closed by the server.
+        An idle HTTP connection has nothing to read, unless the end of the stream. """
+        sock = self.connection.sock
+        if sock is None:
+            # httplib will open a new connection
+            return False
+        try:
+            return bool(select.select([sock], [], [], 0)[0])
+        except (select.error, socket.error, ValueError):
+            return True
+
+
+# errors that may be raised when using a persistent connection that is broken
+_CONNECTION_ERRORS = (socket.error, httplib.BadStatusLine, httplib.CannotSendRequest, httplib.ResponseNotReady)
+
+
+class RPCProxyPool(object):
+    """ Pool of persistent XML-RPC proxies to the supervisor XML-RPC servers.
+    The proxies are kept per address and use HTTP keep-alive, so that successive requests to the same address
+    do not need a new TCP connection.
+
+    Attributes:
+        - env: the environment providing the HTTP configuration,
+        - max_size: the maximum number of idle proxies kept per address,
+        - idle_timeout: the time in seconds after which an unused proxy is closed,
+        - timeout: the time in seconds allowed to every socket operation of a request,
+        - proxies: the idle proxies per address, stored with their last date of use,
+        - counters: the counters on the use of the pool,
+        - lock: the lock protecting the pool when used from several threads.
+    """
+
+    def __init__(self, env, max_size, idle_timeout, timeout):
+        """ Initialization of the attributes. """
+        self.env = env
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.proxies = {}
+        self.counters = RPCPoolCounters()
+        self.lock = Lock()
+
+    def call(self, address, method, *args):
+        """ Perform the XML-RPC method on the supervisor XML-RPC server running on address.
+        A persistent connection that has been closed by the server is replaced before the call.
+        If the persistent connection fails before the request has been sent entirely, the call is retried once
+        on a new connection. Once the request has been sent, the server may have processed it, so the call
+        is never retried. Any other failure, including a timeout, is raised after the proxy has been discarded. """
+        proxy = self.acquire(address)
+        transport = proxy('transport')
+        if transport.connection is not None and transport.is_closed():
+            # nothing has been sent yet: reconnect
+            transport.close()
+            self.counters.increment('reconnections')
+        reused = transport.connection is not None
+        try:
+            result = getattr(proxy, method)(*args)
+        except socket.timeout:
+            # the server is not responsive: do not wait twice
+            self.discard(proxy)
+            self.counters.increment('failures')
+            raise
+        except _CONNECTION_ERRORS:
+            self.discard(proxy)
+            if not reused or transport.sent:
+                self.counters.increment('failures')
+                raise
+            # the persistent connection is broken and the request has not been sent: reconnect
+            self.counters.increment('reconnections')
+            proxy = self.create(address)
+            try:
+                result = getattr(proxy, method)(*args)
+            except:
+                self.discard(proxy)
+                self.counters.increment('failures')
+                raise
+        except xmlrpclib.Fault:
+            # application error: the connection is still valid
+            self.release(address, proxy)
+            raise
+        except:
+            self.discard(proxy)
+            self.counters.increment('failures')
+            raise
+        self.release(address, proxy)
+        return result
+
+    def create(self, address):
+        """ Return a new proxy to the supervisor XML-RPC server running on address. """
+        username, password, serverurl = get_transport_args(address, self.env)
+        transport = PooledTransport(username, password, serverurl, self.counters, self.timeout)
+        return xmlrpclib.ServerProxy('http://{}'.format(address), transport)
+
+    def acquire(self, address):
+        """ Return a proxy to the supervisor XML-RPC server running on address, from the pool if possible. """
+        with self.lock:
+            proxies = self.proxies.get(address)
+            if proxies:
+                self.counters.increment('hits')
+                # use the most recent proxy
+                return proxies.pop()[0]
+            self.counters.increment('misses')
+        return self.create(address)
+
+    def release(self, address, proxy):
+        """ Give the proxy back to the pool. The proxy is closed if the pool is full. """
+        with self.lock:
+            proxies = self.proxies.setdefault(address, deque())
+            if len(proxies) < self.max_size:
+                proxies.append((proxy, time()))
+                return
+        self.discard(proxy)
+
+    @staticmethod
+    def discard(proxy):
+        """ Close the connection of the proxy. """
+        proxy('close')()
+
+    def evict_idle(self):
+        """ Close the proxies that have not been used for more than idle_timeout seconds. """
+        limit = time() - self.idle_timeout
+        evicted = []
+        with self.lock:
+            for proxies in self.proxies.values():
+                # the least recent proxies are on the left
+                while proxies and proxies[0][1] < limit:
+                    evicted.append(proxies.popleft()[0])
+            self.counters.increment('evictions', len(evicted))
+        for proxy in evicted:
+            self.discard(proxy)
+
+    def close(self):
+        """ Close all the proxies of the pool. """
+        with self.lock:
+            proxies = [proxy for address_proxies in self.proxies.values() for proxy, _ in address_proxies]
+            self.proxies = {}
+        for proxy in proxies:
+            self.discard(proxy)
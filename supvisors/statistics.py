@@ -17,16 +17,33 @@
 # limitations under the License.
 # ======================================================================
 
-from psutil import cpu_count, cpu_times, net_io_counters, virtual_memory, Process, NoSuchProcess
+from array import array
+from math import sqrt
+from psutil import (cpu_count, cpu_times, net_io_counters, pids, virtual_memory,
+    AccessDenied, NoSuchProcess, Process)
+from threading import Event, Thread
 from time import time
 
-from supvisors.utils import mean
+from supvisors.procfs import ProcReader
+from supvisors.utils import StatisticsFrames, mean, srate
+
+try:
+    import numpy
+except ImportError:
+    # numpy not available: the statistics series are stored in ring buffers
+    numpy = None
 
 
 # CPU statistics
-def instant_cpu_statistics():
+def instant_cpu_statistics(reader=None):
     """ Return the instant work+idle jiffies for all the processors.
-    The average on all processors is inserted in front of the list. """
+    The average on all processors is inserted in front of the list.
+    The /proc reader is used if provided, with a fallback to psutil. """
+    if reader:
+        try:
+            return reader.cpu_times()
+        except (IOError, OSError):
+            pass
     work = [ ]
     idle = [ ]
     # CPU details
@@ -58,15 +75,29 @@ def cpu_total_work(last, ref):
 
 
 # Memory statistics
-def instant_memory_statistics():
+def instant_memory_statistics(reader=None):
     """ Return the instant value of the memory reserved.
-    This is different from the memory used as it does not include the percent of memory that is available (in cache or swap). """
+    This is different from the memory used as it does not include the percent of memory that is available (in cache or swap).
+    The /proc reader is used if provided, with a fallback to psutil. """
+    if reader:
+        try:
+            percent = reader.memory_percent()
+            if percent is not None:
+                return percent
+        except (IOError, OSError):
+            pass
     return virtual_memory().percent
 
 
 # Network statistics
-def instant_io_statistics():
-    """ Return the instant values of receive / sent bytes per network interface. """
+def instant_io_statistics(reader=None):
+    """ Return the instant values of receive / sent bytes per network interface.
+    The /proc reader is used if provided, with a fallback to psutil. """
+    if reader:
+        try:
+            return reader.io_counters()
+        except (IOError, OSError):
+            pass
     result = {}
     # IO details
     io_stats = net_io_counters(pernic=True)
@@ -93,7 +124,9 @@ def io_statistics(last, ref, duration):
 
 # Process statistics
 def instant_process_statistics(pid):
-    """ Return the instant jiffies and memory values for the process identified by pid. """
+    """ Return the instant jiffies and memory values for the process identified by pid.
+    The child tree is rebuilt from all the system processes, so ProcessSampler is preferred
+    to sample several processes. """
     work = memory = 0
     try:
         proc = Process(pid)
@@ -106,6 +139,123 @@ def instant_process_statistics(pid):
     # take into account the number of processes for the process work 
     return work / cpu_count(), memory
 
+class ProcessSampler(object):
+    """ Sampler of the process statistics, keeping the psutil handles across the samples.
+
+    Contrary to instant_process_statistics, the child trees are not rebuilt from a scan of all the system processes
+    for every sampled process. The parent pid of every system process is kept and only the new pids are read,
+    so that the trees are refreshed incrementally.
+    The handles of the sampled processes and their descendants are kept, identified by their pid and creation time,
+    and evicted as soon as the processes exit or leave the trees. All the measures of a process are read in oneshot.
+
+    On Linux, the /proc files are read directly by default. The handles are then the start times of the processes.
+    psutil is used if the proc filesystem is not available.
+
+    When a pid has been reused by another process, the new process joins the tree only if its parent pid is still
+    the parent in the tree. For a sampled process, the work of the previous process is kept as the baseline,
+    so that the CPU of the interval is not computed against the jiffies of another process.
+
+    Attributes:
+        - reader: the /proc reader, if used,
+        - nb_cpus: the number of processors,
+        - total_memory: the total physical memory in bytes,
+        - ppids: the parent pid of every system process, per pid,
+        - handles: the psutil Process instances or the start times of the sampled trees, per pid,
+        - works: the baseline and the last jiffies of the sampled trees, per sampled pid.
+    """
+
+    def __init__(self, procfs=True):
+        """ Initialization of the attributes. """
+        self.reader = ProcReader.create() if procfs else None
+        self.nb_cpus = cpu_count()
+        self.total_memory = float(self.reader.memory_total() if self.reader else virtual_memory().total)
+        self.ppids = {}
+        self.handles = {}
+        self.works = {}
+
+    def refresh(self):
+        """ Update the parent pids with the system processes and return the children pids per parent pid.
+        Only the new pids are read. The handles created in the process are returned too. """
+        current_pids = set(self.reader.pids() if self.reader else pids())
+        for pid in set(self.ppids) - current_pids:
+            del self.ppids[pid]
+        new_handles = {}
+        for pid in current_pids - set(self.ppids):
+            try:
+                if self.reader:
+                    self.ppids[pid], new_handles[pid], _ = self.reader.process_stat(pid)
+                else:
+                    proc = Process(pid)
+                    self.ppids[pid] = proc.ppid()
+                    new_handles[pid] = proc
+            except (NoSuchProcess, AccessDenied):
+                # process may have disappeared in the interval
+                pass
+        children = {}
+        for pid, ppid in self.ppids.items():
+            children.setdefault(ppid, []).append(pid)
+        return children, new_handles
+
+    @staticmethod
+    def measure(proc):
+        """ Return the jiffies, the resident memory and the parent pid of the process, read in oneshot.
+        None is returned if the process has exited or if the pid has been reused by another process. """
+        if not proc.is_running():
+            return None
+        with proc.oneshot():
+            return sum(proc.cpu_times()), proc.memory_info().rss, proc.ppid()
+
+    def handle_measures(self, pid, new_handles):
+        """ Return the handle of the process and its jiffies, resident memory and parent pid. """
+        if self.reader:
+            ppid, start_time, work = self.reader.process_stat(pid)
+            return start_time, (work, self.reader.process_rss(pid), ppid)
+        proc = self.handles.get(pid) or new_handles.get(pid) or Process(pid)
+        measures = self.measure(proc)
+        if measures is None:
+            # the pid has been reused by another process
+            proc = Process(pid)
+            measures = self.measure(proc)
+        return proc, measures
+
+    def sample(self, named_pid_list):
+        """ Return the instant jiffies and memory values for every process, with the layout of instant_statistics. """
+        children, new_handles = self.refresh()
+        handles = {}
+        works = {}
+        proc_statistics = {}
+        for process_name, pid in named_pid_list:
+            work = memory = 0.0
+            baseline, last_work = self.works.get(pid, (0.0, 0.0))
+            tree = [(pid, None)] if pid in self.ppids else []
+            while tree:
+                tree_pid, parent_pid = tree.pop()
+                try:
+                    handle, (proc_work, proc_memory, ppid) = self.handle_measures(tree_pid, new_handles)
+                except (NoSuchProcess, AccessDenied, ValueError):
+                    # process may have disappeared in the interval
+                    continue
+                # a reparented process leaves the tree at the next sample
+                self.ppids[tree_pid] = ppid
+                if tree_pid in self.handles and handle != self.handles[tree_pid]:
+                    # the pid has been reused by another process
+                    if parent_pid is None:
+                        baseline += last_work
+                    elif ppid != parent_pid:
+                        continue
+                handles[tree_pid] = handle
+                work += proc_work
+                memory += proc_memory
+                tree.extend((child_pid, tree_pid) for child_pid in children.get(tree_pid, []))
+            works[pid] = baseline, work
+            # take into account the number of processes for the process work
+            proc_statistics[process_name] = pid, ((baseline + work) / self.nb_cpus,
+                                                  100.0 * memory / self.total_memory)
+        # evict the handles of the processes that have exited or left the trees
+        self.handles = handles
+        self.works = works
+        return proc_statistics
+
 def cpu_process_statistics(last, ref, total_work):
     """ Return the CPU loading of the process between last and ref measures. """
     # process may have been started between ref and last
@@ -113,10 +263,182 @@ def cpu_process_statistics(last, ref, total_work):
 
 
 # Snapshot of all resources
-def instant_statistics(named_pid_list):
-    """ Return a tuple of all measures taken on the CPU, Memory and IO resources. """
-    proc_statistics = {process_name: (pid, instant_process_statistics(pid)) for process_name, pid in named_pid_list}
-    return time(), instant_cpu_statistics(), instant_memory_statistics(), instant_io_statistics(), proc_statistics
+def instant_statistics(named_pid_list, sampler=None):
+    """ Return a tuple of all measures taken on the CPU, Memory and IO resources.
+    The process measures are taken by the sampler if provided, and its /proc reader is used for all the measures. """
+    reader = sampler.reader if sampler else None
+    if sampler:
+        proc_statistics = sampler.sample(named_pid_list)
+    else:
+        proc_statistics = {process_name: (pid, instant_process_statistics(pid))
+            for process_name, pid in named_pid_list}
+    return (time(), instant_cpu_statistics(reader), instant_memory_statistics(reader), instant_io_statistics(reader),
+        proc_statistics)
+
+
+# Delta encoding of snapshots
+def delta_statistics(stats, keyframe):
+    """ Return the differences between a snapshot and the keyframe snapshot.
+    CPU and memory measures are always kept. IO and process measures are kept only if they have changed.
+    The interfaces and processes that are not in the snapshot anymore are listed. """
+    date, cpu_stats, mem_stats, io_stats, proc_stats = stats
+    _, _, _, ref_io_stats, ref_proc_stats = keyframe
+    io_delta = {intf: values for intf, values in io_stats.items() if ref_io_stats.get(intf) != values}
+    proc_delta = {process_name: values for process_name, values in proc_stats.items()
+        if ref_proc_stats.get(process_name) != values}
+    io_removed = [intf for intf in ref_io_stats if intf not in io_stats]
+    proc_removed = [process_name for process_name in ref_proc_stats if process_name not in proc_stats]
+    return date, cpu_stats, mem_stats, io_delta, proc_delta, io_removed, proc_removed
+
+def apply_delta_statistics(keyframe, delta):
+    """ Return the snapshot rebuilt from the keyframe snapshot and the differences. """
+    date, cpu_stats, mem_stats, io_delta, proc_delta, io_removed, proc_removed = delta
+    io_stats = dict(keyframe[3])
+    io_stats.update(io_delta)
+    for intf in io_removed:
+        io_stats.pop(intf, None)
+    proc_stats = dict(keyframe[4])
+    proc_stats.update(proc_delta)
+    for process_name in proc_removed:
+        proc_stats.pop(process_name, None)
+    return date, cpu_stats, mem_stats, io_stats, proc_stats
+
+
+class StatisticsEncoder(object):
+    """ This class prepares the publication of the local statistics.
+    A full snapshot (keyframe) is published every keyframe_period ticks.
+    In-between, only the differences with the last keyframe are published.
+
+    Attributes are:
+        - keyframe_period: the number of ticks between two keyframes,
+        - counter: the number of ticks since the last keyframe,
+        - sequence: the sequence number of the last keyframe,
+        - keyframe: the last keyframe snapshot. """
+
+    def __init__(self, keyframe_period):
+        """ Initialization of the attributes. """
+        self.keyframe_period = keyframe_period
+        self.counter = -1
+        self.sequence = -1
+        self.keyframe = None
+
+    def encode(self, stats):
+        """ Return the statistics publication corresponding to the snapshot. """
+        self.counter = (self.counter + 1) % self.keyframe_period
+        if self.counter == 0:
+            # sequence is packed as an unsigned int
+            self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+            self.keyframe = stats
+            return StatisticsFrames.KEYFRAME, self.sequence, stats
+        return StatisticsFrames.DELTA, self.sequence, delta_statistics(stats, self.keyframe)
+
+
+class SamplingCounters(object):
+    """ Counters on the sampling of the local statistics.
+
+    Attributes:
+        - samples: the number of snapshots taken,
+        - errors: the number of snapshots that failed,
+        - skipped: the number of sampling dates missed because a snapshot took longer than the period,
+        - last_duration: the duration in seconds of the last snapshot,
+        - total_duration: the cumulated duration in seconds of the snapshots,
+        - max_duration: the longest duration in seconds of a snapshot.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.clear()
+
+    def clear(self):
+        """ Reset all counters. """
+        self.samples = 0
+        self.errors = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+
+    def add(self, duration):
+        """ Take into account a new snapshot. """
+        self.samples += 1
+        self.last_duration = duration
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+
+    def serial(self):
+        """ Return a serializable form of the counters, with durations in milliseconds. """
+        mean_duration = self.total_duration / self.samples if self.samples else 0.0
+        return {'samples': self.samples, 'errors': self.errors, 'skipped': self.skipped,
+            'last_ms': round(self.last_duration * 1000, 3), 'mean_ms': round(mean_duration * 1000, 3),
+            'max_ms': round(self.max_duration * 1000, 3)}
+
+
+class StatisticsCollector(Thread):
+    """ Thread sampling the local statistics on its own schedule, out of the Supervisor thread.
+
+    Sampling uses psutil on every process, which would block the supervision if done in the Supervisor thread.
+    The snapshots are taken at fixed dates, every period from the start of the thread.
+    They are encoded here and handed to the callback, which is expected to pass them to the Supervisor thread
+    for publication, as the ZeroMQ sockets must not be shared between threads.
+
+    Attributes:
+        - period: the time in seconds between two snapshots,
+        - encoder: the encoder of the snapshots as keyframes and deltas,
+        - callback: the function called in this thread with every encoded snapshot,
+        - named_pids: the list of (namespec, pid) to sample, replaced by the Supervisor thread,
+        - sampler: the sampler of the process statistics, keeping the psutil handles across the snapshots,
+        - counters: the counters on the sampling,
+        - stop_event: the event used to stop the thread.
+    """
+
+    def __init__(self, period, keyframe_period, callback):
+        """ Initialization of the attributes. """
+        Thread.__init__(self)
+        self.daemon = True
+        self.period = period
+        self.encoder = StatisticsEncoder(keyframe_period)
+        self.callback = callback
+        self.named_pids = []
+        self.sampler = ProcessSampler()
+        self.counters = SamplingCounters()
+        self.stop_event = Event()
+
+    def set_processes(self, named_pids):
+        """ Replace the list of processes to sample.
+        Called from the Supervisor thread. The assignment of the reference is atomic. """
+        self.named_pids = named_pids
+
+    def stop(self):
+        """ Request to stop the thread and wait for its end. """
+        self.stop_event.set()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        """ Sample the statistics until stopped.
+        Do NOT use logger here. """
+        next_date = time() + self.period
+        while not self.stop_event.wait(max(0.0, next_date - time())):
+            self.sample()
+            # the dates missed during a long sampling are skipped
+            next_date += self.period
+            now = time()
+            if next_date <= now:
+                missed = int((now - next_date) / self.period) + 1
+                self.counters.skipped += missed
+                next_date += missed * self.period
+
+    def sample(self):
+        """ Take, encode and hand off a snapshot of the statistics. """
+        start = time()
+        try:
+            publication = self.encoder.encode(instant_statistics(self.named_pids, self.sampler))
+        except Exception:
+            # psutil may fail on the host resources: the thread must survive
+            self.counters.errors += 1
+        else:
+            self.counters.add(time() - start)
+            self.callback(publication)
 
 
 # Calculate resources taken between two snapshots
@@ -144,101 +466,452 @@ def statistics(last, ref):
     return last[0], cpu, mem, io, proc
 
 
+# Classes for the statistics series
+class Series(object):
+    """ Base class of a statistics series, giving a list-like read access from the oldest to the newest value.
+    Sub-classes implement tolist, __len__ and value. """
+
+    __slots__ = ()
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.tolist()[index]
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('series index out of range')
+        return self.value(index)
+
+    def __eq__(self, other):
+        if isinstance(other, Series):
+            other = other.tolist()
+        return self.tolist() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+
+def accumulated_stats(size, shift, sum_y, sum_yy, sum_xy, last, previous):
+    """ Return the statistics of a series from its accumulators, with the same layout as utils.get_stats.
+    The accumulators are computed on the values minus shift, and the abscissas of the values are 0 to size - 1. """
+    if size == 0:
+        return None, None, (None, None), None
+    avg = sum_y / size
+    if size == 1:
+        return shift + avg, None, (None, None), None
+    sum_x = size * (size - 1) / 2.0
+    a = (size * sum_xy - sum_x * sum_y) / (size * size * (size * size - 1) / 12.0)
+    b = (sum_y - a * sum_x) / size + shift
+    dev = sqrt(max(0.0, sum_yy / size - avg * avg))
+    return shift + avg, srate(last, previous), (a, b), dev
+
+
+class RingBuffer(Series):
+    """ This class is a fixed-capacity series of doubles, where appending is O(1).
+    When the capacity is reached, the oldest value is overwritten.
+
+    The sums of the values, of their squares and of their products by their absolute index are updated
+    as values enter and leave the window, so that the statistics are O(1) reads.
+    The values are shifted by a reference to limit the cancellation errors, and the accumulators are
+    recomputed from scratch each time the buffer wraps around, which corrects the numerical drift
+    and keeps the absolute indexes bounded. """
+
+    __slots__ = ('capacity', 'data', 'start', 'size', 'index', 'shift', 'sum_y', 'sum_yy', 'sum_iy')
+
+    def __init__(self, capacity, values=()):
+        self.capacity = max(1, capacity)
+        self.data = array('d', [0.0]) * self.capacity
+        self.clear()
+        for value in values:
+            self.append(value)
+
+    def clear(self):
+        """ Remove all values. """
+        self.start = 0
+        self.size = 0
+        self.index = 0
+        self.shift = self.sum_y = self.sum_yy = self.sum_iy = 0.0
+
+    def append(self, value):
+        """ Add a value at the end of the series, overwriting the oldest one if full. """
+        if self.size == 0:
+            self.shift = value
+        if self.size < self.capacity:
+            self.data[self.size] = value
+            self.size += 1
+        else:
+            # remove the oldest value from the accumulators
+            old_value = self.data[self.start] - self.shift
+            self.sum_y -= old_value
+            self.sum_yy -= old_value * old_value
+            self.sum_iy -= (self.index - self.capacity) * old_value
+            self.data[self.start] = value
+            self.start += 1
+            if self.start == self.capacity:
+                self.start = 0
+                self.resync()
+                return
+        value -= self.shift
+        self.sum_y += value
+        self.sum_yy += value * value
+        self.sum_iy += self.index * value
+        self.index += 1
+
+    def resync(self):
+        """ Recompute the accumulators from the values. """
+        values = self.tolist()
+        self.shift = mean(values)
+        values = [value - self.shift for value in values]
+        self.sum_y = sum(values)
+        self.sum_yy = sum(value * value for value in values)
+        self.sum_iy = sum(index * value for index, value in enumerate(values))
+        self.index = self.size
+
+    def tolist(self):
+        """ Return the values as a list, from the oldest to the newest. """
+        if self.start == 0:
+            return self.data[:self.size].tolist()
+        return self.data[self.start:].tolist() + self.data[:self.start].tolist()
+
+    def value(self, index):
+        """ Return the value at the positive index. """
+        index += self.start
+        if index >= self.capacity:
+            index -= self.capacity
+        return self.data[index]
+
+    def get_stats(self):
+        """ Return the statistics of the series (see utils.get_stats) from the accumulators. """
+        size = self.size
+        if size < 2:
+            return accumulated_stats(size, self.shift, self.sum_y, 0.0, 0.0, 0.0, 0.0)
+        # the absolute index of the oldest value is index - size
+        sum_xy = self.sum_iy - (self.index - size) * self.sum_y
+        return accumulated_stats(size, self.shift, self.sum_y, self.sum_yy, sum_xy, self.value(size - 1),
+            self.value(size - 2))
+
+    def __len__(self):
+        return self.size
+
+
+class SeriesStore(object):
+    """ Pure-Python store of the statistics series of a StatisticsInstance.
+    Each series is an independent ring buffer. """
+
+    def __init__(self, depth):
+        self.depth = depth
+
+    def series(self):
+        """ Return a new empty series. """
+        return RingBuffer(self.depth)
+
+    def release(self, series):
+        """ Nothing to do as ring buffers are independent. """
+
+    def tick(self):
+        """ Nothing to do as ring buffers are independent. """
+
+
+class TableSeries(Series):
+    """ A statistics series stored in a column of a SeriesTable. """
+
+    __slots__ = ('table', 'column')
+
+    def __init__(self, table, column):
+        self.table = table
+        self.column = column
+
+    def append(self, value):
+        """ Set the value of the series in the current row of the table. """
+        self.table.append(self.column, value)
+
+    def tolist(self):
+        """ Return the values as a list, from the oldest to the newest. """
+        return self.table.values(self.column).tolist()
+
+    def value(self, index):
+        """ Return the value at the positive index. """
+        table = self.table
+        return float(table.data[(table.row - len(self) + 1 + index) % table.depth, self.column])
+
+    def get_stats(self):
+        """ Return the statistics of the series, from the vectorized analysis of the table. """
+        return self.table.get_stats(self.column)
+
+    def __len__(self):
+        return int(self.table.sizes[self.column])
+
+
+class SeriesTable(object):
+    """ NumPy store of the statistics series of a StatisticsInstance.
+
+    All the series are the columns of a single 2-D array (time x series) used as a ring of rows.
+    At each tick, the next row becomes the current row and every live series sets its value in it.
+    Columns of obsolete series are released and reused by new series.
+
+    As in RingBuffer, shifted sums are accumulated per column, here with vectorized updates at each tick:
+    the values of the previous row are added and the values about to be overwritten are removed.
+    The accumulators are recomputed from scratch each time the rows wrap around.
+    The statistics of all the series are then computed in O(series) by a single vectorized call,
+    cached until the next change. """
+
+    _Initial_columns = 16
+
+    def __init__(self, depth):
+        self.depth = max(1, depth)
+        self.data = numpy.zeros((self.depth, self._Initial_columns))
+        self.sizes = numpy.zeros(self._Initial_columns, dtype=numpy.int64)
+        self.appended = numpy.zeros(self._Initial_columns, dtype=bool)
+        self.shift = numpy.zeros(self._Initial_columns)
+        self.sum_y = numpy.zeros(self._Initial_columns)
+        self.sum_yy = numpy.zeros(self._Initial_columns)
+        self.sum_iy = numpy.zeros(self._Initial_columns)
+        self.free = list(reversed(range(self._Initial_columns)))
+        # the current row and its absolute index
+        self.row = self.index = -1
+        self.analysis = None
+
+    def series(self):
+        """ Return a new empty series, using a free column. """
+        if not self.free:
+            self.grow()
+        column = self.free.pop()
+        self.sizes[column] = 0
+        self.appended[column] = False
+        self.shift[column] = self.sum_y[column] = self.sum_yy[column] = self.sum_iy[column] = 0.0
+        return TableSeries(self, column)
+
+    def release(self, series):
+        """ Give the column of an obsolete series back. """
+        self.sizes[series.column] = 0
+        self.appended[series.column] = False
+        self.free.append(series.column)
+
+    def grow(self):
+        """ Double the number of columns. """
+        nb_columns = self.data.shape[1]
+        self.data = numpy.hstack((self.data, numpy.zeros((self.depth, nb_columns))))
+        for attr in ('sizes', 'appended', 'shift', 'sum_y', 'sum_yy', 'sum_iy'):
+            values = getattr(self, attr)
+            setattr(self, attr, numpy.concatenate((values, numpy.zeros(nb_columns, dtype=values.dtype))))
+        self.free.extend(reversed(range(nb_columns, 2 * nb_columns)))
+        self.analysis = None
+
+    def current(self):
+        """ Return the shifted values of the current row, 0 for the series not set. """
+        return numpy.where(self.appended, self.data[self.row] - self.shift, 0.0)
+
+    def tick(self):
+        """ Move to the next row, overwriting the oldest values when the depth is reached. """
+        if self.row >= 0:
+            # add the values of the current row to the accumulators
+            values = self.current()
+            self.sum_y += values
+            self.sum_yy += values * values
+            self.sum_iy += self.index * values
+            if self.row == self.depth - 1:
+                self.resync()
+        self.row = (self.row + 1) % self.depth
+        self.index += 1
+        self.appended[:] = False
+        # remove the values of the full series, as they are about to be overwritten
+        values = numpy.where(self.sizes == self.depth, self.data[self.row] - self.shift, 0.0)
+        self.sum_y -= values
+        self.sum_yy -= values * values
+        self.sum_iy -= (self.index - self.depth) * values
+        self.analysis = None
+
+    def resync(self):
+        """ Recompute the accumulators from the values, the absolute index of the current row becoming the row. """
+        ages = (self.row - numpy.arange(self.depth)) % self.depth
+        mask = ages[:, numpy.newaxis] < self.sizes
+        values = numpy.where(mask, self.data, 0.0)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            self.shift = numpy.where(self.sizes > 0, values.sum(axis=0) / self.sizes, 0.0)
+        values = numpy.where(mask, self.data - self.shift, 0.0)
+        self.sum_y = values.sum(axis=0)
+        self.sum_yy = (values * values).sum(axis=0)
+        self.index = self.row
+        self.sum_iy = (self.row - ages).astype(numpy.float64).dot(values)
+
+    def append(self, column, value):
+        """ Set the value of a series in the current row. """
+        if self.sizes[column] == 0:
+            self.shift[column] = value
+        self.data[self.row, column] = value
+        self.appended[column] = True
+        if self.sizes[column] < self.depth:
+            self.sizes[column] += 1
+        self.analysis = None
+
+    def values(self, column):
+        """ Return the values of a series as an array, from the oldest to the newest. """
+        size = self.sizes[column]
+        start = self.row - size + 1
+        if start >= 0:
+            return self.data[start:self.row + 1, column]
+        return numpy.concatenate((self.data[start:, column], self.data[:self.row + 1, column]))
+
+    def analyze(self):
+        """ Compute the mean, the instant rate, the linear regression and the standard deviation of all the series
+        from the accumulators, including the current row. """
+        values = self.current()
+        sum_y = self.sum_y + values
+        sum_yy = self.sum_yy + values * values
+        sizes = self.sizes.astype(numpy.float64)
+        # the absolute index of the oldest value is index - size + 1
+        sum_xy = self.sum_iy + self.index * values - (self.index - sizes + 1) * sum_y
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            avg = sum_y / sizes
+            sum_x = sizes * (sizes - 1) / 2
+            slope = (sizes * sum_xy - sum_x * sum_y) / (sizes * sizes * (sizes * sizes - 1) / 12)
+            intercept = (sum_y - slope * sum_x) / sizes + self.shift
+            dev = numpy.sqrt(numpy.maximum(0.0, sum_yy / sizes - avg * avg))
+            last = self.data[self.row]
+            previous = self.data[(self.row - 1) % self.depth]
+            rate = numpy.where(previous != 0, 100.0 * last / previous - 100.0, numpy.inf)
+        self.analysis = (avg + self.shift).tolist(), rate.tolist(), slope.tolist(), intercept.tolist(), dev.tolist()
+
+    def get_stats(self, column):
+        """ Return the statistics of a series, with the same layout as utils.get_stats. """
+        size = self.sizes[column]
+        if size == 0:
+            return None, None, (None, None), None
+        if self.analysis is None:
+            self.analyze()
+        avg, rate, slope, intercept, dev = (result[column] for result in self.analysis)
+        if size > 1:
+            return avg, rate, (slope, intercept), dev
+        return avg, None, (None, None), None
+
+
 # Class for statistics storage
 class StatisticsInstance(object):
-    """ This class handles resources statistics for a given address and period. """
+    """ This class handles resources statistics for a given address and period.
+    The period is made of consecutive base intervals of 5 seconds. As the measures are cumulative,
+    the resources consumed over these intervals are obtained by a single integration at the end of the period. """
 
-    def __init__(self, period, depth):
+    def __init__(self, period, depth, vectorized=True):
         # as period is a multiple of 5 and a call to pushStatistics is expected every 5 seconds, use period as a simple counter
         self.period = period / 5
         self.depth = depth
+        # the NumPy store is used when available, unless explicitly disabled
+        self.vectorized = vectorized and numpy is not None
         self.clear()
 
     def clear(self):
-        self.counter = -1
+        self.counter = 0
         self.ref_stats = None
         # data structures
+        self.store = SeriesTable(self.depth) if self.vectorized else SeriesStore(self.depth)
         self.cpu = []
-        self.mem = []
+        self.mem = self.store.series()
         self.io = {}
         self.proc = {}
 
     def find_process_stats(self, namespec):
         return next((stats for (process_name, pid), stats in self.proc.items() if process_name == namespec), None)
 
-    def push_statistics(self, stats):
+    def push_statistics(self, stats, ref_stats):
+        """ Extend the period with the base interval between ref_stats and stats.
+        The period is integrated when it is complete. """
+        if self.ref_stats is None:
+            # init data structures (mem unchanged)
+            self.cpu = [self.store.series() for _ in ref_stats[1]]
+            self.io = {intf: (self.store.series(), self.store.series()) for intf in ref_stats[3].keys()}
+            self.proc = {(process_name, pid_stats[0]): (self.store.series(), self.store.series())
+                for process_name, pid_stats in ref_stats[4].items()}
+            self.ref_stats = ref_stats
         self.counter += 1
         if self.counter % self.period == 0:
-            if self.ref_stats:
-                # rearrange data so that there is less processing afterwards
-                integ_stats = statistics(stats, self.ref_stats)
-                # add new CPU values to CPU lists
-                for lst in self.cpu:
-                	lst.append(integ_stats[1].pop(0))
-                	self.trunc_depth(lst)
-                # add new Mem value to MEM list
-                self.mem.append(integ_stats[2])
-                self.trunc_depth(self.mem)
-                # add new IO values to IO list
-                for intf, bytes in self.io.items():
-                    new_bytes = integ_stats[3].pop(intf)
-                    bytes[0].append(new_bytes[0])
-                    bytes[1].append(new_bytes[1])
-                    # remove too old values when max depth is reached
-                    self.trunc_depth(bytes[0])
-                    self.trunc_depth(bytes[1])
-                # add new Process CPU / Mem values to Process list
-                # as process list is dynamic, there are special rules
-                destroy_list = []
-                for named_pid, (cpu_stats, mem_stats) in self.proc.items():
-                    new_values = integ_stats[4].pop(named_pid, None)
-                    if new_values is None:
-                        # element is obsolete
-                        destroy_list.append(named_pid)
-                    else:
-                        new_cpu_value, new_mem_value = new_values
-                        cpu_stats.append(new_cpu_value)
-                        mem_stats.append(new_mem_value)
-                        # remove too old values when max depth is reached
-                        self.trunc_depth(cpu_stats)
-                        self.trunc_depth(mem_stats)
-                # destroy obsolete elements
-                for named_pid in destroy_list:
-                	del self.proc[named_pid]
-                # add new elements
-                for named_pid, (new_cpu_value, new_mem_value) in integ_stats[4].items():
-                	self.proc[named_pid] = [new_cpu_value], [new_mem_value]
-            else:
-                # init data structures (mem unchanged)
-                self.cpu = [[] for _ in stats[1]]
-                self.io = {intf: ([], []) for intf in stats[3].keys()}
-                self.proc = {(process_name, pid_stats[0]): ([], []) for process_name, pid_stats in stats[4].items()}
+            # rearrange data so that there is less processing afterwards
+            integ_stats = statistics(stats, self.ref_stats)
+            # the store drops the oldest values when max depth is reached
+            self.store.tick()
+            # add new CPU values to CPU lists
+            for lst in self.cpu:
+                lst.append(integ_stats[1].pop(0))
+            # add new Mem value to MEM list
+            self.mem.append(integ_stats[2])
+            # add new IO values to IO list
+            for intf, bytes in self.io.items():
+                new_bytes = integ_stats[3].pop(intf)
+                bytes[0].append(new_bytes[0])
+                bytes[1].append(new_bytes[1])
+            # add new Process CPU / Mem values to Process list
+            # as process list is dynamic, there are special rules
+            destroy_list = []
+            for named_pid, (cpu_stats, mem_stats) in self.proc.items():
+                new_values = integ_stats[4].pop(named_pid, None)
+                if new_values is None:
+                    # element is obsolete
+                    destroy_list.append(named_pid)
+                else:
+                    new_cpu_value, new_mem_value = new_values
+                    cpu_stats.append(new_cpu_value)
+                    mem_stats.append(new_mem_value)
+            # destroy obsolete elements
+            for named_pid in destroy_list:
+                for series in self.proc.pop(named_pid):
+                    self.store.release(series)
+            # add new elements
+            for named_pid, (new_cpu_value, new_mem_value) in integ_stats[4].items():
+                cpu_stats, mem_stats = self.store.series(), self.store.series()
+                cpu_stats.append(new_cpu_value)
+                mem_stats.append(new_mem_value)
+                self.proc[named_pid] = cpu_stats, mem_stats
             self.ref_stats = stats
 
-    # remove first data of all lists if size exceeds depth
-    def trunc_depth(self, lst):
-        """ Ensure that the list does not exceed the maimum historic size. """
-        while len(lst) > self.depth:
-            lst.pop(0)
-
 
 # Class used to compile statistics coming from all addresses
 class StatisticsCompiler(object):
-    """ This class handles stores statistics for all addresses and periods. """
+    """ This class handles stores statistics for all addresses and periods.
+    The snapshots of an address make a single series of base intervals of 5 seconds,
+    from which the statistics of all periods are derived. """
 
     def __init__(self, supvisors):
         """ Initializes the statistics dictionary.
-        The dictionary contains a StatisticsInstance entry for each pair of address and period. """
+        The dictionary contains a StatisticsInstance entry for each pair of address and period.
+        The last keyframe received is kept for each address, in order to rebuild the snapshots from the deltas.
+        The last snapshot is kept for each address, as the start of the next base interval. """
+        self.logger = supvisors.logger
         self.data = {address: {period: StatisticsInstance(period, supvisors.options.stats_histo)
             for period in supvisors.options.stats_periods}
             for address in supvisors.address_mapper.addresses}
+        self.keyframes = {}
+        self.ref_stats = {}
 
     def clear(self, address):
         """  For a given address, clear the StatisticsInstance for all periods. """
+        self.keyframes.pop(address, None)
+        self.ref_stats.pop(address, None)
         for period in self.data[address].values():
             period.clear()
 
-    def push_statistics(self, address, stats):
-        """  Insert a new statistics measure for address. """
-        for period in self.data[address].values():
-            period.push_statistics(stats)
+    def push_statistics(self, address, publication):
+        """  Insert a new statistics measure for address.
+        Deltas are ignored until the keyframe they refer to is received. """
+        frame, sequence, body = publication
+        if frame == StatisticsFrames.KEYFRAME:
+            self.keyframes[address] = sequence, body
+            stats = body
+        else:
+            keyframe_sequence, keyframe = self.keyframes.get(address, (None, None))
+            if keyframe_sequence != sequence:
+                self.logger.debug('statistics delta from {} ignored: keyframe {} missing'.format(address, sequence))
+                return
+            stats = apply_delta_statistics(keyframe, body)
+        ref_stats = self.ref_stats.get(address)
+        self.ref_stats[address] = stats
+        if ref_stats:
+            for period in self.data[address].values():
+                period.push_statistics(stats, ref_stats)
@@ -17,8 +17,17 @@
 # limitations under the License.
 # ======================================================================
 
+import cPickle
+import json
 import zmq
 
+from collections import OrderedDict, deque
+from threading import Lock
+
+from supervisor.xmlrpc import capped_int
+
+from supvisors.codec import (decode_event, encode_event, encode_topic, COMPACT_PREFIX, decode_compact_body,
+    decode_compact_event, encode_compact_body, encode_compact_event)
 from supvisors.utils import *
 
 
@@ -31,14 +40,17 @@ def create_zmq_context():
 
 
 class InternalEventPublisher(object):
-    """ This class is the wrapper of the ZeroMQ socket that publishes the events
+    """ This class is the wrapper of the ZeroMQ sockets that publish the events
     to the Supvisors instances.
+    The statistics are published on a dedicated socket, so that they never delay the other events.
     
     Attributes are:
 
         - supvisors: a reference to the Supervisor context,
         - address: the address name where this process is running,
         - socket: the ZeroMQ socket with a PUBLISH pattern, bound on the internal_port defined
+            in the ['supvisors'] section of the Supervisor configuration file,
+        - stats_socket: the ZeroMQ socket with a PUBLISH pattern, bound on the stats_port defined
             in the ['supvisors'] section of the Supervisor configuration file.
     """
 
@@ -50,30 +62,38 @@ class InternalEventPublisher(object):
         supvisors_short_cuts(self, ['logger'])
         # get local address
         self.address = supvisors.address_mapper.local_address
-        # create ZMQ socket
+        # create ZMQ sockets
+        # high-water marks must be set before binding
         self.socket = zmq_context.socket(zmq.PUB)
+        self.socket.setsockopt(zmq.SNDHWM, supvisors.options.internal_hwm)
         url = 'tcp://*:{}'.format(supvisors.options.internal_port)
         self.logger.info('binding InternalEventPublisher to %s' % url)
         self.socket.bind(url)
+        self.stats_socket = zmq_context.socket(zmq.PUB)
+        self.stats_socket.setsockopt(zmq.SNDHWM, supvisors.options.stats_hwm)
+        url = 'tcp://*:{}'.format(supvisors.options.stats_port)
+        self.logger.info('binding InternalEventPublisher statistics to %s' % url)
+        self.stats_socket.bind(url)
 
     def close(self):
-        """ This method closes the PyZMQ socket. """
+        """ This method closes the PyZMQ sockets. """
         self.socket.close()
+        self.stats_socket.close()
 
     def send_tick_event(self, payload):
         """ Publishes the tick event with ZeroMQ. """
         self.logger.debug('send TickEvent {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.TICK, self.address, payload))
+        self.socket.send_multipart(encode_event(InternalEventHeaders.TICK, self.address, payload))
 
     def send_process_event(self, payload):
         """ Publishes the process event with ZeroMQ. """
         self.logger.debug('send ProcessEvent {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.PROCESS, self.address, payload))
+        self.socket.send_multipart(encode_event(InternalEventHeaders.PROCESS, self.address, payload))
 
     def send_statistics(self, payload):
         """ Publishes the statistics with ZeroMQ. """
         self.logger.debug('send Statistics {}'.format(payload))
-        self.socket.send_pyobj((InternalEventHeaders.STATISTICS, self.address, payload))
+        self.stats_socket.send_multipart(encode_event(InternalEventHeaders.STATISTICS, self.address, payload))
 
 
 class InternalEventSubscriber(object):
@@ -81,79 +101,424 @@ class InternalEventSubscriber(object):
 
     Attributes:
         - supvisors: a reference to the Supvisors context,
-        - socket: the PyZMQ subscriber.
+        - socket: the PyZMQ subscriber to the TICK and PROCESS events,
+        - stats_socket: the PyZMQ subscriber to the STATISTICS events,
+        - recorder: the EventRecorder the raw messages received are written to, if any.
     """
 
     def __init__(self, zmq_context, supvisors):
         """ Initialization of the attributes. """
         self.supvisors = supvisors
+        self.recorder = None
+        # high-water marks must be set before connecting
         self.socket = zmq_context.socket(zmq.SUB)
+        self.socket.setsockopt(zmq.RCVHWM, supvisors.options.internal_hwm)
+        self.stats_socket = zmq_context.socket(zmq.SUB)
+        self.stats_socket.setsockopt(zmq.RCVHWM, supvisors.options.stats_hwm)
         # connect all EventPublisher to Supvisors addresses
         for address in supvisors.address_mapper.addresses:
             url = 'tcp://{}:{}'.format(address, supvisors.options.internal_port)
             supvisors.logger.info('connecting InternalEventSubscriber to %s' % url)
             self.socket.connect(url)
+            url = 'tcp://{}:{}'.format(address, supvisors.options.stats_port)
+            supvisors.logger.info('connecting InternalEventSubscriber statistics to %s' % url)
+            self.stats_socket.connect(url)
         supvisors.logger.debug('InternalEventSubscriber connected')
-        self.socket.setsockopt(zmq.SUBSCRIBE, '')
- 
+        # subscribe to all TICK and PROCESS events
+        self.socket.setsockopt(zmq.SUBSCRIBE, encode_topic(InternalEventHeaders.TICK))
+        self.socket.setsockopt(zmq.SUBSCRIBE, encode_topic(InternalEventHeaders.PROCESS))
+        # statistics are filtered by the publishers, according to the stats_addresses option
+        stats_addresses = supvisors.options.stats_addresses
+        if '*' in stats_addresses:
+            self.stats_socket.setsockopt(zmq.SUBSCRIBE, encode_topic(InternalEventHeaders.STATISTICS))
+        else:
+            for address in stats_addresses:
+                self.stats_socket.setsockopt(zmq.SUBSCRIBE, encode_topic(InternalEventHeaders.STATISTICS, address))
+
     def close(self):
-        """ This method closes the PyZMQ socket. """
+        """ This method closes the PyZMQ sockets. """
         self.socket.close()
-
-    def receive(self):
-        """ Reception and pyobj unserialization of one message including:
-        - the message header,
-        - the origin,
-        - the body of the message. """
-        return self.socket.recv_pyobj()
+        self.stats_socket.close()
+
+    def receive(self, flags=0):
+        """ Reception and binary decoding of one message including:
+        - the message topic, made of the message header and the origin,
+        - the body of the message.
+        Use zmq.NOBLOCK in flags to raise zmq.Again instead of waiting for a message. """
+        frames = self.socket.recv_multipart(flags)
+        if self.recorder:
+            self.recorder.record_event(frames)
+        return decode_event(frames)
+
+    def receive_statistics(self, flags=0):
+        """ Reception of one statistics message, WITHOUT decoding.
+        This allows to discard the outdated statistics before paying for their decoding.
+        Use zmq.NOBLOCK in flags to raise zmq.Again instead of waiting for a message. """
+        frames = self.stats_socket.recv_multipart(flags)
+        if self.recorder:
+            self.recorder.record_event(frames)
+        return frames
 
     def disconnect(self, addresses):
-        """ This method disconnects from the PyZMQ socket all addresses passed in parameter. """
+        """ This method disconnects from the PyZMQ sockets all addresses passed in parameter. """
         for address in addresses:
             url = 'tcp://{}:{}'.format(address, self.supvisors.options.internal_port)
             self.supvisors.logger.info('disconnecting InternalEventSubscriber from %s' % url)
             self.socket.disconnect(url)
+            url = 'tcp://{}:{}'.format(address, self.supvisors.options.stats_port)
+            self.supvisors.logger.info('disconnecting InternalEventSubscriber statistics from %s' % url)
+            self.stats_socket.disconnect(url)
+
+
+class PublicationCounters(object):
+    """ Counters on the events published, per header.
+
+    Attributes:
+        - published: the number of events published per header,
+        - bytes: the number of data bytes published per header,
+        - skipped: the number of events not encoded per header because nothing was subscribed to it.
+    """
+
+    def __init__(self):
+        """ Initialization of the attributes. """
+        self.clear()
+
+    def clear(self):
+        """ Reset all counters. """
+        self.published = {}
+        self.bytes = {}
+        self.skipped = {}
+
+    def add_published(self, header, nb_bytes):
+        """ Take into account a new event published. """
+        self.published[header] = self.published.get(header, 0) + 1
+        self.bytes[header] = self.bytes.get(header, 0) + nb_bytes
+
+    def add_skipped(self, header):
+        """ Take into account a new event skipped. """
+        self.skipped[header] = self.skipped.get(header, 0) + 1
+
+    def serial(self):
+        """ Return a serializable form of the counters. """
+        return {header: {'published': self.published.get(header, 0), 'bytes': self.bytes.get(header, 0),
+            'skipped': self.skipped.get(header, 0)}
+            for header in set(self.published) | set(self.skipped)}
 
 
 class EventPublisher(object):
-    """ Class for ZMQ publication of Supvisors events. """
+    """ Class for ZMQ publication of Supvisors events.
+
+    Every event is published as a three-parts message: the header, the sequence number of the event
+    for this header and the data encoded in JSON.
+    The last data published per entity is kept so that a SnapshotServer can provide the current state
+    to the late subscribers.
+    The last events published are kept in a replay buffer, limited by the event_replay_size option,
+    so that a SnapshotServer can also provide the events missed by a subscriber.
+    The heartbeats are neither kept as last values nor replayed, as they do not hold any state.
+
+    The socket is configured with a ZeroMQ XPUB pattern, so that the subscriptions are known.
+    The events having no subscriber are not published. Their status is only encoded as the last value
+    of the entity, so that the snapshots are complete, and it is kept aside to be published as soon as
+    a subscription to its header is received.
+
+    The compact form of the events, as defined in the codec module, is published on a second XPUB socket,
+    bound on the compact_event_port, so that the JSON clients never receive it.
+    Its clients subscribe to the headers prefixed with COMPACT_PREFIX. The compact events are batched per header
+    until the next flush and the batches are compressed if the event_compression option is set.
+    The compact events have the same sequence numbers as the JSON events.
+
+    Attributes:
+        - supvisors: a reference to the Supvisors context,
+        - socket: the PyZMQ publisher of the JSON events,
+        - compact_socket: the PyZMQ publisher of the compact events,
+        - address_versions: the version of the last AddressStatus published per address,
+        - application_serials: the serial form of the last ApplicationStatus published per application,
+        - lock: the lock protecting the sequences and the last values, read from the Supvisors thread,
+        - sequences: the sequence number of the last event published per header,
+        - last_values: the last encoded data published per header and entity,
+        - replay_buffer: the header, the sequence number and the encoded data of the last events published,
+        - replay_bytes: the number of data bytes held in the replay buffer,
+        - replay_dropped: the sequence number of the last event removed from the replay buffer per header,
+        - topics: the topics subscribed by the JSON clients,
+        - compact_topics: the topics subscribed by the compact clients,
+        - subscribed_formats: the subscription status of the JSON and compact formats per header,
+          deduced from the topics,
+        - compact_batches: the sequence number of the first event and the compact events not sent yet, per header,
+        - pending: the status not published per header and entity because nothing was subscribed to the header,
+        - counters: the counters of the events published.
+    """
 
     def __init__(self, zmq_context, supvisors):
         """ Initialization of the attributes. """
         self.supvisors = supvisors
-        self.socket = zmq_context.socket(zmq.PUB)
+        self.address_versions = {}
+        self.application_serials = {}
+        self.lock = Lock()
+        self.sequences = {}
+        self.last_values = OrderedDict()
+        self.replay_buffer = deque()
+        self.replay_bytes = 0
+        self.replay_dropped = {}
+        self.topics = set()
+        self.compact_topics = set()
+        self.subscribed_formats = {}
+        self.compact_batches = OrderedDict()
+        self.pending = OrderedDict()
+        self.counters = PublicationCounters()
+        self.socket = zmq_context.socket(zmq.XPUB)
         # WARN: this is a local binding, only visible to processes located on the same address
         url = 'tcp://127.0.0.1:{}'.format(self.supvisors.options.event_port)
         supvisors.logger.info('binding local Supvisors EventPublisher to %s' % url)
         self.socket.bind(url)
+        self.compact_socket = zmq_context.socket(zmq.XPUB)
+        url = 'tcp://127.0.0.1:{}'.format(self.supvisors.options.compact_event_port)
+        supvisors.logger.info('binding local Supvisors compact EventPublisher to %s' % url)
+        self.compact_socket.bind(url)
 
     def close(self):
-        """ This method closes the PyZMQ socket. """
+        """ This method closes the PyZMQ sockets. """
         self.socket.close()
+        self.compact_socket.close()
+
+    def update_subscriptions(self):
+        """ Read the subscription messages received by the sockets.
+        The pending status whose header becomes subscribed are published. """
+        changed = False
+        for socket, topics in [(self.socket, self.topics), (self.compact_socket, self.compact_topics)]:
+            while True:
+                try:
+                    message = socket.recv(zmq.NOBLOCK)
+                except zmq.Again:
+                    break
+                # first byte is 1 for a subscription and 0 for an unsubscription, followed by the topic
+                if message:
+                    if message[0] == '\x01':
+                        topics.add(message[1:])
+                    else:
+                        topics.discard(message[1:])
+                    changed = True
+        if changed:
+            self.supvisors.logger.debug('event topics subscribed: {} - compact: {}'.format(
+                list(self.topics), list(self.compact_topics)))
+            self.subscribed_formats.clear()
+            for header, key in self.pending.keys():
+                if self.subscribed(header):
+                    status = self.pending.pop((header, key))
+                    self._Senders[header](self, status)
+
+    def subscribed(self, header):
+        """ Return True if any client is subscribed to the header, whatever the format. """
+        return any(self.formats(header))
+
+    def formats(self, header):
+        """ Return True for the JSON format, then for the compact format, if any client is subscribed to it. """
+        try:
+            return self.subscribed_formats[header]
+        except KeyError:
+            encoded_header = header.encode('utf-8')
+            compact_header = COMPACT_PREFIX.encode('utf-8') + encoded_header
+            json_subscribed = any(encoded_header.startswith(topic) for topic in self.topics)
+            compact_subscribed = any(compact_header.startswith(topic) for topic in self.compact_topics)
+            formats = self.subscribed_formats[header] = json_subscribed, compact_subscribed
+            return formats
+
+    def defer(self, header, key, status):
+        """ Return True if the publication is deferred because nothing is subscribed to the header.
+        The status of a deferred publication is kept as the last value of the entity. """
+        self.update_subscriptions()
+        if self.subscribed(header):
+            return False
+        self.pending[header, key] = status
+        data = status.encoded() if header == EventHeaders.ADDRESS else json.dumps(status.serial())
+        with self.lock:
+            self.last_values[header, key] = data
+        self.counters.add_skipped(header)
+        return True
+
+    def publish(self, header, key, data, serial=None):
+        """ Send the encoded data with the next sequence number of the header.
+        Unless key is None, the data is kept as the last value of the entity and for replay.
+        The serial form of the data is used for the compact format. If not provided, it is decoded from data. """
+        json_subscribed, compact_subscribed = self.formats(header)
+        with self.lock:
+            sequence = self.sequences.get(header, 0) + 1
+            self.sequences[header] = sequence
+            if json_subscribed:
+                self.socket.send_multipart([header.encode('utf-8'), str(sequence), data])
+            if key is not None:
+                self.last_values[header, key] = data
+                # keep the event for replay, within the memory limit
+                self.replay_buffer.append((header, sequence, data))
+                self.replay_bytes += len(data)
+                while self.replay_bytes > self.supvisors.options.event_replay_size:
+                    old_header, old_sequence, old_data = self.replay_buffer.popleft()
+                    self.replay_bytes -= len(old_data)
+                    self.replay_dropped[old_header] = old_sequence
+        self.counters.add_published(header, len(data))
+        if compact_subscribed:
+            # the events of a batch must have consecutive sequence numbers
+            batch = self.compact_batches.get(header)
+            if batch and batch[0] + len(batch[1]) != sequence:
+                self.flush_compact(header)
+                batch = None
+            if not batch:
+                batch = self.compact_batches[header] = sequence, []
+            batch[1].append(encode_compact_event(header, json.loads(data) if serial is None else serial))
+            if len(batch[1]) >= self._Compact_batch_size:
+                self.flush_compact(header)
+
+    def flush(self):
+        """ Send the compact events batched so far. """
+        for header in self.compact_batches.keys():
+            self.flush_compact(header)
+
+    def flush_compact(self, header):
+        """ Send the compact events of the header batched so far, in a single message. """
+        first_sequence, events = self.compact_batches.pop(header)
+        compact_header = COMPACT_PREFIX + header
+        body = encode_compact_body(events, self.supvisors.options.event_compression)
+        with self.lock:
+            self.compact_socket.send_multipart([compact_header.encode('utf-8'), str(first_sequence), body])
+        self.counters.add_published(compact_header, len(body))
+
+    def snapshot(self):
+        """ Return the frames of a snapshot: the sequence numbers per header, encoded in JSON,
+        followed by the header and the last data published for every entity. """
+        with self.lock:
+            frames = [json.dumps(self.sequences)]
+            for (header, _), data in self.last_values.items():
+                frames.append(header.encode('utf-8'))
+                frames.append(data)
+        return frames
+
+    def replay(self, sequences):
+        """ Return the frames of a replay of the events published after the sequence numbers per header.
+        The first frame is '1' and is followed by the header, the sequence number and the data of every event
+        to replay, in order of publication.
+        If any of these events is not in the replay buffer anymore, the only frame is '0'.
+        The buffer is read from the most recent event, so the cost is proportional to the number of events missed. """
+        with self.lock:
+            if any(sequence < self.replay_dropped.get(header, 0) for header, sequence in sequences.items()):
+                return ['0']
+            expected = {header: sequence for header, sequence in sequences.items()
+                if sequence < self.sequences.get(header, 0)}
+            events = []
+            for header, sequence, data in reversed(self.replay_buffer):
+                if not expected:
+                    break
+                if header in expected:
+                    if sequence > expected[header]:
+                        events.append((header, sequence, data))
+                    else:
+                        del expected[header]
+        frames = ['1']
+        for header, sequence, data in reversed(events):
+            frames.extend([header.encode('utf-8'), str(sequence), data])
+        return frames
 
     def send_supvisors_status(self, status):
         """ This method sends a serialized form of the supvisors status through the socket. """
-        self.supvisors.logger.debug('send SupvisorsStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.SUPVISORS, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        if not self.defer(EventHeaders.SUPVISORS, EventHeaders.SUPVISORS, status):
+            self.supvisors.logger.debug('send SupvisorsStatus {}'.format(status))
+            serial = status.serial()
+            self.publish(EventHeaders.SUPVISORS, EventHeaders.SUPVISORS, json.dumps(serial), serial)
 
     def send_address_status(self, status):
-        """ This method sends a serialized form of the address status through the socket. """
-        self.supvisors.logger.debug('send RemoteStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.ADDRESS, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        """ This method sends a serialized form of the address status through the socket.
+        If the event_heartbeat option is set and the status is unchanged since its last publication,
+        a heartbeat including only the address name and the times is sent instead.
+        In this case, the times of the last value are updated for the snapshots. """
+        if self.supvisors.options.event_heartbeat and self.address_versions.get(status.address_name) == status.version:
+            with self.lock:
+                self.last_values[EventHeaders.ADDRESS, status.address_name] = status.encoded()
+            self.update_subscriptions()
+            if self.subscribed(EventHeaders.HEARTBEAT):
+                self.supvisors.logger.trace('send Heartbeat {}'.format(status.address_name))
+                serial = {'address_name': status.address_name, 'remote_time': capped_int(status.remote_time),
+                    'local_time': capped_int(status.local_time)}
+                self.publish(EventHeaders.HEARTBEAT, None, json.dumps(serial), serial)
+            else:
+                self.counters.add_skipped(EventHeaders.HEARTBEAT)
+        elif not self.defer(EventHeaders.ADDRESS, status.address_name, status):
+            self.supvisors.logger.debug('send RemoteStatus {}'.format(status.address_name))
+            self.address_versions[status.address_name] = status.version
+            self.publish(EventHeaders.ADDRESS, status.address_name, status.encoded())
 
     def send_application_status(self, status):
-        """ This method sends a serialized form of the application status through the socket. """
-        self.supvisors.logger.debug('send ApplicationStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.APPLICATION, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        """ This method sends a serialized form of the application status through the socket.
+        Nothing is sent if the serialized form is unchanged since its last publication. """
+        if not self.defer(EventHeaders.APPLICATION, status.application_name, status):
+            serial = status.serial()
+            if self.application_serials.get(serial['application_name']) == serial:
+                self.supvisors.logger.trace('ApplicationStatus {} unchanged'.format(serial['application_name']))
+            else:
+                self.supvisors.logger.debug('send ApplicationStatus {}'.format(serial))
+                self.application_serials[serial['application_name']] = serial
+                self.publish(EventHeaders.APPLICATION, serial['application_name'], json.dumps(serial), serial)
 
     def send_process_status(self, status):
         """ This method sends a serialized form of the process status through the socket. """
-        self.supvisors.logger.debug('send ProcessStatus {}'.format(status))
-        self.socket.send_string(EventHeaders.PROCESS, zmq.SNDMORE)
-        self.socket.send_json(status.serial())
+        if not self.defer(EventHeaders.PROCESS, status.namespec(), status):
+            self.supvisors.logger.debug('send ProcessStatus {}'.format(status))
+            serial = status.serial()
+            self.publish(EventHeaders.PROCESS, status.namespec(), json.dumps(serial), serial)
+
+    # the maximum number of compact events sent in a single message
+    _Compact_batch_size = 100
+
+    # the method used to publish the pending status, per header
+    _Senders = {EventHeaders.SUPVISORS: send_supvisors_status,
+        EventHeaders.ADDRESS: send_address_status,
+        EventHeaders.APPLICATION: send_application_status,
+        EventHeaders.PROCESS: send_process_status}
+
+
+class SnapshotServer(object):
+    """ Class for serving the snapshots of the Supvisors events to the late subscribers.
+
+    The snapshot is made of the last values kept by the EventPublisher.
+    The requests including the sequence numbers of the last events received are replay requests,
+    served from the replay buffer of the EventPublisher.
+    The socket is polled from the Supvisors thread.
+
+    Attributes:
+        - supvisors: a reference to the Supvisors context,
+        - publisher: the EventPublisher holding the last values,
+        - socket: the PyZMQ router.
+    """
+
+    def __init__(self, zmq_context, publisher, supvisors):
+        """ Initialization of the attributes. """
+        self.supvisors = supvisors
+        self.publisher = publisher
+        self.socket = zmq_context.socket(zmq.ROUTER)
+        # WARN: this is a local binding, only visible to processes located on the same address
+        url = 'tcp://127.0.0.1:{}'.format(self.supvisors.options.snapshot_port)
+        supvisors.logger.info('binding local Supvisors SnapshotServer to %s' % url)
+        self.socket.bind(url)
+
+    def close(self):
+        """ This method closes the PyZMQ socket. """
+        self.socket.close()
+
+    def serve(self, flags=0):
+        """ Reply to one snapshot or replay request.
+        The reply includes the routing envelope and the request frames, followed by the snapshot or replay frames.
+        A snapshot request is made of a single frame. A replay request has a second frame with the sequence numbers
+        of the last events received per header, encoded in JSON. """
+        frames = self.socket.recv_multipart(flags)
+        if len(frames) > 2:
+            try:
+                sequences = json.loads(frames[2])
+            except ValueError:
+                self.supvisors.logger.warn('invalid replay request: {}'.format(frames[2]))
+                reply = ['0']
+            else:
+                self.supvisors.logger.debug('replay events after {}'.format(sequences))
+                reply = self.publisher.replay(sequences)
+        else:
+            reply = self.publisher.snapshot()
+        self.socket.send_multipart(frames + reply)
 
 
 class EventSubscriber(object):
@@ -166,17 +531,31 @@ class EventSubscriber(object):
 
         - a ZeroMQ context,
         - the event port number used by **Supvisors** to publish its events,
-        - a logger reference to log traces.
+        - a logger reference to log traces,
+        - optionally, the snapshot port number used by **Supvisors** to provide the current state,
+        - optionally, the compact flag, to receive the events in the compact format.
+
+    When the compact flag is set, the event port number is the one used by **Supvisors** to publish
+    the compact events. Whatever the format, the events are decoded into the same serial forms.
 
     Attributes:
 
         - logger: the reference to the logger,
-        - socket: the ZeroMQ socket connected to **Supvisors**.
+        - socket: the ZeroMQ socket connected to **Supvisors**,
+        - snapshot_socket: the ZeroMQ ``DEALER`` socket connected to the snapshot port, if any,
+        - compact: True if the events are subscribed in the compact format,
+        - topics: the headers subscribed,
+        - pending: the events already decoded from a compact message and not received yet,
+        - request_id: the identifier of the last snapshot request.
     """
 
-    def __init__(self, zmq_context, event_port, logger):
+    def __init__(self, zmq_context, event_port, logger, snapshot_port=None, compact=False):
         """ Initialization of the attributes. """
         self.logger = logger
+        self.compact = compact
+        self.topics = set()
+        self.pending = deque()
+        self.request_id = 0
         # create ZeroMQ socket
         self.socket = zmq_context.socket(zmq.SUB)
         # WARN: this is a local binding, only visible to processes located on the same address
@@ -184,15 +563,25 @@ class EventSubscriber(object):
         self.logger.info('connecting EventSubscriber to Supvisors at %s' % url)
         self.socket.connect(url)
         self.logger.debug('EventSubscriber connected')
+        # create ZeroMQ socket for snapshots
+        self.snapshot_socket = None
+        if snapshot_port:
+            self.snapshot_socket = zmq_context.socket(zmq.DEALER)
+            self.snapshot_socket.setsockopt(zmq.LINGER, 0)
+            url = 'tcp://127.0.0.1:{}'.format(snapshot_port)
+            self.logger.info('connecting EventSubscriber to Supvisors snapshots at %s' % url)
+            self.snapshot_socket.connect(url)
 
     def close(self):
-        """ Close the ZeroMQ socket. """
+        """ Close the ZeroMQ sockets. """
         self.socket.close()
+        if self.snapshot_socket:
+            self.snapshot_socket.close()
 
     # subscription part
     def subscribe_all(self):
         """ Subscription to all events. """
-        self.socket.setsockopt(zmq.SUBSCRIBE, '')
+        self.subscribe(u'')
 
     def subscribe_supvisors_status(self):
         """ Subscription to Supvisors status events. """
@@ -210,14 +599,23 @@ class EventSubscriber(object):
         """ Subscription to Process status events. """
         self.subscribe(EventHeaders.PROCESS)
 
+    def subscribe_heartbeat(self):
+        """ Subscription to Address heartbeat events. """
+        self.subscribe(EventHeaders.HEARTBEAT)
+
     def subscribe(self, code):
         """ Subscription to the event named code. """
-        self.socket.setsockopt(zmq.SUBSCRIBE, code.encode('utf-8'))
+        self.topics.add(code)
+        self.socket.setsockopt(zmq.SUBSCRIBE, self.topic(code))
+
+    def subscribed(self, header):
+        """ Return True if the events having this header are subscribed. """
+        return any(header.startswith(topic) for topic in self.topics)
 
     # unsubscription part
     def unsubscribe_all(self):
         """ Subscription to all events. """
-        self.socket.setsockopt(zmq.UNSUBSCRIBE, '')
+        self.unsubscribe(u'')
 
     def unsubscribe_supvisors_status(self):
         """ Subscription to Supvisors status events. """
@@ -235,18 +633,87 @@ class EventSubscriber(object):
         """ Subscription to Process status events. """
         self.unsubscribe(EventHeaders.PROCESS)
 
+    def unsubscribe_heartbeat(self):
+        """ Remove subscription to Address heartbeat events. """
+        self.unsubscribe(EventHeaders.HEARTBEAT)
+
     def unsubscribe(self, code):
         """ Remove subscription to the event named code. """
-        self.socket.setsockopt(zmq.UNSUBSCRIBE, code.encode('utf-8'))
+        self.topics.discard(code)
+        self.socket.setsockopt(zmq.UNSUBSCRIBE, self.topic(code))
+
+    def topic(self, code):
+        """ Return the ZeroMQ topic corresponding to the event named code, depending on the format. """
+        if self.compact:
+            code = COMPACT_PREFIX + code
+        return code.encode('utf-8')
 
     # reception part
     def receive(self):
-        """ Reception of two-parts message:
+        """ Reception of three-parts message:
 
             - header as an unicode string,
+            - sequence number of the event for this header, as a string of digits,
             - data encoded in JSON.
-            """
-        return self.socket.recv_string(), self.socket.recv_json()
+
+        A compact message holds several events. They are returned one by one by the next calls.
+        The messages that are not in the format of the subscriber are discarded.
+        Return the header, the sequence number and the serial form of the event. """
+        while not self.pending:
+            header, sequence, body = self.socket.recv_multipart()
+            header, sequence = header.decode('utf-8'), int(sequence)
+            if header.startswith(COMPACT_PREFIX) != self.compact:
+                self.logger.debug('discard event {} in unexpected format'.format(header))
+                continue
+            if not self.compact:
+                return header, sequence, json.loads(body)
+            header = header[len(COMPACT_PREFIX):]
+            self.pending.extend((header, sequence + idx, decode_compact_event(header, values))
+                for idx, values in enumerate(decode_compact_body(body)))
+        return self.pending.popleft()
+
+    def ready(self):
+        """ Return True if an event can be received without waiting. """
+        return bool(self.pending) or bool(self.socket.getsockopt(zmq.EVENTS) & zmq.POLLIN)
+
+    def snapshot(self, timeout):
+        """ Request the current state to **Supvisors** and wait for the reply until timeout (in milliseconds).
+        Return the sequence numbers per header and the list of headers and data that make the current state,
+        or None if no reply has been received or if no snapshot port is configured. """
+        frames = self.request([], timeout)
+        if frames:
+            sequences = json.loads(frames[0])
+            return sequences, [(frames[idx].decode('utf-8'), json.loads(frames[idx + 1]))
+                for idx in range(1, len(frames), 2)]
+
+    def replay(self, sequences, timeout):
+        """ Request to **Supvisors** the events published after the sequence numbers per header
+        and wait for the reply until timeout (in milliseconds).
+        Return the list of headers, sequence numbers and data of the events, in order of publication,
+        or None if the events are not available anymore, if no reply has been received
+        or if no snapshot port is configured. """
+        frames = self.request([json.dumps(sequences)], timeout)
+        if frames and frames[0] == '1':
+            return [(frames[idx].decode('utf-8'), int(frames[idx + 1]), json.loads(frames[idx + 2]))
+                for idx in range(1, len(frames), 3)]
+        if frames:
+            self.logger.warn('events after {} not available anymore'.format(sequences))
+
+    def request(self, frames, timeout):
+        """ Send a request to the snapshot port and wait for the reply until timeout (in milliseconds).
+        Return the frames of the reply that follow the request frames, or None. """
+        if not self.snapshot_socket:
+            return None
+        self.request_id += 1
+        request = str(self.request_id)
+        self.snapshot_socket.send_multipart([request] + frames)
+        while self.snapshot_socket.poll(timeout):
+            reply = self.snapshot_socket.recv_multipart()
+            # discard the replies to the requests that have timed out
+            if reply[0] == request:
+                return reply[len(frames) + 1:]
+            self.logger.debug('discard outdated reply {}'.format(reply[0]))
+        self.logger.warn('no reply received from Supvisors')
 
 
 class RequestPuller(object):
@@ -254,12 +721,14 @@ class RequestPuller(object):
 
     Attributes:
         - supvisors: a reference to the Supvisors context,
-        - socket: the PyZMQ puller.
+        - socket: the PyZMQ puller,
+        - recorder: the EventRecorder the requests received are written to, if any.
     """
 
     def __init__(self, zmq_context, supvisors):
         """ Initialization of the attributes. """
         self.supvisors = supvisors
+        self.recorder = None
         self.socket = zmq_context.socket(zmq.PULL)
         # connect RequestPuller to IPC address
         url = 'ipc://' + IPC_NAME
@@ -270,11 +739,15 @@ class RequestPuller(object):
         """ This method closes the PyZMQ socket. """
         self.socket.close()
 
-    def receive(self):
+    def receive(self, flags=0):
         """ Reception and pyobj unserialization of one message including:
         - the message header,
-        - the body of the message. """
-        return self.socket.recv_pyobj()
+        - the body of the message.
+        Use zmq.NOBLOCK in flags to raise zmq.Again instead of waiting for a message. """
+        data = self.socket.recv(flags)
+        if self.recorder:
+            self.recorder.record_request(data)
+        return cPickle.loads(data)
 
 
 class RequestPusher(object):
@@ -338,6 +811,7 @@ class SupvisorsZmq():
         self.zmq_context = create_zmq_context()
         # create sockets
         self.publisher = EventPublisher(self.zmq_context, supvisors)
+        self.snapshot_server = SnapshotServer(self.zmq_context, self.publisher, supvisors)
         self.internal_subscriber = InternalEventSubscriber(self.zmq_context, supvisors)
         self.internal_publisher = InternalEventPublisher(self.zmq_context, supvisors)
         self.puller = RequestPuller(self.zmq_context, supvisors)
@@ -350,6 +824,7 @@ class SupvisorsZmq():
         self.internal_subscriber.close()
         self.pusher.close()
         self.puller.close()
+        self.snapshot_server.close()
         self.publisher.close()
         # close ZMQ context
         self.zmq_context.term()
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import threading
+import time
+
+from supvisors.client.eventstream import SupvisorsEventStream
+from supvisors.client.subscriber import SupvisorsEventInterface
+from supvisors.supvisorszmq import create_zmq_context, EventPublisher
+from supvisors.tests.base import DummySupvisors
+
+
+class ProcessPayload(object):
+    """ Process status just implementing the methods used for publication. """
+
+    def __init__(self, idx):
+        self.data = {'application_name': u'application_{}'.format(idx % 20),
+            'process_name': u'program_{}'.format(idx), 'statecode': 20, 'statename': u'RUNNING',
+            'expected_exit': True, 'last_event_time': 1476947220, 'addresses': [u'10.0.0.1']}
+
+    def serial(self):
+        return self.data
+
+    def namespec(self):
+        return u'{application_name}:{process_name}'.format(**self.data)
+
+
+class CountingInterface(SupvisorsEventInterface):
+    """ Threaded client that counts the process events received. """
+
+    def __init__(self, *args):
+        SupvisorsEventInterface.__init__(self, *args)
+        self.received = 0
+
+    def on_process_status(self, data):
+        self.received += 1
+
+
+def publish(publisher, payloads, number, received, window):
+    """ Publish number events, keeping at most window events in flight so that the high-water marks are not hit.
+    Return the duration until the reception of the last event. """
+    start = time.time()
+    for idx in range(number):
+        publisher.send_process_status(payloads[idx % len(payloads)])
+        while idx - received() >= window:
+            time.sleep(0.0001)
+    while received() < number:
+        time.sleep(0.0001)
+    return time.time() - start
+
+
+def threaded(supvisors, zmq_context, publisher, payloads, number, window):
+    """ Reception of the events by the SupvisorsEventInterface thread and its callbacks. """
+    client = CountingInterface(zmq_context, supvisors.options.event_port, supvisors.logger)
+    client.subscriber.subscribe_process_status()
+    client.start()
+    time.sleep(1)
+    duration = publish(publisher, payloads, number, lambda: client.received, window)
+    # shutdown latency of the thread
+    start = time.time()
+    client.stop()
+    client.join()
+    return duration, time.time() - start
+
+
+def stream(supvisors, zmq_context, publisher, payloads, number, window):
+    """ Reception of the typed events by iterating the SupvisorsEventStream, in a consumer thread
+    that plays the role of the application loop. """
+    client = SupvisorsEventStream(zmq_context, supvisors.options.event_port, supvisors.logger)
+    client.subscribe(u'process')
+    counter = [0]
+    def consume():
+        for _ in client:
+            counter[0] += 1
+            if counter[0] == number:
+                break
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    time.sleep(1)
+    duration = publish(publisher, payloads, number, lambda: counter[0], window)
+    consumer.join()
+    # no thread to stop
+    start = time.time()
+    client.close()
+    return duration, time.time() - start
+
+
+def run(number, window):
+    """ Compare the throughput of both clients on the same publisher. """
+    supvisors = DummySupvisors()
+    zmq_context = create_zmq_context()
+    publisher = EventPublisher(zmq_context, supvisors)
+    payloads = [ProcessPayload(idx) for idx in range(300)]
+    print('{:<30} {:>14} {:>16}'.format('client', 'events/s', 'shutdown (ms)'))
+    for label, func in [('SupvisorsEventInterface', threaded), ('SupvisorsEventStream', stream)]:
+        duration, shutdown = func(supvisors, zmq_context, publisher, payloads, number, window)
+        print('{:<30} {:>14.0f} {:>16.1f}'.format(label, number / duration, shutdown * 1e3))
+    publisher.close()
+    zmq_context.term()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the Supvisors event clients.')
+    parser.add_argument('-n', '--number', type=int, default=20000, help='the number of events published')
+    parser.add_argument('-w', '--window', type=int, default=500, help='the maximum number of events in flight')
+    args = parser.parse_args()
+    run(args.number, args.window)
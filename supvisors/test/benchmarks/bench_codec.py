@@ -0,0 +1,59 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import cPickle
+import json
+
+from supvisors.codec import decode_event, encode_event
+from benchmarks.common import measure, process_payload, report, statistics_payload
+from supvisors.utils import InternalEventHeaders, StatisticsFrames
+
+
+def pickle_json_path(event_type, origin, payload):
+    """ Legacy path: pyobj on the internal bus, then JSON re-encoding towards the Supervisor thread. """
+    message = cPickle.loads(cPickle.dumps((event_type, origin, payload), cPickle.HIGHEST_PROTOCOL))
+    return json.loads(json.dumps(message))
+
+def codec_path(event_type, origin, payload):
+    """ Binary path: struct-packed frames decoded once. """
+    return decode_event(encode_event(event_type, origin, payload))
+
+
+def run(nb_processes, number):
+    """ Compare the cost of both paths for every internal event type. """
+    events = [('TICK', InternalEventHeaders.TICK, {'when': 1476947220}),
+        ('PROCESS', InternalEventHeaders.PROCESS, process_payload()),
+        ('STATISTICS ({} processes)'.format(nb_processes), InternalEventHeaders.STATISTICS,
+            (StatisticsFrames.KEYFRAME, 0, statistics_payload(nb_processes=nb_processes)))]
+    for label, event_type, payload in events:
+        # compare sizes on the wire
+        pickle_size = len(cPickle.dumps((event_type, '10.0.0.1', payload), cPickle.HIGHEST_PROTOCOL))
+        codec_size = sum(len(frame) for frame in encode_event(event_type, '10.0.0.1', payload))
+        report('{} - pickle: {} bytes / codec: {} bytes'.format(label, pickle_size, codec_size),
+            [('pickle + JSON', measure(lambda: pickle_json_path(event_type, '10.0.0.1', payload), number)),
+             ('binary codec', measure(lambda: codec_path(event_type, '10.0.0.1', payload), number))])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the internal event codec.')
+    parser.add_argument('-p', '--processes', type=int, default=300, help='the number of processes in statistics')
+    parser.add_argument('-n', '--number', type=int, default=1000, help='the number of calls per series')
+    args = parser.parse_args()
+    run(args.processes, args.number)
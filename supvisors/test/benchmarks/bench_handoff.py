@@ -0,0 +1,124 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import json
+import threading
+import time
+
+from SimpleXMLRPCServer import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+from supervisor.medusa import asyncore_25 as asyncore
+from supervisor.xmlrpc import SupervisorTransport
+from xmlrpclib import ServerProxy
+
+from supvisors.mainloop import SupervisorEventQueue
+from supvisors.tests.base import DummyLogger
+from supvisors.utils import InternalEventHeaders, RemoteCommEvents
+
+
+class Receiver(object):
+    """ Consumer role of the Supervisor thread: stores the reception dates. """
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.latencies = []
+        self.received = threading.Event()
+        self.done = threading.Event()
+
+    def on_event(self, event_type, event_data):
+        """ Store the latency of the event, whose data holds the emission date. """
+        self.latencies.append(time.time() - event_data[2]['when'])
+        self.received.set()
+        if len(self.latencies) == self.expected:
+            self.done.set()
+
+    def wait(self, paced):
+        """ In paced mode, wait for the reception of the last event sent. """
+        if paced:
+            self.received.wait(1)
+            self.received.clear()
+
+
+class QuietHandler(SimpleXMLRPCRequestHandler):
+    """ Request handler that does not log every request. """
+
+    def log_message(self, format, *args):
+        pass
+
+
+def loopback(number, paced):
+    """ Legacy path: JSON message sent to the local XML-RPC server with sendRemoteCommEvent. """
+    receiver = Receiver(number)
+    server = SimpleXMLRPCServer(('127.0.0.1', 0), QuietHandler, logRequests=False)
+    server.register_function(lambda event_type, data: receiver.on_event(event_type, json.loads(data)) or True,
+        'supervisor.sendRemoteCommEvent')
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    proxy = ServerProxy(url, SupervisorTransport('', '', url))
+    start = time.time()
+    for _ in range(number):
+        message = InternalEventHeaders.TICK, '10.0.0.1', {'when': time.time()}
+        proxy.supervisor.sendRemoteCommEvent(RemoteCommEvents.SUPVISORS_EVENT, json.dumps(message))
+        receiver.wait(paced)
+    receiver.done.wait(60)
+    duration = time.time() - start
+    server.shutdown()
+    thread.join()
+    server.server_close()
+    return duration, receiver.latencies
+
+
+def event_queue(number, paced):
+    """ New path: in-process queue with a wakeup pipe polled by an asyncore loop. """
+    receiver = Receiver(number)
+    queue = SupervisorEventQueue(DummyLogger(), receiver.on_event)
+    # the asyncore loop plays the role of the Supervisor thread
+    thread = threading.Thread(target=lambda: [asyncore.poll(0.1) for _ in iter(lambda: receiver.done.is_set(), True)])
+    thread.start()
+    start = time.time()
+    for _ in range(number):
+        queue.put(RemoteCommEvents.SUPVISORS_EVENT, (InternalEventHeaders.TICK, '10.0.0.1', {'when': time.time()}))
+        receiver.wait(paced)
+    receiver.done.wait(60)
+    duration = time.time() - start
+    thread.join()
+    queue.close()
+    return duration, receiver.latencies
+
+
+def run(number):
+    """ Compare the latency and the throughput of both hand-off paths.
+    The latency is measured with one event in flight at a time.
+    The throughput is measured with events sent as fast as possible. """
+    print('{:<20} {:>12} {:>12} {:>12} {:>14}'.format('path', 'mean (us)', 'median (us)', 'max (us)', 'events/s'))
+    for label, func in [('XML-RPC loopback', loopback), ('event queue', event_queue)]:
+        _, latencies = func(number, True)
+        duration, _ = func(number, False)
+        latencies.sort()
+        print('{:<20} {:>12.1f} {:>12.1f} {:>12.1f} {:>14.0f}'.format(label,
+            sum(latencies) / len(latencies) * 1e6, latencies[len(latencies) / 2] * 1e6,
+            latencies[-1] * 1e6, number / duration))
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the hand-off from the main loop to the Supervisor thread.')
+    parser.add_argument('-n', '--number', type=int, default=2000, help='the number of events sent')
+    args = parser.parse_args()
+    run(args.number)
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+import subprocess
+import time
+
+from supvisors.statistics import ProcessSampler, instant_process_statistics
+from benchmarks.common import report
+
+
+def spawn(nb_processes):
+    """ Start sleeping processes, one in ten having a child. """
+    devnull = open(os.devnull, 'w')
+    processes = []
+    for idx in range(nb_processes):
+        command = ['sh', '-c', 'sleep 600 & wait'] if idx % 10 == 0 else ['sleep', '600']
+        processes.append(subprocess.Popen(command, stdout=devnull, stderr=devnull))
+    # let the shells fork their children
+    time.sleep(1)
+    return processes
+
+
+def kill(processes):
+    """ Stop the processes and their children. """
+    subprocess.call(['pkill', '-P', ','.join(str(process.pid) for process in processes)])
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def run(counts, baseline_limit):
+    """ Compare the cost of a sample of the process statistics with and without cached handles. """
+    for nb_processes in counts:
+        processes = spawn(nb_processes)
+        try:
+            named_pids = [('program_{}'.format(idx), process.pid) for idx, process in enumerate(processes)]
+            # the baseline cost is quadratic, so it is measured on a subset and extrapolated if needed
+            subset = named_pids[:baseline_limit]
+            start = time.time()
+            for _, pid in subset:
+                instant_process_statistics(pid)
+            baseline = (time.time() - start) * len(named_pids) / len(subset)
+            label = 'new Process + children scan'
+            if len(subset) < len(named_pids):
+                label += ' (extrapolated)'
+            sampler = ProcessSampler()
+            start = time.time()
+            sampler.sample(named_pids)
+            first = time.time() - start
+            start = time.time()
+            sampler.sample(named_pids)
+            cached = time.time() - start
+            report('sample of {} monitored pids ({} system processes)'.format(nb_processes, len(sampler.ppids)),
+                [(label, baseline * 1e6), ('ProcessSampler - first sample', first * 1e6),
+                ('ProcessSampler - cached handles', cached * 1e6)])
+        finally:
+            kill(processes)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the sampling of the process statistics.')
+    parser.add_argument('-p', '--processes', type=int, nargs='+', default=[50, 500, 5000],
+        help='the numbers of monitored processes')
+    parser.add_argument('-l', '--limit', type=int, default=200,
+        help='the maximum number of processes sampled without cached handles')
+    args = parser.parse_args()
+    run(args.processes, args.limit)
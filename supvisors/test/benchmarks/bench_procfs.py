@@ -0,0 +1,62 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+
+from supvisors.procfs import ProcReader
+from supvisors.statistics import (ProcessSampler, instant_cpu_statistics, instant_io_statistics,
+    instant_memory_statistics)
+from benchmarks.bench_process_sampler import kill, spawn
+from benchmarks.common import measure, report
+
+
+def run(number, nb_processes):
+    """ Compare the cost of the statistics sampled with psutil and with the /proc reader. """
+    reader = ProcReader.create()
+    if reader is None:
+        print('/proc is not available')
+        return
+    for title, func in [('cpu', instant_cpu_statistics), ('memory', instant_memory_statistics),
+            ('io', instant_io_statistics)]:
+        report('{} statistics'.format(title),
+            [('psutil', measure(func, number)), ('ProcReader', measure(lambda: func(reader), number))])
+    processes = spawn(nb_processes)
+    try:
+        named_pids = [('program_{}'.format(idx), process.pid) for idx, process in enumerate(processes)]
+        named_pids.append(('myself', os.getpid()))
+        samplers = [ProcessSampler(False), ProcessSampler()]
+        # first samples to fill the handles
+        for sampler in samplers:
+            sampler.sample(named_pids)
+        report('sample of {} monitored pids'.format(len(named_pids)),
+            [('ProcessSampler - psutil', measure(lambda: samplers[0].sample(named_pids), 10)),
+            ('ProcessSampler - ProcReader', measure(lambda: samplers[1].sample(named_pids), 10))])
+    finally:
+        kill(processes)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the /proc reader against psutil.')
+    parser.add_argument('-n', '--number', type=int, default=1000,
+        help='the number of calls of the system statistics')
+    parser.add_argument('-p', '--processes', type=int, default=500,
+        help='the number of monitored processes')
+    args = parser.parse_args()
+    run(args.number, args.processes)
@@ -0,0 +1,84 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import random
+
+from supvisors.statistics import StatisticsInstance
+from supvisors.utils import get_stats
+from benchmarks.common import measure, next_statistics_payload, report, statistics_payload
+
+
+def filled_instance(vectorized, nb_processes, depth):
+    """ Return a StatisticsInstance whose series are full. """
+    instance = StatisticsInstance(5, depth, vectorized)
+    stats = statistics_payload(nb_processes=nb_processes)
+    for _ in range(depth):
+        next_stats = next_statistics_payload(stats, 1.0)
+        instance.push_statistics(next_stats, stats)
+        stats = next_stats
+    return instance, stats
+
+
+def all_series(instance):
+    """ Return all the series of a StatisticsInstance. """
+    series = list(instance.cpu) + [instance.mem]
+    for recv, sent in instance.io.values():
+        series.extend((recv, sent))
+    for cpu, mem in instance.proc.values():
+        series.extend((cpu, mem))
+    return series
+
+
+def run(nb_processes, depth, number):
+    """ Compare the cost of the statistics analysis with the pure-Python store and the NumPy store. """
+    print('{} processes, depth {}'.format(nb_processes, depth))
+    results = {}
+    for vectorized in (False, True):
+        instance, stats = filled_instance(vectorized, nb_processes, depth)
+        series = all_series(instance)
+        selected = random.choice(instance.proc.values())
+        def analyze_all():
+            # a new tick invalidates the NumPy analysis
+            instance.store.tick()
+            for item in series:
+                item.append(1.0)
+            return [get_stats(item) for item in series]
+        def render():
+            # the process page analyzes the CPU and memory series of the selected process
+            return get_stats(selected[0]), get_stats(selected[1])
+        def tick_and_render():
+            instance.store.tick()
+            for item in series:
+                item.append(1.0)
+            return render()
+        results[vectorized] = (measure(analyze_all, number), measure(render, number * 10),
+            measure(tick_and_render, number))
+    for idx, title in enumerate(('analysis of all the series ({} series)'.format(len(series)),
+            'render of a process (analysis cached)', 'first render after a tick')):
+        report(title, [('pure Python', results[False][idx]), ('NumPy', results[True][idx])])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the analysis of the statistics series.')
+    parser.add_argument('-p', '--processes', type=int, default=1000, help='the number of processes in statistics')
+    parser.add_argument('-d', '--depth', type=int, default=200, help='the depth of the statistics history')
+    parser.add_argument('-n', '--number', type=int, default=5, help='the number of calls per series')
+    args = parser.parse_args()
+    run(args.processes, args.depth, args.number)
@@ -0,0 +1,64 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from supvisors.codec import decode_event, encode_event
+from supvisors.statistics import StatisticsEncoder, apply_delta_statistics
+from benchmarks.common import measure, next_statistics_payload, report, statistics_payload
+from supvisors.utils import InternalEventHeaders
+
+
+def run(nb_processes, changed_ratio, keyframe_period, number):
+    """ Compare the volume and the cost of the statistics publication with and without deltas. """
+    stats = [statistics_payload(nb_processes=nb_processes)]
+    for _ in range(keyframe_period - 1):
+        stats.append(next_statistics_payload(stats[-1], changed_ratio))
+    # volume published over a keyframe period
+    full_encoder = StatisticsEncoder(1)
+    delta_encoder = StatisticsEncoder(keyframe_period)
+    full_size = delta_size = 0
+    for snapshot in stats:
+        full_size += sum(len(frame) for frame in encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1',
+            full_encoder.encode(snapshot)))
+        delta_size += sum(len(frame) for frame in encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1',
+            delta_encoder.encode(snapshot)))
+    print('{} ticks, {} processes, {:.0%} changed - keyframes only: {} bytes / deltas: {} bytes'.format(
+        keyframe_period, nb_processes, changed_ratio, full_size, delta_size))
+    # cost of a delta publication vs a keyframe publication, including reconstruction on the receiving side
+    keyframe = StatisticsEncoder(1).encode(stats[0])
+    encoder = StatisticsEncoder(keyframe_period)
+    encoder.encode(stats[0])
+    delta = encoder.encode(stats[-1])
+    def full_path():
+        return decode_event(encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1', keyframe))
+    def delta_path():
+        _, _, (_, _, body) = decode_event(encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1', delta))
+        return apply_delta_statistics(stats[0], body)
+    report('publication cost per tick', [('keyframe', measure(full_path, number)),
+        ('delta + reconstruction', measure(delta_path, number))])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the delta-encoded statistics publication.')
+    parser.add_argument('-p', '--processes', type=int, default=300, help='the number of processes in statistics')
+    parser.add_argument('-r', '--ratio', type=float, default=0.2, help='the ratio of processes changing per tick')
+    parser.add_argument('-k', '--keyframe', type=int, default=12, help='the number of ticks between keyframes')
+    parser.add_argument('-n', '--number', type=int, default=1000, help='the number of calls per series')
+    args = parser.parse_args()
+    run(args.processes, args.ratio, args.keyframe, args.number)
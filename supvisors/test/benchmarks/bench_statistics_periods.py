@@ -0,0 +1,73 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import time
+
+from supvisors.statistics import StatisticsCompiler
+from supvisors.utils import StatisticsFrames
+from benchmarks.common import next_statistics_payload, report, statistics_payload
+
+
+class Options(object):
+    """ The options used by the statistics compiler. """
+
+    def __init__(self, periods, depth):
+        self.stats_periods = periods
+        self.stats_histo = depth
+
+
+class AddressMapper(object):
+    """ The address mapper used by the statistics compiler. """
+    addresses = ['10.0.0.1']
+
+
+class Supvisors(object):
+    """ The Supvisors context used by the statistics compiler. """
+
+    def __init__(self, periods, depth):
+        self.logger = None
+        self.options = Options(periods, depth)
+        self.address_mapper = AddressMapper()
+
+
+def run(nb_processes, depth, number, period_sets):
+    """ Measure the cost of a snapshot for the StatisticsCompiler, depending on the periods configured. """
+    snapshots = [statistics_payload(nb_processes=nb_processes)]
+    for _ in range(number):
+        snapshots.append(next_statistics_payload(snapshots[-1]))
+    results = []
+    for periods in period_sets:
+        compiler = StatisticsCompiler(Supvisors(periods, depth))
+        start = time.time()
+        for sequence, stats in enumerate(snapshots):
+            compiler.push_statistics('10.0.0.1', (StatisticsFrames.KEYFRAME, sequence, stats))
+        results.append(('{} period(s) in [{};{}] seconds'.format(len(periods), periods[0], periods[-1]),
+            (time.time() - start) / len(snapshots) * 1e6))
+    report('snapshot of {} processes'.format(nb_processes), results)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the statistics compilation for several periods.')
+    parser.add_argument('-p', '--processes', type=int, default=1000, help='the number of processes in statistics')
+    parser.add_argument('-d', '--depth', type=int, default=200, help='the depth of the statistics history')
+    parser.add_argument('-n', '--number', type=int, default=720, help='the number of snapshots compiled')
+    args = parser.parse_args()
+    run(args.processes, args.depth, args.number,
+        [[5], [5, 60, 600], [5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600]])
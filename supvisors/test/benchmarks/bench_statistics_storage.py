@@ -0,0 +1,52 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+from supvisors.statistics import RingBuffer
+from benchmarks.common import measure, report
+
+
+def run(depth, nb_series, number):
+    """ Compare the cost of a statistics tick when series are lists truncated by the head and ring buffers. """
+    lists = [[float(idx) for idx in range(depth)] for _ in range(nb_series)]
+    buffers = [RingBuffer(depth, range(depth)) for _ in range(nb_series)]
+    def list_tick():
+        for lst in lists:
+            lst.append(1.0)
+            while len(lst) > depth:
+                lst.pop(0)
+    def ring_tick():
+        for series in buffers:
+            series.append(1.0)
+    print('{} series of depth {}'.format(nb_series, depth))
+    report('append per tick', [('list.pop(0)', measure(list_tick, number)),
+        ('RingBuffer', measure(ring_tick, number))])
+    # read access used by the web pages
+    lst, series = lists[0], buffers[0]
+    report('read access of a series', [('list', measure(lambda: (sum(lst), lst[-1], lst[-2]), number)),
+        ('RingBuffer', measure(lambda: (sum(series), series[-1], series[-2]), number))])
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Benchmark of the storage of the statistics series.')
+    parser.add_argument('-d', '--depth', type=int, default=1500, help='the depth of the statistics history')
+    parser.add_argument('-s', '--series', type=int, default=600, help='the number of series')
+    parser.add_argument('-n', '--number', type=int, default=100, help='the number of ticks per series')
+    args = parser.parse_args()
+    run(args.depth, args.series, args.number)
@@ -0,0 +1,63 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import random
+import timeit
+
+
+def statistics_payload(nb_cpu=8, nb_interfaces=4, nb_processes=300):
+    """ Return a fake instant statistics snapshot, with the layout of statistics.instant_statistics. """
+    cpu = [(random.uniform(1e4, 1e6), random.uniform(1e4, 1e6)) for _ in range(nb_cpu + 1)]
+    io = {'eth{}'.format(idx): (random.randint(0, 1 << 40), random.randint(0, 1 << 40))
+        for idx in range(nb_interfaces)}
+    proc = {'application_{}:program_{}'.format(idx % 20, idx):
+            (random.randint(1000, 65000), (random.uniform(0, 1e4), random.uniform(0, 5)))
+        for idx in range(nb_processes)}
+    return 1476947220.5, cpu, random.uniform(0, 100), io, proc
+
+
+def next_statistics_payload(stats, changed_ratio=0.2):
+    """ Return the snapshot following stats, where only a ratio of the processes have consumed resources. """
+    date, cpu, mem, io, proc = stats
+    cpu = [(work + random.uniform(0, 500), idle + random.uniform(0, 500)) for work, idle in cpu]
+    io = {intf: (recv + random.randint(0, 1 << 20), sent + random.randint(0, 1 << 20))
+        for intf, (recv, sent) in io.items()}
+    proc = {name: (pid, (work + random.uniform(0, 5), memory)) if random.random() < changed_ratio else values
+        for name, values in proc.items() for pid, (work, memory) in [values]}
+    return date + 5, cpu, mem, io, proc
+
+
+def process_payload():
+    """ Return a fake process event payload, with the layout of SupervisorListener.on_process. """
+    return {'processname': u'program_12', 'groupname': u'application_3', 'state': 20,
+        'now': 1476947220, 'pid': 80877, 'expected': True}
+
+
+def measure(func, number):
+    """ Return the mean duration of func in micro-seconds, as the best of 3 series of number calls. """
+    return min(timeit.repeat(func, repeat=3, number=number)) / number * 1e6
+
+
+def report(title, results):
+    """ Print the results, given as a list of (label, duration) with durations in micro-seconds.
+    The first result is used as reference for the ratios. """
+    print(title)
+    reference = results[0][1]
+    for label, duration in results:
+        print('    {:<40} {:>12.2f} us {:>8.2f}x'.format(label, duration, reference / duration))
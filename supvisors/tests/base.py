@@ -124,13 +124,30 @@ class DummyOptions:
 
     def __init__(self):
         self.internal_port = 65100
+        self.internal_hwm = 1000
+        self.stats_port = 65101
+        self.stats_hwm = 10
+        self.internal_batch_size = 100
+        self.internal_record_file = ''
+        self.rpc_pool_size = 4
+        self.rpc_idle_timeout = 60
+        self.rpc_workers = 4
+        self.rpc_timeout = 10
+        self.rpc_multicall_window = 50
         self.event_port = 65200
+        self.snapshot_port = 65201
+        self.compact_event_port = 65202
+        self.event_heartbeat = False
+        self.event_replay_size = 1024
+        self.event_compression = True
         self.synchro_timeout = 10
         self.deployment_file = ''
         self.deployment_strategy = 0
         self.conciliation_strategy = 0
         self.stats_periods = 5, 15, 60
         self.stats_histo = 10
+        self.stats_keyframe_period = 20
+        self.stats_addresses = ['*']
 
 
 class DummyStarter:
@@ -148,6 +165,9 @@ class DummyPublisher:
     def send_supvisors_status(self, status):
         pass
 
+    def flush(self):
+        pass
+
 
 class DummyZmq:
     """ Simple Supvisors ZeroMQ behaviour. """
@@ -155,6 +175,7 @@ class DummyZmq:
     def __init__(self):
         self.internal_subscriber = None
         self.puller = None
+        self.snapshot_server = None
         self.publisher = DummyPublisher()
 
 
@@ -77,6 +77,26 @@ class AddressTest(unittest.TestCase):
         loaded = pickle.loads(dumped)
         self.assertDictEqual(serialized, loaded)
 
+    def test_encoded(self):
+        """ Test the encoded method used to publish the AddressStatus. """
+        import json
+        from supvisors.address import AddressStatus
+        from supvisors.ttypes import AddressStates
+        status = AddressStatus('10.0.0.1', self.supvisors.logger)
+        status._state = AddressStates.RUNNING
+        status.update_times(50.5, 60)
+        # the encoded form is equivalent to the serial form
+        self.assertDictEqual(status.serial(), json.loads(status.encoded()))
+        # the template is kept as long as the version is unchanged, only the times are updated
+        template = status._encoded
+        status.update_times(55, 65)
+        self.assertDictEqual(status.serial(), json.loads(status.encoded()))
+        self.assertIs(template, status._encoded)
+        # a new version renews the template
+        status.state = AddressStates.SILENT
+        self.assertDictEqual(status.serial(), json.loads(status.encoded()))
+        self.assertIsNot(template, status._encoded)
+
     def test_transitions(self):
         """ Test the state transitions of AddressStatus. """
         from supvisors.address import AddressStatus
@@ -87,8 +107,10 @@ class AddressTest(unittest.TestCase):
                 # check all possible transitions from each state
                 status._state = state1
                 if state2 in status._Transitions[state1]:
+                    version = status.version
                     status.state = state2
                     self.assertEqual(state2, status.state)
+                    self.assertEqual(version + 1, status.version)
                     self.assertEqual(AddressStates._to_string(state2), status.state_string())
                     self.assertTrue(len(self.supvisors.logger.messages) == 1)
                     self.assertTrue(self.supvisors.logger.messages.pop()[0] == 'info')
@@ -188,6 +210,32 @@ class AddressTest(unittest.TestCase):
         self.assertEqual(53, status.loading())
 
 
+    def test_refresh_loading(self):
+        """ Test the refresh_loading method. """
+        from supvisors.address import AddressStatus
+        from supvisors.process import ProcessStatus
+        status = AddressStatus('10.0.0.1', self.supvisors.logger)
+        for info in ProcessInfoDatabase:
+            process = ProcessStatus(info['group'], info['name'], self.supvisors)
+            process.add_info('10.0.0.1', info.copy())
+            status.add_process(process)
+        # the published loading is only updated upon refresh
+        self.assertEqual(0, status.version)
+        self.assertEqual(0, status._loading)
+        status.refresh_loading()
+        self.assertEqual(1, status.version)
+        self.assertEqual(4, status._loading)
+        # the version is unchanged if the loading is unchanged
+        status.refresh_loading()
+        self.assertEqual(1, status.version)
+        # change expected_loading of any running process
+        process = random.choice([proc for proc in status.processes.values() if proc.running()])
+        process.rules.expected_loading = 50
+        status.refresh_loading()
+        self.assertEqual(2, status.version)
+        self.assertEqual(53, status._loading)
+
+
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
 
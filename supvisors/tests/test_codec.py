@@ -0,0 +1,169 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import unittest
+
+
+class CodecTest(unittest.TestCase):
+    """ Test case for the codec module. """
+
+    def test_tick(self):
+        """ Test the encoding and decoding of a tick event. """
+        from supvisors.codec import decode_event, encode_event
+        from supvisors.utils import InternalEventHeaders
+        frames = encode_event(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1476947220})
+        self.assertEqual(2, len(frames))
+        self.assertEqual(8, len(frames[1]))
+        event_type, origin, payload = decode_event(frames)
+        self.assertTupleEqual((InternalEventHeaders.TICK, u'10.0.0.1', {'when': 1476947220}),
+            (event_type, origin, payload))
+        # the date is kept as an integer, like the other timestamps
+        self.assertIsInstance(payload['when'], (int, long))
+
+    def test_process(self):
+        """ Test the encoding and decoding of a process event. """
+        from supvisors.codec import decode_event, encode_event
+        from supvisors.utils import InternalEventHeaders
+        payload = {'processname': u'xclock', 'groupname': u'sample_test_1', 'state': 20,
+            'now': 1473888166, 'pid': 80877, 'expected': False}
+        frames = encode_event(InternalEventHeaders.PROCESS, '10.0.0.1', payload)
+        event_type, origin, data = decode_event(frames)
+        self.assertEqual(InternalEventHeaders.PROCESS, event_type)
+        self.assertEqual(u'10.0.0.1', origin)
+        self.assertDictEqual(payload, data)
+        self.assertIs(unicode, type(data['processname']))
+
+    def test_statistics(self):
+        """ Test the encoding and decoding of a statistics event. """
+        from supvisors.codec import CodecError, decode_event, encode_event
+        from supvisors.utils import InternalEventHeaders, StatisticsFrames
+        stats = (8.5, [(25.0, 400.0), (25.0, 125.0), (15.0, 150.0)], 76.1,
+            {'eth0': (1024, 2000), 'lo': (500, 500)},
+            {'sample_test_1:xclock': (80877, (0.15, 1.85)), u'crash:late_segv': (80886, (12.5, 0.2))})
+        payload = (StatisticsFrames.KEYFRAME, 12, stats)
+        frames = encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1', payload)
+        event_type, origin, data = decode_event(frames)
+        self.assertEqual(InternalEventHeaders.STATISTICS, event_type)
+        self.assertEqual((StatisticsFrames.KEYFRAME, 12), data[:2])
+        data = data[2]
+        self.assertEqual(5, len(data))
+        self.assertEqual(8.5, data[0])
+        self.assertListEqual(stats[1], data[1])
+        self.assertEqual(76.1, data[2])
+        self.assertDictEqual(stats[3], data[3])
+        self.assertDictEqual(stats[4], data[4])
+        # check an empty snapshot
+        payload = (StatisticsFrames.KEYFRAME, 0, (8.5, [], 0.0, {}, {}))
+        frames = encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1', payload)
+        self.assertTupleEqual(payload, decode_event(frames)[2])
+        # check a delta
+        payload = (StatisticsFrames.DELTA, 12, (13.5, [(25.0, 400.0)], 76.1, {},
+            {u'crash:late_segv': (80886, (12.5, 0.2))}, [u'lo'], [u'sample_test_1:xclock']))
+        frames = encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1', payload)
+        self.assertTupleEqual(payload, decode_event(frames)[2])
+        # check an unknown frame
+        frames[1] = chr(4) + frames[1][1:]
+        with self.assertRaises(CodecError):
+            decode_event(frames)
+
+    def test_errors(self):
+        """ Test the decoding of invalid messages. """
+        import struct
+        from supvisors.codec import CODEC_VERSION, CodecError, decode_event, encode_event
+        from supvisors.utils import InternalEventHeaders
+        frames = encode_event(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1000})
+        # wrong number of frames
+        with self.assertRaises(CodecError):
+            decode_event(frames[:1])
+        # wrong version
+        with self.assertRaises(CodecError):
+            decode_event([struct.pack('!BB', CODEC_VERSION + 1, InternalEventHeaders.TICK) + '10.0.0.1\0'] + frames[1:])
+        # unknown event type
+        with self.assertRaises(CodecError):
+            decode_event([struct.pack('!BB', CODEC_VERSION, 99) + '10.0.0.1\0'] + frames[1:])
+        # unterminated topic
+        with self.assertRaises(CodecError):
+            decode_event([frames[0][:-1], frames[1]])
+        # truncated body
+        with self.assertRaises(CodecError):
+            decode_event([frames[0], frames[1][:4]])
+
+    def test_peek_statistics(self):
+        """ Test the reading of the statistics frame without decoding. """
+        from supvisors.codec import CodecError, encode_event, peek_statistics
+        from supvisors.utils import InternalEventHeaders, StatisticsFrames
+        frames = encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1',
+            (StatisticsFrames.DELTA, 12, (8.5, [], 0.0, {}, {}, [], [])))
+        self.assertTupleEqual(('10.0.0.1', StatisticsFrames.DELTA, 12), peek_statistics(frames))
+        # not a statistics message
+        with self.assertRaises(CodecError):
+            peek_statistics(encode_event(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1000}))
+        with self.assertRaises(CodecError):
+            peek_statistics(frames[:1])
+
+    def test_topic(self):
+        """ Test the topics used for the subscriptions. """
+        from supvisors.codec import encode_event, encode_topic
+        from supvisors.utils import InternalEventHeaders
+        topic, _ = encode_event(InternalEventHeaders.TICK, '10.0.0.1', {'when': 1000})
+        self.assertEqual(encode_topic(InternalEventHeaders.TICK, '10.0.0.1'), topic)
+        self.assertTrue(topic.startswith(encode_topic(InternalEventHeaders.TICK)))
+        self.assertFalse(topic.startswith(encode_topic(InternalEventHeaders.PROCESS)))
+        # the terminator prevents an address to match another address it is a prefix of
+        self.assertFalse(encode_topic(InternalEventHeaders.TICK, '10.0.0.10').startswith(
+            encode_topic(InternalEventHeaders.TICK, '10.0.0.1')))
+
+    def test_compact(self):
+        """ Test the compact encoding of the external events. """
+        from supvisors.codec import (decode_compact_body, decode_compact_event, encode_compact_body,
+            encode_compact_event, COMPACT_PLAIN, COMPACT_ZLIB)
+        from supvisors.utils import EventHeaders
+        process = {'application_name': 'sample', 'process_name': 'xclock', 'statecode': 20, 'statename': 'RUNNING',
+            'expected_exit': True, 'last_event_time': 1234, 'addresses': ['10.0.0.1']}
+        # the state name is not encoded but deduced from the state code
+        values = encode_compact_event(EventHeaders.PROCESS, process)
+        self.assertListEqual(['sample', 'xclock', 20, True, 1234, ['10.0.0.1']], values)
+        self.assertDictEqual(process, decode_compact_event(EventHeaders.PROCESS, values))
+        heartbeat = {'address_name': '10.0.0.1', 'remote_time': 1234, 'local_time': 1235}
+        self.assertDictEqual(heartbeat, decode_compact_event(EventHeaders.HEARTBEAT,
+            encode_compact_event(EventHeaders.HEARTBEAT, heartbeat)))
+        # small bodies are not compressed
+        body = encode_compact_body([values])
+        self.assertEqual(COMPACT_PLAIN, body[0])
+        self.assertListEqual([values], decode_compact_body(body))
+        # large bodies are compressed on demand
+        body = encode_compact_body([values] * 50)
+        self.assertEqual(COMPACT_ZLIB, body[0])
+        self.assertListEqual([values] * 50, decode_compact_body(body))
+        self.assertEqual(COMPACT_PLAIN, encode_compact_body([values] * 50, False)[0])
+
+    def test_compact_errors(self):
+        """ Test the decoding of corrupted compact bodies. """
+        from supvisors.codec import CodecError, decode_compact_body
+        for body in ['', 'x[]', 'j[', 'zdummy']:
+            with self.assertRaises(CodecError):
+                decode_compact_body(body)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -23,6 +23,24 @@ import unittest
 from supvisors.tests.base import DummySupvisors
 
 
+class DummyProcess(object):
+    """ Simple process with a namespec. """
+
+    def __init__(self, application_name, process_name, required=False):
+        from supvisors.tests.base import DummyClass
+        self.application_name = application_name
+        self.process_name = process_name
+        self.ignore_wait_exit = True
+        self.rules = DummyClass()
+        self.rules.required = required
+
+    def namespec(self):
+        return '{}:{}'.format(self.application_name, self.process_name)
+
+    def state_string(self):
+        return 'STOPPED'
+
+
 class CommanderTest(unittest.TestCase):
     """ Test case for the Commander class of the commander module. """
 
@@ -50,6 +68,58 @@ class StarterTest(unittest.TestCase):
         starter = Starter(self.supvisors)
         self.assertIsNotNone(starter)
 
+    def test_request_failure(self):
+        """ Test the processing of a start request rejected by a remote Supervisor. """
+        from supervisor.xmlrpc import Faults
+        from supvisors.commander import Starter
+        from supvisors.tests.base import DummyClass
+        from supvisors.ttypes import StartingFailureStrategies
+        starter = Starter(self.supvisors)
+        # the requests are not sent
+        started = []
+        def process_job(process, jobs):
+            started.append(process)
+            jobs.append(process)
+        starter.process_job = process_job
+        # the forced states would fail as the info source is a dummy
+        application = DummyClass()
+        application.rules = DummyClass()
+        application.rules.starting_failure_strategy = StartingFailureStrategies.STOP
+        self.supvisors.context.applications['dummy_application'] = application
+        stopped = []
+        self.supvisors.stopper.stop_application = stopped.append
+        xclock = DummyProcess('dummy_application', 'xclock')
+        xfontsel = DummyProcess('dummy_application', 'xfontsel', True)
+        xlogo = DummyProcess('dummy_application', 'xlogo')
+        starter.current_jobs = {'dummy_application': [xclock, xfontsel]}
+        starter.planned_jobs = {'dummy_application': {2: [xlogo]}}
+        # an already started process is not a failure
+        starter.on_request_failure('dummy_application:xclock', '10.0.0.1', Faults.ALREADY_STARTED, 'started')
+        self.assertListEqual([xclock, xfontsel], starter.current_jobs['dummy_application'])
+        # unknown processes are ignored
+        starter.on_request_failure('dummy_application:unknown', '10.0.0.1', Faults.BAD_NAME, 'unknown')
+        self.assertListEqual([xclock, xfontsel], starter.current_jobs['dummy_application'])
+        # the failed process leaves the jobs
+        starter.on_request_failure('dummy_application:xclock', '10.0.0.1', Faults.SPAWN_ERROR, 'spawn error')
+        self.assertListEqual([xfontsel], starter.current_jobs['dummy_application'])
+        self.assertFalse(xclock.ignore_wait_exit)
+        self.assertIn(('warn', 'start request failed on 10.0.0.1: spawn error for optional xclock: '
+            'continue starting of application dummy_application'), self.supvisors.logger.messages)
+        self.assertListEqual([], started)
+        # the failure of a required process applies the starting failure strategy once
+        starter.on_request_failure('dummy_application:xfontsel', '10.0.0.1', Faults.BAD_NAME, 'unknown')
+        self.assertListEqual([application], stopped)
+        self.assertDictEqual({}, starter.planned_jobs)
+        self.assertDictEqual({}, starter.current_jobs)
+        self.assertFalse(starter.in_progress())
+        # when the jobs of the application are over, the next ones are started
+        starter.current_jobs = {'dummy_application': [xclock]}
+        starter.planned_jobs = {'dummy_application': {2: [xlogo]}}
+        starter.on_request_failure('dummy_application:xclock', '10.0.0.1', Faults.BAD_NAME, 'unknown')
+        self.assertListEqual([xlogo], started)
+        self.assertDictEqual({'dummy_application': [xlogo]}, starter.current_jobs)
+        self.assertDictEqual({}, starter.planned_jobs)
+
 
 class StopperTest(unittest.TestCase):
     """ Test case for the Stopper class of the commander module. """
@@ -64,6 +134,20 @@ class StopperTest(unittest.TestCase):
         stopper = Stopper(self.supvisors)
         self.assertIsNotNone(stopper)
 
+    def test_request_failure(self):
+        """ Test the processing of a stop request rejected by a remote Supervisor. """
+        from supervisor.xmlrpc import Faults
+        from supvisors.commander import Stopper
+        stopper = Stopper(self.supvisors)
+        stopper.current_jobs = {'dummy_application': [DummyProcess('dummy_application', 'dummy_program')]}
+        failures = []
+        stopper.process_failure = lambda *args: failures.append(args)
+        # a process that is not running is not a failure
+        stopper.on_request_failure('dummy_application:dummy_program', '10.0.0.1', Faults.NOT_RUNNING, 'not running')
+        self.assertListEqual([], failures)
+        stopper.on_request_failure('dummy_application:dummy_program', '10.0.0.1', Faults.FAILED, 'failed')
+        self.assertListEqual([('dummy_application:dummy_program', 'stop request failed on 10.0.0.1: failed')], failures)
+
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -0,0 +1,186 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import time
+import unittest
+import zmq
+
+from supvisors.tests.base import DummySupvisors
+
+
+class Payload:
+    """ Dummy process status just implementing the methods used for publication. """
+    def __init__(self, data):
+        self.data = data
+    def serial(self):
+        return self.data
+    def namespec(self):
+        return self.data['process_name']
+
+
+class EventStreamTest(unittest.TestCase):
+    """ Test case for the eventstream module. """
+
+    def setUp(self):
+        """ Create a dummy supvisors, a ZMQ context and a publisher. """
+        from supvisors.supvisorszmq import create_zmq_context, EventPublisher
+        self.supvisors = DummySupvisors()
+        self.zmq_context = create_zmq_context()
+        self.publisher = EventPublisher(self.zmq_context, self.supvisors)
+
+    def tearDown(self):
+        """ Destroy the ZMQ context. """
+        self.publisher.close()
+        self.zmq_context.destroy(True)
+
+    def test_make_event(self):
+        """ Test the creation of the typed events. """
+        from supvisors.client.eventstream import make_event, HeartbeatEvent, SupvisorsStatusEvent
+        from supvisors.utils import EventHeaders
+        event = make_event(EventHeaders.SUPVISORS, {'statecode': 2, 'statename': 'OPERATION'})
+        self.assertEqual(SupvisorsStatusEvent(2, 'OPERATION'), event)
+        self.assertEqual('OPERATION', event.statename)
+        # missing fields are set to None
+        self.assertEqual(HeartbeatEvent('10.0.0.1', None, None),
+            make_event(EventHeaders.HEARTBEAT, {'address_name': '10.0.0.1'}))
+        self.assertIsNone(make_event(u'dummy', {}))
+
+    def test_check_sequence(self):
+        """ Test the detection of the gaps in the sequence numbers. """
+        from supvisors.client.eventstream import SupvisorsEventStream
+        stream = SupvisorsEventStream(self.zmq_context, self.supvisors.options.event_port, self.supvisors.logger)
+        events = []
+        # events rejected while waiting for a snapshot
+        self.assertFalse(stream.check_sequence(u'process', 1, events))
+        # without snapshot, the gaps are only logged
+        stream.sequences = {u'process': 3}
+        self.assertFalse(stream.check_sequence(u'process', 3, events))
+        self.assertTrue(stream.check_sequence(u'process', 4, events))
+        self.assertTrue(stream.check_sequence(u'process', 6, events))
+        self.assertEqual(('warn', 'missed process events 5 to 5'), self.supvisors.logger.messages[-1])
+        self.assertTrue(stream.check_sequence(u'address', 12, events))
+        self.assertDictEqual({u'process': 6, u'address': 12}, stream.sequences)
+        self.assertListEqual([], events)
+        # with snapshot, a gap triggers a replay of the missed events
+        requests = []
+        def replay(sequences, timeout):
+            requests.append(sequences)
+            return [(u'process', 7, {'id': 7}), (u'process', 8, {'id': 8}), (u'process', 9, {'id': 9})]
+        stream.subscriber.snapshot_socket = True
+        stream.subscriber.replay = replay
+        self.assertTrue(stream.check_sequence(u'process', 9, events))
+        self.assertListEqual([{u'process': 6}], requests)
+        self.assertListEqual([(u'process', {'id': 7}), (u'process', {'id': 8})], events)
+        self.assertDictEqual({u'process': 9, u'address': 12}, stream.sequences)
+        # the heartbeats are not replayed
+        stream.sequences[u'heartbeat'] = 3
+        self.assertTrue(stream.check_sequence(u'heartbeat', 8, events))
+        self.assertListEqual([{u'process': 6}], requests)
+        self.assertEqual(8, stream.sequences[u'heartbeat'])
+        # a new snapshot is expected if the replay is not possible
+        stream.subscriber.replay = lambda sequences, timeout: None
+        self.assertFalse(stream.check_sequence(u'process', 11, events))
+        self.assertIsNone(stream.sequences)
+        stream.subscriber.snapshot_socket = None
+        stream.close()
+
+    def test_snapshot_failure(self):
+        """ Test that the events are passed through when no snapshot can be received. """
+        from supvisors.client.eventstream import SupvisorsEventStream
+        from supvisors.utils import EventHeaders
+        # no snapshot server
+        stream = SupvisorsEventStream(self.zmq_context, self.supvisors.options.event_port, self.supvisors.logger,
+            self.supvisors.options.snapshot_port)
+        stream._Poll_timeout = 100
+        stream.subscribe(u'process')
+        time.sleep(1)
+        process = Payload({'application_name': 'sample', 'process_name': 'xclock', 'statecode': 20,
+            'statename': 'RUNNING', 'expected_exit': True, 'last_event_time': 1234, 'addresses': ['10.0.0.1']})
+        # the events are dropped while the snapshot is expected
+        for attempt in range(1, stream._Snapshot_attempts):
+            self.publisher.send_process_status(process)
+            self.assertListEqual([], stream.receive(100))
+            self.assertIsNone(stream.sequences)
+            self.assertEqual(attempt, stream.snapshot_failures)
+        # the events are passed through after the last attempt
+        self.publisher.send_process_status(process)
+        self.assertListEqual([(EventHeaders.PROCESS, process.data)], stream.receive(100))
+        self.assertDictEqual({EventHeaders.PROCESS: 3}, stream.sequences)
+        self.assertEqual(0, stream.snapshot_failures)
+        self.assertEqual('error', self.supvisors.logger.messages[-1][0])
+        # same after a replay without reply
+        self.publisher.sequences[EventHeaders.PROCESS] += 1
+        for _ in range(stream._Snapshot_attempts):
+            self.publisher.send_process_status(process)
+            stream.receive(100)
+        self.publisher.send_process_status(process)
+        self.assertListEqual([(EventHeaders.PROCESS, process.data)], stream.receive(100))
+        self.assertDictEqual({EventHeaders.PROCESS: 8}, stream.sequences)
+        stream.close()
+
+    def test_iteration(self):
+        """ Test the reception of typed events, including the snapshot and a subscription change. """
+        from threading import Thread
+        from supvisors.client.eventstream import (SupvisorsEventStream, ProcessStatusEvent,
+            SupvisorsStatusEvent)
+        from supvisors.supvisorszmq import SnapshotServer
+        server = SnapshotServer(self.zmq_context, self.publisher, self.supvisors)
+        stream = SupvisorsEventStream(self.zmq_context, self.supvisors.options.event_port, self.supvisors.logger,
+            self.supvisors.options.snapshot_port)
+        stream.subscribe(u'process')
+        time.sleep(1)
+        # a first process status is published before the snapshot
+        process_1 = Payload({'application_name': 'sample', 'process_name': 'xclock', 'statecode': 20,
+            'statename': 'RUNNING', 'expected_exit': True, 'last_event_time': 1234, 'addresses': ['10.0.0.1']})
+        self.publisher.send_process_status(process_1)
+        # the snapshot is received first, then the events not included
+        thread = Thread(target=server.serve)
+        thread.start()
+        events = iter(stream)
+        self.assertEqual(ProcessStatusEvent(**process_1.data), next(events))
+        thread.join()
+        process_2 = Payload(dict(process_1.data, process_name='xfontsel'))
+        self.publisher.send_process_status(process_2)
+        self.assertEqual(ProcessStatusEvent(**process_2.data), next(events))
+        # the Supvisors status is received after subscription change, snapshot included
+        supvisors_status = Payload({'statecode': 2, 'statename': 'OPERATION'})
+        self.publisher.send_supvisors_status(supvisors_status)
+        stream.subscribe(u'supvisors')
+        time.sleep(1)
+        # the Supvisors status has been deferred as not subscribed until now
+        self.publisher.update_subscriptions()
+        thread = Thread(target=server.serve)
+        thread.start()
+        received = [next(events) for _ in range(3)]
+        thread.join()
+        self.assertItemsEqual([SupvisorsStatusEvent(2, 'OPERATION'), ProcessStatusEvent(**process_1.data),
+            ProcessStatusEvent(**process_2.data)], received)
+        # file descriptor is available for event loops
+        self.assertGreater(stream.fileno(), 0)
+        self.assertListEqual([], stream.receive())
+        stream.close()
+        server.close()
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
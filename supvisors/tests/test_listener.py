@@ -36,6 +36,71 @@ class ListenerTest(unittest.TestCase):
         listener = SupervisorListener(self.supvisors)
         self.assertIsNotNone(listener)
 
+    def test_unstack_event(self):
+        """ Test that a failure on one event of a batch does not prevent the processing of the next ones. """
+        from supvisors.listener import SupervisorListener
+        from supvisors.utils import InternalEventHeaders
+        listener = SupervisorListener(self.supvisors)
+        ticks = []
+        def on_tick_event(address, data):
+            if address == '10.0.0.2':
+                raise ValueError('bad tick')
+            ticks.append(address)
+        self.supvisors.fsm.on_tick_event = on_tick_event
+        published = []
+        self.supvisors.context.publish_applications = lambda: published.append(True)
+        listener.unstack_event([(InternalEventHeaders.TICK, address, {'when': 1000})
+            for address in ['10.0.0.1', '10.0.0.2', '10.0.0.3']])
+        self.assertListEqual(['10.0.0.1', '10.0.0.3'], ticks)
+        self.assertListEqual([True], published)
+        messages = [message for level, message in self.supvisors.logger.messages if level == 'critical']
+        self.assertEqual(1, len(messages))
+        self.assertIn('ValueError: bad tick', messages[0])
+
+    def test_force_process_state(self):
+        """ Test the fake process events published for a process unknown in the local Supervisor. """
+        from supervisor.states import ProcessStates
+        from supvisors.listener import SupervisorListener
+        from supvisors.tests.base import DummyClass
+        listener = SupervisorListener(self.supvisors)
+        payloads = []
+        listener.publisher = DummyClass()
+        listener.publisher.send_process_event = payloads.append
+        listener.force_process_fatal('sample:xclock')
+        listener.force_process_unknown('sample:xfontsel')
+        self.assertListEqual([('sample', 'xclock', ProcessStates.FATAL), ('sample', 'xfontsel', ProcessStates.UNKNOWN)],
+            [(payload['groupname'], payload['processname'], payload['state']) for payload in payloads])
+
+    def test_counters(self):
+        """ Test the counters on the internal processing. """
+        from supvisors.listener import SupervisorListener
+        from supvisors.mainloop import BatchCounters, ConflationCounters
+        from supvisors.rpcrequests import RPCPoolCounters
+        from supvisors.statistics import SamplingCounters
+        from supvisors.supvisorszmq import PublicationCounters
+        from supvisors.tests.base import DummyClass
+        listener = SupervisorListener(self.supvisors)
+        listener.main_loop = DummyClass()
+        listener.main_loop.batch_counters = BatchCounters()
+        listener.main_loop.batch_counters.add(3, 1)
+        listener.main_loop.conflation_counters = ConflationCounters()
+        listener.main_loop.proxy_pool = DummyClass()
+        listener.main_loop.proxy_pool.counters = RPCPoolCounters()
+        listener.main_loop.workers = DummyClass()
+        listener.main_loop.workers.pending = lambda: 2
+        self.supvisors.zmq.publisher.counters = PublicationCounters()
+        listener.collector = DummyClass()
+        listener.collector.counters = SamplingCounters()
+        counters = listener.counters()
+        self.assertItemsEqual(['event_batches', 'statistics_conflation', 'proxy_pool', 'pending_requests',
+            'publication', 'statistics_sampling'], counters.keys())
+        self.assertDictContainsSubset({'batches': 1, 'events': 3}, counters['event_batches'])
+        self.assertEqual(2, counters['pending_requests'])
+        self.assertDictEqual({}, counters['publication'])
+        # the counters can be returned through XML-RPC
+        import xmlrpclib
+        self.assertDictEqual(counters, xmlrpclib.loads(xmlrpclib.dumps((counters, )))[0][0])
+
 
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -33,8 +33,412 @@ class MainLoopTest(unittest.TestCase):
     def test_TODO(self):
         """ Test the values set at construction. """
         from supvisors.mainloop import SupvisorsMainLoop
-        main_loop = SupvisorsMainLoop(self.supvisors)
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
         self.assertIsNotNone(main_loop)
+        self.assertEqual(100, main_loop.batch_size)
+
+    def test_receive_events(self):
+        """ Test the batched reading of the internal subscriber. """
+        import zmq
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
+        main_loop.batch_size = 3
+        messages = []
+        def receive(flags):
+            self.assertEqual(zmq.NOBLOCK, flags)
+            if not messages:
+                raise zmq.Again()
+            message = messages.pop(0)
+            if message is None:
+                raise ValueError('corrupted')
+            return message
+        main_loop.subscriber = type('DummySubscriber', (object, ), {'receive': staticmethod(receive)})()
+        # nothing ready
+        self.assertListEqual([], main_loop.receive_events())
+        # less messages than the batch size, including a corrupted one
+        messages[:] = [(0, '10.0.0.1', 'a'), None, (1, '10.0.0.2', 'b')]
+        self.assertListEqual([(0, '10.0.0.1', 'a'), (1, '10.0.0.2', 'b')], main_loop.receive_events())
+        # more messages than the batch size
+        messages[:] = [(0, '10.0.0.1', idx) for idx in range(5)]
+        self.assertListEqual([(0, '10.0.0.1', idx) for idx in range(3)], main_loop.receive_events())
+        self.assertListEqual([(0, '10.0.0.1', idx) for idx in range(3, 5)], main_loop.receive_events())
+
+
+    def test_serve_snapshots(self):
+        """ Test that all the pending snapshot requests are served. """
+        import zmq
+        from supvisors.mainloop import SupvisorsMainLoop
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
+        requests = [None, None]
+        def serve(flags):
+            self.assertEqual(zmq.NOBLOCK, flags)
+            if not requests:
+                raise zmq.Again()
+            requests.pop()
+        main_loop.snapshot_server = type('DummyServer', (object, ), {'serve': staticmethod(serve)})()
+        main_loop.serve_snapshots()
+        self.assertListEqual([], requests)
+
+    def test_recorder(self):
+        """ Test the recording of the inputs of the main loop. """
+        import os, shutil, tempfile
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.recorder import EventRecorder, RecordKinds, decode_reply, read_records
+        from supvisors.tests.base import DummyClass
+        from supvisors.utils import RemoteCommEvents
+        tempdir = tempfile.mkdtemp()
+        self.supvisors.options.internal_record_file = os.path.join(tempdir, 'supvisors.rec')
+        self.supvisors.zmq.internal_subscriber = DummyClass()
+        self.supvisors.zmq.puller = DummyClass()
+        events = []
+        event_queue = type('DummyQueue', (object, ), {'put': staticmethod(lambda *args: events.append(args))})()
+        main_loop = SupvisorsMainLoop(self.supvisors, event_queue)
+        # the recorder is shared with the sockets
+        self.assertIsInstance(main_loop.recorder, EventRecorder)
+        self.assertIs(main_loop.recorder, self.supvisors.zmq.internal_subscriber.recorder)
+        self.assertIs(main_loop.recorder, self.supvisors.zmq.puller.recorder)
+        # only the results of the deferred requests are recorded
+        main_loop.send_remote_comm_event(RemoteCommEvents.SUPVISORS_EVENT, [])
+        main_loop.send_remote_comm_event(RemoteCommEvents.SUPVISORS_AUTH, ('10.0.0.1', True))
+        self.assertEqual(2, len(events))
+        main_loop.recorder.close()
+        with open(self.supvisors.options.internal_record_file, 'rb') as stream:
+            records = list(read_records(stream))
+        shutil.rmtree(tempdir)
+        self.assertListEqual([RecordKinds.SESSION, RecordKinds.REPLY], [kind for _, kind, _ in records])
+        self.assertTupleEqual((RemoteCommEvents.SUPVISORS_AUTH, ('10.0.0.1', True)), decode_reply(records[1][2]))
+
+    def test_send_request(self):
+        """ Test the dispatch of the deferred requests. """
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import DeferredRequestHeaders
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
+        disconnected, pushed = [], []
+        main_loop.subscriber = type('DummySubscriber', (object, ), {'disconnect': staticmethod(disconnected.append)})()
+        main_loop.workers.push = lambda *args: pushed.append(args)
+        # isolation is performed in the polling thread
+        main_loop.send_request(DeferredRequestHeaders.ISOLATE_ADDRESSES, ['10.0.0.1', '10.0.0.2'])
+        self.assertListEqual([['10.0.0.1', '10.0.0.2']], disconnected)
+        self.assertListEqual([], pushed)
+        # XML-RPC requests are deferred to the workers according to the address
+        main_loop.multicall_window = 0
+        main_loop.send_request(DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.1', 'dummy:dummy'))
+        main_loop.send_request(DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.2', ))
+        self.assertListEqual([('10.0.0.1', DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.1', 'dummy:dummy')),
+            ('10.0.0.2', DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.2', ))], pushed)
+        self.assertDictEqual({}, main_loop.pending_requests)
+
+    def test_coalesce_requests(self):
+        """ Test the coalescing of the start / stop requests per address. """
+        import time
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import DeferredRequestHeaders
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
+        pushed = []
+        main_loop.workers.push = lambda *args: pushed.append(args)
+        self.assertEqual(0.05, main_loop.multicall_window)
+        self.assertEqual(500, main_loop.poll_timeout())
+        start_1 = (DeferredRequestHeaders.START_PROCESS, ('10.0.0.1', 'dummy:dummy_1', ''))
+        start_2 = (DeferredRequestHeaders.START_PROCESS, ('10.0.0.1', 'dummy:dummy_2', '-x'))
+        stop_3 = (DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.1', 'dummy:dummy_3'))
+        stop_4 = (DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.2', 'dummy:dummy_4'))
+        for request in [start_1, start_2, stop_3, stop_4]:
+            main_loop.send_request(*request)
+        self.assertListEqual([], pushed)
+        self.assertItemsEqual(['10.0.0.1', '10.0.0.2'], main_loop.pending_requests.keys())
+        self.assertGreaterEqual(50, main_loop.poll_timeout())
+        # nothing pushed before the end of the window
+        main_loop.flush_requests(time.time() - 1)
+        self.assertListEqual([], pushed)
+        # several requests become a multicall, a single request is pushed as is
+        main_loop.flush_requests(time.time() + 1)
+        self.assertItemsEqual([('10.0.0.1', DeferredRequestHeaders.MULTICALL, ('10.0.0.1', [start_1, start_2, stop_3])),
+            ('10.0.0.2', ) + stop_4], pushed)
+        self.assertDictEqual({}, main_loop.pending_requests)
+        # another request to the same address pushes the pending requests first
+        pushed[:] = []
+        main_loop.send_request(*start_1)
+        main_loop.send_request(*stop_4)
+        main_loop.send_request(DeferredRequestHeaders.RESTART, ('10.0.0.1', ))
+        self.assertListEqual([('10.0.0.1', ) + start_1, ('10.0.0.1', DeferredRequestHeaders.RESTART, ('10.0.0.1', ))],
+            pushed)
+        # all pending requests are pushed when the main loop ends
+        main_loop.flush_requests()
+        self.assertEqual(('10.0.0.2', ) + stop_4, pushed[-1])
+
+    def test_start_stop(self):
+        """ Test the start / stop requests and the results handed off. """
+        import xmlrpclib
+        from supervisor.xmlrpc import Faults
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import DeferredRequestHeaders, RemoteCommEvents
+        events, calls = [], []
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
+        main_loop.send_remote_comm_event = lambda *args: events.append(args)
+        outputs = []
+        def call(address, method, *params):
+            calls.append((address, method, params))
+            output = outputs.pop(0)
+            if isinstance(output, Exception):
+                raise output
+            return output
+        main_loop.proxy_pool.call = call
+        start_1 = (DeferredRequestHeaders.START_PROCESS, ('10.0.0.1', 'dummy:dummy_1', '-x'))
+        stop_2 = (DeferredRequestHeaders.STOP_PROCESS, ('10.0.0.1', 'dummy:dummy_2'))
+        # single request
+        outputs[:] = [True]
+        main_loop.execute_request(*start_1)
+        self.assertListEqual([('10.0.0.1', 'supvisors.start_args', ('dummy:dummy_1', '-x', False))], calls)
+        self.assertListEqual([(RemoteCommEvents.SUPVISORS_RESULT,
+            ('10.0.0.1', [(DeferredRequestHeaders.START_PROCESS, 'dummy:dummy_1', None)]))], events)
+        # single request rejected
+        calls[:], events[:] = [], []
+        outputs[:] = [xmlrpclib.Fault(Faults.NOT_RUNNING, 'dummy:dummy_2')]
+        main_loop.execute_request(*stop_2)
+        self.assertListEqual([('10.0.0.1', 'supervisor.stopProcess', ('dummy:dummy_2', False))], calls)
+        self.assertListEqual([(RemoteCommEvents.SUPVISORS_RESULT, ('10.0.0.1',
+            [(DeferredRequestHeaders.STOP_PROCESS, 'dummy:dummy_2', (Faults.NOT_RUNNING, 'dummy:dummy_2'))]))], events)
+        # multicall
+        calls[:], events[:] = [], []
+        outputs[:] = [[[True], {'faultCode': Faults.NOT_RUNNING, 'faultString': 'dummy:dummy_2'}]]
+        main_loop.execute_request(DeferredRequestHeaders.MULTICALL, ('10.0.0.1', [start_1, stop_2]))
+        self.assertListEqual([('10.0.0.1', 'system.multicall',
+            ([{'methodName': 'supvisors.start_args', 'params': ['dummy:dummy_1', '-x', False]},
+              {'methodName': 'supervisor.stopProcess', 'params': ['dummy:dummy_2', False]}], ))], calls)
+        self.assertListEqual([(RemoteCommEvents.SUPVISORS_RESULT, ('10.0.0.1',
+            [(DeferredRequestHeaders.START_PROCESS, 'dummy:dummy_1', None),
+             (DeferredRequestHeaders.STOP_PROCESS, 'dummy:dummy_2', (Faults.NOT_RUNNING, 'dummy:dummy_2'))]))], events)
+        # communication failure
+        events[:] = []
+        outputs[:] = [IOError('connection refused')]
+        main_loop.execute_request(DeferredRequestHeaders.MULTICALL, ('10.0.0.1', [start_1, stop_2]))
+        self.assertListEqual([(RemoteCommEvents.SUPVISORS_RESULT, ('10.0.0.1',
+            [(DeferredRequestHeaders.START_PROCESS, 'dummy:dummy_1', (Faults.FAILED, 'request failed')),
+             (DeferredRequestHeaders.STOP_PROCESS, 'dummy:dummy_2', (Faults.FAILED, 'request failed'))]))], events)
+        # failure of the handler
+        events[:] = []
+        main_loop.fail_request(*stop_2)
+        main_loop.fail_request(DeferredRequestHeaders.MULTICALL, ('10.0.0.1', [start_1, stop_2]))
+        main_loop.fail_request(DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.1', ))
+        self.assertListEqual([(RemoteCommEvents.SUPVISORS_RESULT, ('10.0.0.1',
+            [(DeferredRequestHeaders.STOP_PROCESS, 'dummy:dummy_2', (Faults.FAILED, 'request failed'))])),
+            (RemoteCommEvents.SUPVISORS_RESULT, ('10.0.0.1',
+            [(DeferredRequestHeaders.START_PROCESS, 'dummy:dummy_1', (Faults.FAILED, 'request failed')),
+             (DeferredRequestHeaders.STOP_PROCESS, 'dummy:dummy_2', (Faults.FAILED, 'request failed'))]))], events)
+        self.assertEqual(main_loop.fail_request, main_loop.workers.failure_handler)
+
+
+    def test_statistics(self):
+        """ Test the reception and the release of the statistics. """
+        from collections import deque
+        from supvisors.codec import encode_event
+        from supvisors.mainloop import SupvisorsMainLoop
+        from supvisors.utils import InternalEventHeaders, StatisticsFrames
+        main_loop = SupvisorsMainLoop(self.supvisors, None)
+        main_loop.event_queue = type('DummyQueue', (object, ), {'queue': deque()})()
+        messages = []
+        def receive_statistics(flags):
+            if not messages:
+                raise zmq.Again()
+            return messages.pop(0)
+        import zmq
+        main_loop.subscriber = type('DummySubscriber', (object, ), {'receive_statistics': staticmethod(receive_statistics)})()
+        payloads = [(StatisticsFrames.KEYFRAME, 1, (5.0, [], 0.0, {}, {})),
+            (StatisticsFrames.DELTA, 1, (10.0, [], 0.0, {}, {}, [], [])),
+            (StatisticsFrames.DELTA, 1, (15.0, [], 0.0, {}, {}, [], []))]
+        messages[:] = [encode_event(InternalEventHeaders.STATISTICS, '10.0.0.1', payload) for payload in payloads]
+        # the Supervisor thread is busy: statistics are held back
+        main_loop.event_queue.queue.append('busy')
+        main_loop.receive_statistics()
+        self.assertEqual(2, len(main_loop.pending_statistics))
+        self.assertListEqual([], main_loop.release_statistics())
+        self.assertEqual(50, main_loop.poll_timeout())
+        # the Supervisor thread is ready: the keyframe and the latest delta are released
+        main_loop.event_queue.queue.clear()
+        self.assertListEqual([(InternalEventHeaders.STATISTICS, u'10.0.0.1', payloads[0]),
+            (InternalEventHeaders.STATISTICS, u'10.0.0.1', payloads[2])], main_loop.release_statistics())
+        self.assertListEqual([], main_loop.pending_statistics)
+        self.assertDictEqual({'received': 3, 'delivered': 2, 'conflated': 1, 'max_backlog': 3},
+            main_loop.conflation_counters.serial())
+        self.assertEqual(500, main_loop.poll_timeout())
+
+
+class ConflationTest(unittest.TestCase):
+    """ Test case for the conflation of the statistics in the mainloop module. """
+
+    def test_conflate_statistics(self):
+        """ Test the selection of the relevant statistics. """
+        from supvisors.codec import encode_event
+        from supvisors.mainloop import conflate_statistics
+        from supvisors.utils import InternalEventHeaders, StatisticsFrames
+        def message(origin, frame, sequence):
+            body = (5.0, [], 0.0, {}, {}) + (([], []) if frame == StatisticsFrames.DELTA else ())
+            return encode_event(InternalEventHeaders.STATISTICS, origin, (frame, sequence, body))
+        key_1_1 = message('10.0.0.1', StatisticsFrames.KEYFRAME, 1)
+        delta_1_1a = message('10.0.0.1', StatisticsFrames.DELTA, 1)
+        delta_1_1b = message('10.0.0.1', StatisticsFrames.DELTA, 1)
+        key_1_2 = message('10.0.0.1', StatisticsFrames.KEYFRAME, 2)
+        delta_1_2 = message('10.0.0.1', StatisticsFrames.DELTA, 2)
+        delta_2_5a = message('10.0.0.2', StatisticsFrames.DELTA, 5)
+        delta_2_5b = message('10.0.0.2', StatisticsFrames.DELTA, 5)
+        # the latest delta is kept with the keyframe it refers to
+        self.assertListEqual([key_1_1, delta_2_5b, delta_1_1b],
+            conflate_statistics([key_1_1, delta_1_1a, delta_2_5a, delta_2_5b, delta_1_1b]))
+        # a new keyframe supersedes everything
+        self.assertListEqual([key_1_2], conflate_statistics([key_1_1, delta_1_1a, key_1_2]))
+        # a delta referring to another keyframe supersedes the previous keyframe
+        self.assertListEqual([delta_1_2], conflate_statistics([key_1_1, delta_1_2]))
+        # corrupted messages are discarded
+        self.assertListEqual([key_1_1], conflate_statistics([['dummy'], key_1_1]))
+
+
+class RequestWorkersTest(unittest.TestCase):
+    """ Test case for the RequestWorkers class of the mainloop module. """
+
+    def setUp(self):
+        """ Create a logger that stores log traces. """
+        from supvisors.tests.base import DummyLogger
+        self.logger = DummyLogger()
+
+    def test_ordering(self):
+        """ Test that the requests are performed in sequence per address and in parallel otherwise. """
+        import threading
+        import time
+        from supvisors.mainloop import RequestWorkers
+        blocker = threading.Event()
+        results = []
+        def handler(header, body):
+            if body == 'blocked':
+                blocker.wait(5)
+            results.append((header, body))
+        workers = RequestWorkers(4, handler, self.logger)
+        # find two addresses handled by different workers
+        addresses = ['10.0.0.{}'.format(idx) for idx in range(10)]
+        blocked_address = addresses[0]
+        free_address = next(address for address in addresses
+            if hash(address) % 4 != hash(blocked_address) % 4)
+        workers.start()
+        workers.push(blocked_address, 1, 'blocked')
+        workers.push(blocked_address, 2, 'after')
+        workers.push(free_address, 3, 'free')
+        # the free address is not delayed by the blocked one
+        for _ in range(50):
+            if results:
+                break
+            time.sleep(0.1)
+        self.assertListEqual([(3, 'free')], results)
+        # the requests of the blocked address are performed in order
+        blocker.set()
+        workers.stop()
+        self.assertListEqual([(3, 'free'), (1, 'blocked'), (2, 'after')], results)
+        self.assertFalse(any(thread.is_alive() for thread in workers.threads))
+
+    def test_handler_failure(self):
+        """ Test that a worker survives an exception in the handler and that the failure is reported. """
+        from supvisors.mainloop import RequestWorkers
+        results, failures = [], []
+        def handler(header, body):
+            results.append(body)
+            raise RuntimeError('failure')
+        def failure_handler(header, body):
+            failures.append(body)
+            if body == 'second':
+                raise RuntimeError('report failure')
+        workers = RequestWorkers(1, handler, self.logger, failure_handler)
+        workers.push('10.0.0.1', 0, 'first')
+        workers.push('10.0.0.1', 0, 'second')
+        self.assertEqual(2, workers.pending())
+        workers.start()
+        workers.stop()
+        self.assertEqual(0, workers.pending())
+        self.assertListEqual(['first', 'second'], results)
+        self.assertListEqual(['first', 'second'], failures)
+        messages = [message for level, message in self.logger.messages if level == 'critical']
+        self.assertEqual(3, len(messages))
+        self.assertTrue(messages[0].startswith("failed to perform request (0, 'first')"))
+        self.assertIn('RuntimeError: failure', messages[0])
+        self.assertIn('RuntimeError: report failure', messages[2])
+
+
+class BatchCountersTest(unittest.TestCase):
+    """ Test case for the BatchCounters class of the mainloop module. """
+
+    def test_counters(self):
+        """ Test the accumulation of the batch counters. """
+        from supvisors.mainloop import BatchCounters
+        counters = BatchCounters()
+        self.assertDictEqual({'batches': 0, 'events': 0, 'mean_batch_size': 0.0, 'max_batch_size': 0,
+            'queue_depth': 0, 'max_queue_depth': 0}, counters.serial())
+        counters.add(4, 2)
+        counters.add(2, 0)
+        self.assertDictEqual({'batches': 2, 'events': 6, 'mean_batch_size': 3.0, 'max_batch_size': 4,
+            'queue_depth': 0, 'max_queue_depth': 2}, counters.serial())
+        counters.clear()
+        self.assertEqual(0, counters.batches)
+
+
+class SupervisorEventQueueTest(unittest.TestCase):
+    """ Test case for the SupervisorEventQueue class of the mainloop module. """
+
+    def setUp(self):
+        """ Create the event queue, registered in the Supervisor socket map. """
+        from supervisor.medusa import asyncore_25 as asyncore
+        from supvisors.mainloop import SupervisorEventQueue
+        from supvisors.tests.base import DummyLogger
+        self.events = []
+        self.queue = SupervisorEventQueue(DummyLogger(), lambda *args: self.events.append(args))
+        self.asyncore = asyncore
+
+    def tearDown(self):
+        """ Close the event queue. """
+        self.queue.close()
+        self.assertNotIn(self.queue.fileno(), self.asyncore.socket_map)
+
+    def test_registration(self):
+        """ Test that the pipe is registered in the asyncore socket map used by Supervisor. """
+        self.assertIs(self.queue, self.asyncore.socket_map[self.queue.fileno()])
+        self.assertTrue(self.queue.readable())
+        self.assertFalse(self.queue.writable())
+
+    def test_hand_off(self):
+        """ Test that the events pushed wake up the poller and are processed in order. """
+        self.queue.put('event', ('tick', '10.0.0.1', {'when': 1000}))
+        self.queue.put('task', None)
+        # poll the socket map as Supervisor would do
+        self.asyncore.poll(1.0)
+        self.assertListEqual([('event', ('tick', '10.0.0.1', {'when': 1000})), ('task', None)], self.events)
+        # nothing more to read
+        self.events[:] = []
+        self.asyncore.poll(0.1)
+        self.assertListEqual([], self.events)
+
+    def test_full_pipe(self):
+        """ Test that a full pipe does not block the producer. """
+        for idx in range(100000):
+            self.queue.put('event', idx)
+        # all events are processed, whatever the number of wakeups
+        self.queue.handle_read()
+        self.assertEqual(100000, len(self.events))
+        self.assertListEqual(range(100000), [data for _, data in self.events])
+
+    def test_callback_failure(self):
+        """ Test that a failure on one event does not prevent the processing of the next ones. """
+        def callback(event_type, event_data):
+            if event_type == 'fail':
+                raise ValueError('bad event')
+            self.events.append((event_type, event_data))
+        self.queue.callback = callback
+        self.queue.put('event', 1)
+        self.queue.put('fail', 2)
+        self.queue.put('event', 3)
+        self.queue.handle_read()
+        self.assertListEqual([('event', 1), ('event', 3)], self.events)
+        self.assertEqual(1, len(self.queue.logger.messages))
+        level, message = self.queue.logger.messages[0]
+        self.assertEqual('critical', level)
+        self.assertIn('failed to process internal event fail', message)
+        self.assertIn('ValueError: bad event', message)
+        self.assertFalse(self.queue.queue)
 
 
 def test_suite():
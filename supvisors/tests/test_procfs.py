@@ -0,0 +1,161 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+class ProcReaderTest(unittest.TestCase):
+    """ Test case for the ProcReader class of the procfs module, on the proc filesystem. """
+
+    def setUp(self):
+        """ Create a reader. """
+        from supvisors.procfs import ProcReader
+        self.reader = ProcReader.create()
+        if self.reader is None:
+            self.skipTest('proc filesystem not available')
+
+    def test_create(self):
+        """ Test the values set at construction. """
+        from supvisors.procfs import ProcReader
+        self.assertIs(ProcReader, type(self.reader))
+        self.assertEqual('/proc', self.reader.procfs_path)
+        self.assertEqual(os.sysconf('SC_CLK_TCK'), self.reader.clock_ticks)
+        self.assertEqual(os.sysconf('SC_PAGE_SIZE'), self.reader.page_size)
+        self.assertEqual(ProcReader._Buffer_size, len(self.reader.buffer))
+        # no reader without the system files
+        self.assertIsNone(ProcReader.create('/dummy'))
+
+    def test_system(self):
+        """ Test that the system measures are the same as psutil. """
+        from supvisors.statistics import instant_cpu_statistics, instant_io_statistics, instant_memory_statistics
+        import psutil
+        self.assertItemsEqual(psutil.pids(), self.reader.pids())
+        self.assertEqual(psutil.virtual_memory().total, self.reader.memory_total())
+        for reader_value, psutil_value in zip(self.reader.cpu_times(), instant_cpu_statistics()):
+            self.assertAlmostEqual(psutil_value[0], reader_value[0], delta=1)
+            self.assertAlmostEqual(psutil_value[1], reader_value[1], delta=1)
+        self.assertAlmostEqual(instant_memory_statistics(), self.reader.memory_percent(), delta=1)
+        self.assertItemsEqual(instant_io_statistics().keys(), self.reader.io_counters().keys())
+
+    def test_process(self):
+        """ Test that the process measures are the same as psutil. """
+        import psutil
+        proc = psutil.Process()
+        ppid, start_time, work = self.reader.process_stat(os.getpid())
+        self.assertEqual(os.getppid(), ppid)
+        self.assertAlmostEqual(proc.create_time(), start_time / self.reader.clock_ticks + psutil.boot_time(), delta=1)
+        self.assertAlmostEqual(sum(proc.cpu_times()), work, delta=0.1)
+        self.assertAlmostEqual(proc.memory_info().rss, self.reader.process_rss(os.getpid()), delta=1 << 20)
+
+    def test_errors(self):
+        """ Test that the errors on the process files are raised as psutil errors. """
+        from psutil import NoSuchProcess
+        with self.assertRaises(NoSuchProcess):
+            self.reader.process_stat(999999)
+        with self.assertRaises(NoSuchProcess):
+            self.reader.process_rss(999999)
+
+
+class FakeProcReaderTest(unittest.TestCase):
+    """ Test case for the ProcReader class of the procfs module, on a fake proc filesystem. """
+
+    def setUp(self):
+        """ Create a fake proc filesystem. """
+        from supvisors.procfs import ProcReader
+        self.procfs = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.procfs, 'net'))
+        self.write('stat', 'cpu  30 0 10 200 0 0 0 0 0 0\n'
+            'cpu0 10 0 5 100 0 0 0 0 0 0\ncpu1 20 0 5 100 4 1 1\nintr 0\n')
+        self.write('meminfo', 'MemTotal: 1000 kB\nMemFree: 200 kB\nMemAvailable: 400 kB\n')
+        self.write('net/dev', 'Inter-| Receive | Transmit\n face |bytes packets|bytes packets\n'
+            '    lo: 100 1 0 0 0 0 0 0 200 2 0 0 0 0 0 0\n  eth0:300 3 0 0 0 0 0 0 400 4 0 0 0 0 0 0\n')
+        self.write('12/stat', '12 (my (weird) name) S 1 12 12 0 -1 0 0 0 0 0 100 50 10 5 20 0 1 0 1234 0 25')
+        self.write('12/statm', '100 25 10 1 0 50 0')
+        self.write('15/stat', '15 (child) S 12 12 12 0 -1 0 0 0 0 0 10 10 0 0 20 0 1 0 1300 0 5')
+        self.write('15/statm', '100 5 10 1 0 50 0')
+        self.reader = ProcReader.create(self.procfs)
+        self.reader.clock_ticks = 100.0
+        self.reader.page_size = 1024
+
+    def tearDown(self):
+        """ Remove the fake proc filesystem. """
+        shutil.rmtree(self.procfs)
+
+    def write(self, filename, contents):
+        """ Write a file in the fake proc filesystem. """
+        path = os.path.join(self.procfs, filename)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as stream:
+            stream.write(contents)
+
+    def test_read(self):
+        """ Test the reads with the reused buffer. """
+        buffer = self.reader.buffer
+        self.assertEqual('100 25 10 1 0 50 0', self.reader.read('12/statm'))
+        self.assertIs(buffer, self.reader.buffer)
+        # a larger file needs a larger buffer
+        contents = 'x' * (len(buffer) + 10)
+        self.write('big', contents)
+        self.assertEqual(contents, self.reader.read('big'))
+        self.assertEqual(2 * len(contents), len(self.reader.buffer))
+        self.assertEqual(contents, self.reader.read('big'))
+
+    def test_system(self):
+        """ Test the parsing of the system files. """
+        self.assertItemsEqual([12, 15], self.reader.pids())
+        # the missing fields of an old kernel are set to 0
+        self.assertListEqual([(0.21, 1.02), (0.15, 1.0), (0.27, 1.04)],
+            [(round(work, 6), round(idle, 6)) for work, idle in self.reader.cpu_times()])
+        self.assertEqual(1024000, self.reader.memory_total())
+        self.assertEqual(60.0, self.reader.memory_percent())
+        self.assertDictEqual({'lo': (100, 200), 'eth0': (300, 400)}, self.reader.io_counters())
+        # the available memory is not provided by old kernels
+        self.write('meminfo', 'MemTotal: 1000 kB\nMemFree: 200 kB\n')
+        self.assertIsNone(self.reader.memory_percent())
+        # container case
+        self.write('meminfo', 'MemTotal: 1000 kB\nMemFree: 200 kB\nMemAvailable: 4000 kB\n')
+        self.assertEqual(80.0, self.reader.memory_percent())
+
+    def test_process(self):
+        """ Test the parsing of the process files. """
+        from psutil import AccessDenied, NoSuchProcess
+        # the block I/O delays are only available in recent kernels
+        self.assertTupleEqual((1, 1234, 1.65), self.reader.process_stat(12))
+        self.write('12/stat', '12 (name) S 1 12 12 0 -1 0 0 0 0 0 100 50 10 5 20 0 1 0 1234 0 25' + ' 0' * 17 + ' 35')
+        self.assertTupleEqual((1, 1234, 2.0), self.reader.process_stat(12))
+        self.assertEqual(25600, self.reader.process_rss(12))
+        # errors
+        with self.assertRaises(NoSuchProcess):
+            self.reader.process_stat(20)
+        os.chmod(os.path.join(self.procfs, '15', 'statm'), 0)
+        if os.getuid() != 0:
+            with self.assertRaises(AccessDenied):
+                self.reader.process_rss(15)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
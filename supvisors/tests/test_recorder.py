@@ -0,0 +1,128 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+import cPickle
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from supvisors.tests.base import DummySupvisors, ProcessInfoDatabase
+
+
+class RecorderTest(unittest.TestCase):
+    """ Test case for the recorder module. """
+
+    def setUp(self):
+        """ Create a dummy supvisors and a temporary directory. """
+        self.supvisors = DummySupvisors()
+        self.tempdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tempdir, 'supvisors.rec')
+
+    def tearDown(self):
+        """ Remove the temporary directory. """
+        shutil.rmtree(self.tempdir)
+
+    def test_record_and_read(self):
+        """ Test the writing and the reading of a record file. """
+        from supvisors.codec import CodecError, decode_event, encode_event
+        from supvisors.recorder import (EventRecorder, RecordKinds, decode_reply, decode_request, decode_session,
+            read_records)
+        from supvisors.utils import DeferredRequestHeaders, InternalEventHeaders, RemoteCommEvents
+        recorder = EventRecorder(self.filename, self.supvisors)
+        recorder.record_event(encode_event(InternalEventHeaders.TICK, u'10.0.0.1', {'when': 1234}))
+        recorder.record_request(cPickle.dumps((DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.1', ))))
+        recorder.record_reply(RemoteCommEvents.SUPVISORS_AUTH, ('10.0.0.1', True))
+        self.assertEqual(4, recorder.nb_records)
+        recorder.close()
+        # a second session is appended to the same file
+        EventRecorder(self.filename, self.supvisors).close()
+        with open(self.filename, 'rb') as stream:
+            records = list(read_records(stream))
+        self.assertListEqual([RecordKinds.SESSION, RecordKinds.EVENT, RecordKinds.REQUEST, RecordKinds.REPLY,
+            RecordKinds.SESSION], [kind for _, kind, _ in records])
+        dates = [date for date, _, _ in records]
+        self.assertListEqual(sorted(dates), dates)
+        self.assertDictEqual({'local_address': '127.0.0.1', 'address_list': self.supvisors.address_mapper.addresses},
+            decode_session(records[0][2]))
+        self.assertTupleEqual((InternalEventHeaders.TICK, u'10.0.0.1', {'when': 1234}),
+            decode_event(records[1][2]))
+        self.assertTupleEqual((DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.1', )), decode_request(records[2][2]))
+        self.assertTupleEqual((RemoteCommEvents.SUPVISORS_AUTH, ('10.0.0.1', True)), decode_reply(records[3][2]))
+        # a truncated record is ignored
+        with open(self.filename, 'rb') as stream:
+            contents = stream.read()
+        with open(self.filename, 'wb') as stream:
+            stream.write(contents[:-3])
+        with open(self.filename, 'rb') as stream:
+            self.assertEqual(4, len(list(read_records(stream))))
+        # the file must be a record file
+        with open(self.filename, 'wb') as stream:
+            stream.write('dummy contents')
+        with open(self.filename, 'rb') as stream:
+            with self.assertRaises(CodecError):
+                list(read_records(stream))
+
+    def test_replay(self):
+        """ Test the replay of a record file into the Supvisors context. """
+        from supvisors.codec import encode_event
+        from supvisors.recorder import EventRecorder
+        from supvisors.replayer import EventReplayer
+        from supvisors.ttypes import AddressStates
+        from supvisors.utils import DeferredRequestHeaders, InternalEventHeaders, RemoteCommEvents
+        self.supvisors.address_mapper.addresses = ['10.0.0.1', '10.0.0.2']
+        self.supvisors.address_mapper.local_address = '10.0.0.1'
+        recorder = EventRecorder(self.filename, self.supvisors)
+        recorder.record_event(encode_event(InternalEventHeaders.TICK, u'10.0.0.1', {'when': 1234}))
+        recorder.record_request(cPickle.dumps((DeferredRequestHeaders.CHECK_ADDRESS, ('10.0.0.1', ))))
+        recorder.record_reply(RemoteCommEvents.SUPVISORS_INFO, ('10.0.0.1', ProcessInfoDatabase))
+        recorder.record_reply(RemoteCommEvents.SUPVISORS_AUTH, ('10.0.0.1', True))
+        recorder.record_event(encode_event(InternalEventHeaders.PROCESS, u'10.0.0.1',
+            {'processname': u'xlogo', 'groupname': u'sample_test_1', 'state': 20, 'now': 1476947220,
+                'pid': 1234, 'expected': True}))
+        recorder.close()
+        replayer = EventReplayer(self.supvisors.logger)
+        with open(self.filename, 'rb') as stream:
+            replayer.replay(stream)
+        self.assertEqual(6, replayer.nb_records)
+        self.assertEqual(0, replayer.nb_errors)
+        # the real context has been fed
+        context = replayer.supvisors.context
+        self.assertEqual(AddressStates.RUNNING, context.addresses['10.0.0.1'].state)
+        self.assertEqual(AddressStates.UNKNOWN, context.addresses['10.0.0.2'].state)
+        self.assertEqual(len(ProcessInfoDatabase), len(context.processes))
+        self.assertEqual(1234, context.processes['sample_test_1:xlogo'].infos['10.0.0.1']['pid'])
+        # the handlers have been timed
+        timings = replayer.timings.serial()
+        self.assertItemsEqual(['on_tick_event', 'on_process_event', 'on_process_info', 'on_authorization',
+            'publish_applications'], timings.keys())
+        self.assertEqual(3, timings['publish_applications']['count'])
+        # the deferred requests recorded are compared to the ones emitted by the replayed context
+        self.assertDictEqual({DeferredRequestHeaders.CHECK_ADDRESS: 1}, replayer.recorded_requests)
+        self.assertDictEqual({DeferredRequestHeaders.CHECK_ADDRESS: 1}, replayer.supvisors.zmq.pusher.requests)
+        report = replayer.report()
+        self.assertEqual('6 records replayed, 0 errors', report[0])
+        self.assertIn('    CHECK_ADDRESS                   1        1', report)
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+# ======================================================================
+# Copyright 2016 Julien LE CLEACH
+# 
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+# 
+#     http://www.apache.org/licenses/LICENSE-2.0
+# 
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ======================================================================
+
+import sys
+import unittest
+
+
+class ReplicaTest(unittest.TestCase):
+    """ Test case for the replica module. """
+
+    def setUp(self):
+        """ Create a replica and a listener storing the changes. """
+        from supvisors.client.replica import SupvisorsReplica
+        self.replica = SupvisorsReplica()
+        self.changes = []
+        self.replica.add_listener(lambda previous, event: self.changes.append((previous, event)))
+
+    @staticmethod
+    def process(process_name, statecode, addresses, application_name='sample'):
+        """ Return a typed process event. """
+        from supvisors.client.eventstream import ProcessStatusEvent
+        return ProcessStatusEvent(application_name, process_name, statecode, None, True, 0, addresses)
+
+    def test_processes(self):
+        """ Test the indexes of the processes. """
+        xclock = self.process('xclock', 20, ['10.0.0.1'])
+        xfontsel = self.process('xfontsel', 20, ['10.0.0.1'])
+        xeyes = self.process('xeyes', 200, [], 'other')
+        for event in [xclock, xfontsel, xeyes]:
+            self.replica.apply(event)
+        self.assertListEqual([(None, xclock), (None, xfontsel), (None, xeyes)], self.changes)
+        self.assertItemsEqual(['sample:xclock', 'sample:xfontsel'], self.replica.namespecs(state=20))
+        self.assertItemsEqual(['sample:xclock', 'sample:xfontsel'], self.replica.namespecs(address_name='10.0.0.1'))
+        self.assertItemsEqual(['other:xeyes'], self.replica.namespecs(application_name='other'))
+        self.assertItemsEqual(['other:xeyes', 'sample:xclock', 'sample:xfontsel'], self.replica.namespecs())
+        # move xclock to FATAL and another address
+        fatal_xclock = self.process('xclock', 200, ['10.0.0.2'])
+        self.replica.apply(fatal_xclock)
+        self.assertTupleEqual((xclock, fatal_xclock), self.changes[-1])
+        self.assertListEqual([fatal_xclock], self.replica.select_processes(state=200, address_name='10.0.0.2'))
+        self.assertListEqual([fatal_xclock], self.replica.select_processes(state=200, application_name='sample'))
+        self.assertListEqual([xfontsel], self.replica.select_processes(address_name='10.0.0.1'))
+        self.assertListEqual([], self.replica.select_processes(state=20, address_name='10.0.0.2'))
+        self.assertListEqual([], self.replica.select_processes(state=1000))
+        # no notification if unchanged
+        self.replica.apply(fatal_xclock)
+        self.assertEqual(4, len(self.changes))
+        # the addresses may be missing in the events
+        stopped_xeyes = self.process('xeyes', 0, None, 'other')
+        self.replica.apply(stopped_xeyes)
+        self.assertTupleEqual((xeyes, stopped_xeyes), self.changes[-1])
+        running_xeyes = self.process('xeyes', 20, ['10.0.0.2'], 'other')
+        self.replica.apply(running_xeyes)
+        self.assertTupleEqual((stopped_xeyes, running_xeyes), self.changes[-1])
+        self.assertItemsEqual(['other:xeyes', 'sample:xclock'], self.replica.namespecs(address_name='10.0.0.2'))
+
+    def test_addresses(self):
+        """ Test the addresses, including the heartbeats. """
+        from supvisors.client.eventstream import AddressStatusEvent, HeartbeatEvent
+        # heartbeat of an unknown address is ignored
+        self.replica.apply(HeartbeatEvent('10.0.0.1', 10, 11))
+        self.assertDictEqual({}, self.replica.addresses)
+        running = AddressStatusEvent('10.0.0.1', 2, 'RUNNING', 10, 11, 0)
+        self.replica.apply(running)
+        self.assertListEqual(['10.0.0.1'], self.replica.address_names(2))
+        self.replica.apply(HeartbeatEvent('10.0.0.1', 15, 16))
+        self.assertEqual(AddressStatusEvent('10.0.0.1', 2, 'RUNNING', 15, 16, 0), self.replica.addresses['10.0.0.1'])
+        self.assertTupleEqual((running, self.replica.addresses['10.0.0.1']), self.changes[-1])
+        silent = AddressStatusEvent('10.0.0.1', 3, 'SILENT', 15, 16, 0)
+        self.replica.apply(silent)
+        self.assertListEqual([], self.replica.address_names(2))
+        self.assertListEqual(['10.0.0.1'], self.replica.address_names(3))
+
+    def test_applications_supvisors(self):
+        """ Test the applications and the Supvisors status. """
+        from supvisors.client.eventstream import ApplicationStatusEvent, SupvisorsStatusEvent
+        self.replica.apply(ApplicationStatusEvent('sample', 1, 'STARTING', False, False))
+        self.replica.apply(ApplicationStatusEvent('sample', 2, 'RUNNING', False, False))
+        self.assertListEqual([], self.replica.application_names(1))
+        self.assertListEqual(['sample'], self.replica.application_names(2))
+        status = SupvisorsStatusEvent(2, 'OPERATION')
+        self.replica.apply(status)
+        self.assertIs(status, self.replica.supvisors)
+        self.assertTupleEqual((None, status), self.changes[-1])
+        # unknown objects are ignored
+        self.replica.apply(None)
+        self.assertEqual(3, len(self.changes))
+
+
+def test_suite():
+    return unittest.findTestCases(sys.modules[__name__])
+
+if __name__ == '__main__':
+    unittest.main(defaultTest='test_suite')
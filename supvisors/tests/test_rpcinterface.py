@@ -33,6 +33,23 @@ class RpcInterfaceTest(unittest.TestCase):
         #rpc = RPCInterface(DummySupervisor())
         #self.assertIsNotNone(rpc)
 
+    def test_internal_counters(self):
+        """ Test that the internal counters can always be marshalled in XML-RPC. """
+        import xmlrpclib
+        from supvisors.rpcinterface import RPCInterface
+        from supvisors.tests.base import DummyClass
+        rpc = RPCInterface.__new__(RPCInterface)
+        rpc.supvisors = DummyClass()
+        rpc.supvisors.listener = DummyClass()
+        rpc.supvisors.listener.counters = lambda: {'pending_requests': 2,
+            'publication': {u'process': {'published': 3L, 'bytes': 1 << 40, 'skipped': 0}},
+            'statistics_sampling': {'samples': 5, 'mean_ms': 1.5}}
+        counters = rpc.get_internal_counters()
+        self.assertDictEqual({'pending_requests': 2,
+            'publication': {u'process': {'published': 3, 'bytes': xmlrpclib.MAXINT, 'skipped': 0}},
+            'statistics_sampling': {'samples': 5, 'mean_ms': 1.5}}, counters)
+        self.assertDictEqual(counters, xmlrpclib.loads(xmlrpclib.dumps((counters, )))[0][0])
+
 
 
 def test_suite():
@@ -58,6 +58,152 @@ class RpcRequestsTest(unittest.TestCase):
         self.assertEqual('p@$$w0rd', proxy._ServerProxy__transport.password)
         # if no server is started, call would block
 
+
+class RPCProxyPoolTest(unittest.TestCase):
+    """ Test case for the RPCProxyPool class of the rpcrequests module. """
+
+    def setUp(self):
+        """ Start a local XML-RPC server supporting HTTP keep-alive. """
+        import time
+        from SimpleXMLRPCServer import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+        from threading import Thread
+        class KeepAliveHandler(SimpleXMLRPCRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            def log_message(self, *args):
+                pass
+            def send_response(self, *args):
+                # drop the connection after the request has been processed
+                if self.server.drop:
+                    self.server.drop = False
+                    raise IOError('connection dropped')
+                SimpleXMLRPCRequestHandler.send_response(self, *args)
+        class DropServer(SimpleXMLRPCServer):
+            drop = False
+            def handle_error(self, *args):
+                pass
+        self.server = DropServer(('127.0.0.1', 0), KeepAliveHandler, logRequests=False)
+        self.drop_calls = []
+        def drop():
+            self.drop_calls.append(True)
+            self.server.drop = True
+            return True
+        self.server.register_function(drop, 'test.drop')
+        self.server.register_function(lambda x: x * 2, 'test.double')
+        self.server.register_function(lambda: 1 / 0, 'test.fail')
+        self.server.register_function(lambda: time.sleep(1) or True, 'test.sleep')
+        self.thread = Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.1})
+        self.thread.start()
+        self.env = {'SUPERVISOR_SERVER_URL': 'http://localhost:{}'.format(self.server.server_address[1])}
+
+    def tearDown(self):
+        """ Stop the local XML-RPC server. """
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_keep_alive(self):
+        """ Test that successive calls to the same address use the same connection. """
+        from supvisors.rpcrequests import RPCProxyPool
+        pool = RPCProxyPool(self.env, 2, 60, 10)
+        for value in range(5):
+            self.assertEqual(2 * value, pool.call('127.0.0.1', 'test.double', value))
+        self.assertDictContainsSubset({'hits': 4, 'misses': 1, 'connections': 1, 'reconnections': 0,
+            'failures': 0, 'evictions': 0}, pool.counters.serial())
+        self.assertEqual(1, len(pool.proxies['127.0.0.1']))
+        pool.close()
+        self.assertDictEqual({}, pool.proxies)
+
+    def test_bounded_size(self):
+        """ Test that the number of idle proxies is bounded. """
+        from supvisors.rpcrequests import RPCProxyPool
+        pool = RPCProxyPool(self.env, 2, 60, 10)
+        proxies = [pool.acquire('127.0.0.1') for _ in range(3)]
+        self.assertEqual(3, pool.counters.misses)
+        for proxy in proxies:
+            pool.release('127.0.0.1', proxy)
+        self.assertListEqual(proxies[:2], [proxy for proxy, _ in pool.proxies['127.0.0.1']])
+        # the most recent proxy is used first
+        self.assertIs(proxies[1], pool.acquire('127.0.0.1'))
+        self.assertEqual(1, pool.counters.hits)
+
+    def test_idle_eviction(self):
+        """ Test that the unused proxies are closed. """
+        import time
+        from supvisors.rpcrequests import RPCProxyPool
+        pool = RPCProxyPool(self.env, 2, 60, 10)
+        pool.call('127.0.0.1', 'test.double', 1)
+        pool.evict_idle()
+        self.assertEqual(1, len(pool.proxies['127.0.0.1']))
+        # age the proxy
+        proxy, _ = pool.proxies['127.0.0.1'].pop()
+        pool.proxies['127.0.0.1'].append((proxy, time.time() - 61))
+        pool.evict_idle()
+        self.assertEqual(0, len(pool.proxies['127.0.0.1']))
+        self.assertEqual(1, pool.counters.evictions)
+        self.assertIsNone(proxy('transport').connection)
+
+    def test_reconnection(self):
+        """ Test that a broken persistent connection is replaced. """
+        import socket
+        from supvisors.rpcrequests import RPCProxyPool
+        pool = RPCProxyPool(self.env, 2, 60, 10)
+        pool.call('127.0.0.1', 'test.double', 1)
+        # break the persistent connection
+        proxy, _ = pool.proxies['127.0.0.1'][0]
+        proxy('transport').connection.sock.close()
+        self.assertEqual(4, pool.call('127.0.0.1', 'test.double', 2))
+        self.assertDictContainsSubset({'hits': 1, 'misses': 1, 'connections': 2, 'reconnections': 1,
+            'failures': 0}, pool.counters.serial())
+        # the server closes the idle persistent connection
+        proxy, _ = pool.proxies['127.0.0.1'][0]
+        proxy('transport').connection.sock.shutdown(socket.SHUT_WR)
+        self.assertEqual(6, pool.call('127.0.0.1', 'test.double', 3))
+        self.assertDictContainsSubset({'hits': 2, 'misses': 1, 'connections': 3, 'reconnections': 2,
+            'failures': 0}, pool.counters.serial())
+        pool.close()
+
+    def test_no_retry_after_send(self):
+        """ Test that a call is not retried when the connection is dropped after the request has been sent. """
+        import httplib
+        from supvisors.rpcrequests import RPCProxyPool
+        pool = RPCProxyPool(self.env, 2, 60, 10)
+        pool.call('127.0.0.1', 'test.double', 1)
+        with self.assertRaises(httplib.BadStatusLine):
+            pool.call('127.0.0.1', 'test.drop')
+        self.assertEqual(1, len(self.drop_calls))
+        self.assertDictContainsSubset({'hits': 1, 'misses': 1, 'connections': 1, 'reconnections': 0,
+            'failures': 1}, pool.counters.serial())
+        self.assertFalse(pool.proxies.get('127.0.0.1'))
+
+    def test_failures(self):
+        """ Test the failure cases. """
+        import socket
+        import xmlrpclib
+        from supvisors.rpcrequests import RPCProxyPool
+        pool = RPCProxyPool(self.env, 2, 60, 10)
+        # an application error keeps the proxy
+        with self.assertRaises(xmlrpclib.Fault):
+            pool.call('127.0.0.1', 'test.fail')
+        self.assertEqual(1, len(pool.proxies['127.0.0.1']))
+        self.assertEqual(0, pool.counters.failures)
+        # a timeout is not retried, even on a persistent connection
+        pool.timeout = 0.2
+        pool.close()
+        pool.call('127.0.0.1', 'test.double', 1)
+        with self.assertRaises(socket.timeout):
+            pool.call('127.0.0.1', 'test.sleep')
+        self.assertEqual(1, pool.counters.failures)
+        self.assertEqual(0, pool.counters.reconnections)
+        # a connection error on a new connection is not retried
+        pool.counters.clear()
+        self.server.server_close()
+        pool.close()
+        with self.assertRaises(socket.error):
+            pool.call('127.0.0.1', 'test.double', 1)
+        self.assertEqual(1, pool.counters.failures)
+        self.assertEqual(0, pool.counters.reconnections)
+        self.assertFalse(pool.proxies.get('127.0.0.1'))
+
  
 def test_suite():
     return unittest.findTestCases(sys.modules[__name__])
@@ -22,6 +22,11 @@ import unittest
 
 from supvisors.tests.base import DummySupvisors
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class StatisticsTest(unittest.TestCase):
     """ Test case for the functions of the statistics module. """
@@ -144,9 +149,31 @@ class StatisticsTest(unittest.TestCase):
 
     def test_instant_statistics(self):
         """ Test the instant global statistics. """
-        import multiprocessing, os, time
-        from supvisors.statistics import instant_statistics
+        import os
+        from supvisors.statistics import ProcessSampler, instant_statistics
         stats = instant_statistics([('myself', os.getpid())])
+        self.check_instant_statistics(stats)
+        # same with process samplers
+        stats = instant_statistics([('myself', os.getpid())], ProcessSampler(False))
+        self.check_instant_statistics(stats)
+        stats = instant_statistics([('myself', os.getpid())], ProcessSampler())
+        self.check_instant_statistics(stats)
+
+    def test_procfs_fallback(self):
+        """ Test the fallback to psutil when the /proc reader fails. """
+        from supvisors.procfs import ProcReader
+        from supvisors.statistics import instant_cpu_statistics, instant_io_statistics, instant_memory_statistics
+        reader = ProcReader('/dummy')
+        self.assertEqual(len(instant_cpu_statistics()), len(instant_cpu_statistics(reader)))
+        self.assertItemsEqual(instant_io_statistics().keys(), instant_io_statistics(reader).keys())
+        self.assertAlmostEqual(instant_memory_statistics(), instant_memory_statistics(reader), delta=1)
+        # memory without the available memory
+        reader.memory_percent = lambda: None
+        self.assertAlmostEqual(instant_memory_statistics(), instant_memory_statistics(reader), delta=1)
+
+    def check_instant_statistics(self, stats):
+        """ Check the layout of the instant global statistics. """
+        import multiprocessing, os, time
         # check result
         self.assertEqual(5, len(stats))
         date, cpu_stats, mem_stats, io_stats, proc_stats = stats
@@ -218,21 +245,416 @@ class StatisticsTest(unittest.TestCase):
             self.assertLessEqual(value, 100)
 
 
+class ProcessSamplerTest(unittest.TestCase):
+    """ Test case for the ProcessSampler class of the statistics module. """
+
+    def setUp(self):
+        """ Start a process with children. """
+        import subprocess, time
+        self.process = subprocess.Popen(['sh', '-c', 'sleep 60 & sleep 60 & wait'])
+        # let the shell fork its children
+        time.sleep(0.2)
+
+    def tearDown(self):
+        """ Stop the process and its children. """
+        import psutil
+        for proc in psutil.Process(self.process.pid).children(recursive=True):
+            proc.kill()
+        self.process.kill()
+        self.process.wait()
+
+    def test_create(self):
+        """ Test the values set at construction. """
+        import multiprocessing, psutil
+        from supvisors.procfs import ProcReader
+        from supvisors.statistics import ProcessSampler
+        sampler = ProcessSampler()
+        self.assertIs(ProcReader, type(sampler.reader))
+        self.assertEqual(multiprocessing.cpu_count(), sampler.nb_cpus)
+        self.assertEqual(psutil.virtual_memory().total, sampler.total_memory)
+        self.assertDictEqual({}, sampler.ppids)
+        self.assertDictEqual({}, sampler.handles)
+        # psutil only
+        sampler = ProcessSampler(False)
+        self.assertIsNone(sampler.reader)
+        self.assertEqual(psutil.virtual_memory().total, sampler.total_memory)
+
+    def test_refresh(self):
+        """ Test the incremental update of the parent pids. """
+        import os, psutil
+        from supvisors.statistics import ProcessSampler
+        sampler = ProcessSampler(False)
+        children, new_handles = sampler.refresh()
+        self.assertEqual(os.getppid(), sampler.ppids[os.getpid()])
+        self.assertIn(self.process.pid, children[os.getpid()])
+        self.assertEqual(2, len(children[self.process.pid]))
+        self.assertIs(psutil.Process, type(new_handles[os.getpid()]))
+        # the known pids are not read again
+        children, new_handles = sampler.refresh()
+        self.assertNotIn(os.getpid(), new_handles)
+        self.assertEqual(2, len(children[self.process.pid]))
+
+    def test_sample(self):
+        """ Test that the sample is equivalent to instant_process_statistics and that the handles are kept. """
+        import os
+        from supvisors.statistics import ProcessSampler, instant_process_statistics
+        sampler = ProcessSampler(False)
+        stats = sampler.sample([('shell', self.process.pid), ('myself', os.getpid()), ('ghost', 999999)])
+        self.assertItemsEqual(['shell', 'myself', 'ghost'], stats.keys())
+        self.assertTupleEqual((999999, (0.0, 0.0)), stats['ghost'])
+        pid, (work, memory) = stats['shell']
+        self.assertEqual(self.process.pid, pid)
+        expected_work, expected_memory = instant_process_statistics(self.process.pid)
+        self.assertAlmostEqual(expected_work, work, places=1)
+        self.assertAlmostEqual(expected_memory, memory, places=3)
+        # the handles of the trees are kept
+        children = [child.pid for child in sampler.handles[self.process.pid].children()]
+        self.assertEqual(2, len(children))
+        self.assertItemsEqual([os.getpid(), self.process.pid] + children, sampler.handles.keys())
+        handles = dict(sampler.handles)
+        sampler.sample([('shell', self.process.pid)])
+        self.assertItemsEqual([self.process.pid] + children, sampler.handles.keys())
+        for pid, proc in sampler.handles.items():
+            self.assertIs(handles[pid], proc)
+        # the handle of an exited process is evicted
+        sampler.handles[children[0]].kill()
+        sampler.handles[children[0]].wait()
+        sampler.sample([('shell', self.process.pid)])
+        self.assertItemsEqual([self.process.pid, children[1]], sampler.handles.keys())
+        self.assertNotIn(children[0], sampler.ppids)
+
+    def test_pid_reuse(self):
+        """ Test that a handle whose pid has been reused is replaced. """
+        import psutil
+        from supvisors.statistics import ProcessSampler
+        sampler = ProcessSampler(False)
+        sampler.sample([('shell', self.process.pid)])
+        handle = sampler.handles[self.process.pid]
+        self.assertIsNotNone(ProcessSampler.measure(handle))
+        # fake another process with the same pid
+        handle.is_running = lambda: False
+        self.assertIsNone(ProcessSampler.measure(handle))
+        stats = sampler.sample([('shell', self.process.pid)])
+        self.assertIsNot(handle, sampler.handles[self.process.pid])
+        self.assertIs(psutil.Process, type(sampler.handles[self.process.pid]))
+        self.assertGreater(stats['shell'][1][1], 0)
+
+    def test_sample_procfs(self):
+        """ Test that the sample with the /proc reader is equivalent to the sample with psutil. """
+        import os
+        import time
+        from supvisors.statistics import ProcessSampler
+        sampler = ProcessSampler()
+        children, new_handles = sampler.refresh()
+        self.assertEqual(os.getppid(), sampler.ppids[os.getpid()])
+        self.assertIn(self.process.pid, children[os.getpid()])
+        # the handles are the start times
+        self.assertIs(int, type(new_handles[self.process.pid]))
+        named_pids = [('shell', self.process.pid), ('myself', os.getpid()), ('ghost', 999999)]
+        stats = sampler.sample(named_pids)
+        expected = ProcessSampler(False).sample(named_pids)
+        self.assertItemsEqual(expected.keys(), stats.keys())
+        for process_name, (pid, (work, memory)) in expected.items():
+            self.assertEqual(pid, stats[process_name][0])
+            self.assertAlmostEqual(work, stats[process_name][1][0], places=1)
+            self.assertAlmostEqual(memory, stats[process_name][1][1], places=2)
+        self.assertEqual(4, len(sampler.handles))
+        # the handle of an exited process is evicted (the shell reaps it)
+        child = children[self.process.pid][0]
+        os.kill(child, 9)
+        time.sleep(0.1)
+        sampler.sample([('shell', self.process.pid)])
+        self.assertNotIn(child, sampler.handles)
+        self.assertNotIn(child, sampler.ppids)
+
+    def test_pid_reuse_procfs(self):
+        """ Test that a pid reused by another process is detected from its start time with the /proc reader. """
+        from supvisors.statistics import ProcessSampler
+        sampler = ProcessSampler()
+        stats = sampler.sample([('shell', self.process.pid)])
+        children = [pid for pid, ppid in sampler.ppids.items() if ppid == self.process.pid]
+        self.assertEqual(2, len(children))
+        baseline, work = sampler.works[self.process.pid]
+        self.assertEqual(0.0, baseline)
+        self.assertAlmostEqual(stats['shell'][1][0], work / sampler.nb_cpus)
+        # fake another process with the same pid as the sampled process
+        start_time = sampler.handles[self.process.pid]
+        sampler.handles[self.process.pid] -= 1
+        stats = sampler.sample([('shell', self.process.pid)])
+        self.assertEqual(start_time, sampler.handles[self.process.pid])
+        # the work of the previous process is the baseline of the new one
+        self.assertEqual(work, sampler.works[self.process.pid][0])
+        self.assertAlmostEqual((work + sampler.works[self.process.pid][1]) / sampler.nb_cpus, stats['shell'][1][0])
+        self.assertItemsEqual([self.process.pid] + children, sampler.handles.keys())
+        # fake another process with the same pid as a child, with the same parent
+        sampler.handles[children[0]] -= 1
+        sampler.sample([('shell', self.process.pid)])
+        self.assertItemsEqual([self.process.pid] + children, sampler.handles.keys())
+        # fake another process with the same pid as a child, started by another parent
+        sampler.handles[children[0]] -= 1
+        sampler.ppids[children[0]] = self.process.pid
+        sampler.reader.process_stat = lambda pid, process_stat=sampler.reader.process_stat: \
+            (1,) + process_stat(pid)[1:] if pid == children[0] else process_stat(pid)
+        sampler.sample([('shell', self.process.pid)])
+        # the new process is not part of the tree
+        self.assertEqual(1, sampler.ppids[children[0]])
+        self.assertItemsEqual([self.process.pid, children[1]], sampler.handles.keys())
+
+
+def check_stats(test, expected, stats):
+    """ Compare statistics with the layout of utils.get_stats. """
+    avg, rate, (a, b), dev = stats
+    test.assertAlmostEqual(expected[0], avg)
+    test.assertAlmostEqual(expected[1], rate)
+    test.assertAlmostEqual(expected[2][0], a)
+    test.assertAlmostEqual(expected[2][1], b)
+    test.assertAlmostEqual(expected[3], dev)
+
+
+class RingBufferTest(unittest.TestCase):
+    """ Test case for the RingBuffer class of the statistics module. """
+
+    def test_create(self):
+        """ Test the initialization of a ring buffer. """
+        from supvisors.statistics import RingBuffer
+        series = RingBuffer(4)
+        self.assertEqual(4, series.capacity)
+        self.assertEqual(0, len(series))
+        self.assertFalse(series)
+        self.assertListEqual([], series.tolist())
+        # capacity is at least 1
+        self.assertEqual(1, RingBuffer(0).capacity)
+        # initial values are appended
+        series = RingBuffer(4, [1, 2.5])
+        self.assertListEqual([1.0, 2.5], series.tolist())
+
+    def test_append(self):
+        """ Test the rolling of values when the capacity is reached. """
+        from supvisors.statistics import RingBuffer
+        series = RingBuffer(3)
+        for value in range(1, 4):
+            series.append(value)
+        self.assertListEqual([1.0, 2.0, 3.0], series.tolist())
+        for value in range(4, 9):
+            series.append(value)
+            self.assertEqual(3, len(series))
+            self.assertListEqual([value - 2.0, value - 1.0, float(value)], series.tolist())
+        # clear
+        series.clear()
+        self.assertFalse(series)
+        series.append(12)
+        self.assertListEqual([12.0], series.tolist())
+
+    def test_read(self):
+        """ Test the list-like read access. """
+        from supvisors.statistics import RingBuffer
+        series = RingBuffer(4, range(7))
+        self.assertEqual(3.0, series[0])
+        self.assertEqual(4.0, series[1])
+        self.assertEqual(6.0, series[-1])
+        self.assertEqual(5.0, series[-2])
+        self.assertEqual(3.0, series[-4])
+        with self.assertRaises(IndexError):
+            series[4]
+        with self.assertRaises(IndexError):
+            series[-5]
+        self.assertListEqual([4.0, 5.0], series[1:3])
+        self.assertListEqual([5.0, 6.0], series[-2:])
+        self.assertListEqual([3.0, 4.0, 5.0, 6.0], list(series))
+        self.assertEqual(18.0, sum(series))
+        # comparison
+        self.assertEqual([3, 4, 5, 6], series)
+        self.assertEqual(series, RingBuffer(10, [3, 4, 5, 6]))
+        self.assertNotEqual([3, 4, 5], series)
+        self.assertEqual('[3.0, 4.0, 5.0, 6.0]', repr(series))
+
+    def test_get_stats(self):
+        """ Test the statistics of a ring buffer. """
+        from supvisors.statistics import RingBuffer
+        from supvisors.utils import get_stats
+        series = RingBuffer(5)
+        self.assertEqual((None, None, (None, None), None), series.get_stats())
+        series.append(3.5)
+        self.assertEqual((3.5, None, (None, None), None), series.get_stats())
+        series = RingBuffer(5, [1, 2, 3, 4, 5, 6])
+        check_stats(self, get_stats([2.0, 3.0, 4.0, 5.0, 6.0]), series.get_stats())
+        # utils.get_stats delegates to the series
+        self.assertEqual(series.get_stats(), get_stats(series))
+
+    def test_running_stats(self):
+        """ Test that the accumulators give the same results as the batch computation. """
+        import random
+        from supvisors.statistics import RingBuffer
+        from supvisors.utils import get_stats
+        series = RingBuffer(10)
+        for idx in range(35):
+            series.append(random.uniform(0, 100))
+            check_stats(self, get_stats(series.tolist()), series.get_stats())
+        # constant series
+        for idx in range(10):
+            series.append(76.1)
+        avg, rate, (a, b), dev = series.get_stats()
+        self.assertAlmostEqual(76.1, avg)
+        self.assertAlmostEqual(0.0, rate)
+        self.assertAlmostEqual(0.0, a)
+        self.assertAlmostEqual(76.1, b)
+        # the deviation is the square root of the cancellation error of the variance
+        self.assertAlmostEqual(0.0, dev, places=5)
+
+    def test_drift(self):
+        """ Test that the accumulators do not drift on a long run of large values. """
+        import random
+        from supvisors.statistics import RingBuffer
+        from supvisors.utils import get_stats
+        series = RingBuffer(50)
+        for idx in range(5017):
+            series.append(random.uniform(1e6, 1e6 + 1e3))
+        check_stats(self, get_stats(series.tolist()), series.get_stats())
+        # no resync since the last wrap
+        self.assertEqual(17, series.start)
+        self.assertEqual(67, series.index)
+
+
+@unittest.skipIf(numpy is None, 'numpy not available')
+class SeriesTableTest(unittest.TestCase):
+    """ Test case for the SeriesTable and TableSeries classes of the statistics module. """
+
+    def test_series(self):
+        """ Test the allocation and the release of the columns. """
+        from supvisors.statistics import SeriesTable, TableSeries
+        table = SeriesTable(4)
+        self.assertEqual((4, 16), table.data.shape)
+        series = [table.series() for _ in range(16)]
+        self.assertIs(TableSeries, type(series[0]))
+        self.assertListEqual(range(16), [item.column for item in series])
+        self.assertFalse(table.free)
+        # a new series needs more columns
+        extra = table.series()
+        self.assertEqual(16, extra.column)
+        self.assertEqual((4, 32), table.data.shape)
+        self.assertEqual(32, len(table.sizes))
+        # a released column is reused and its series is empty
+        table.tick()
+        series[3].append(12)
+        self.assertEqual(1, len(series[3]))
+        table.release(series[3])
+        reused = table.series()
+        self.assertEqual(3, reused.column)
+        self.assertFalse(reused)
+
+    def test_read(self):
+        """ Test the list-like read access, before and after the rows roll. """
+        from supvisors.statistics import SeriesTable
+        table = SeriesTable(4)
+        first, second = table.series(), table.series()
+        for value in range(3):
+            table.tick()
+            first.append(value)
+        # second series starts later
+        for value in range(3, 7):
+            table.tick()
+            first.append(value)
+            second.append(10 * value)
+        self.assertListEqual([3.0, 4.0, 5.0, 6.0], first.tolist())
+        self.assertListEqual([30.0, 40.0, 50.0, 60.0], second.tolist())
+        table.tick()
+        second.append(70)
+        first.append(7)
+        self.assertListEqual([4.0, 5.0, 6.0, 7.0], first.tolist())
+        self.assertEqual(4.0, first[0])
+        self.assertEqual(7.0, first[-1])
+        self.assertEqual(6.0, first[-2])
+        self.assertListEqual([5.0, 6.0], first[1:3])
+        self.assertListEqual([40.0, 50.0, 60.0, 70.0], list(second))
+        with self.assertRaises(IndexError):
+            first[4]
+        self.assertEqual([4, 5, 6, 7], first)
+
+    def test_get_stats(self):
+        """ Test that the vectorized analysis is equivalent to utils.get_stats. """
+        import random
+        from supvisors.statistics import SeriesTable
+        from supvisors.utils import get_stats
+        table = SeriesTable(10)
+        series = [table.series() for _ in range(20)]
+        for tick in range(25):
+            table.tick()
+            # series start at different ticks so that all sizes are tested
+            for idx, item in enumerate(series):
+                if tick >= idx:
+                    item.append(random.uniform(0, 100) if idx != 5 else 0.0)
+        for item in series:
+            check_stats(self, get_stats(item.tolist()), item.get_stats())
+        # the analysis is cached until the next change
+        analysis = table.analysis
+        self.assertIsNotNone(analysis)
+        series[0].get_stats()
+        self.assertIs(analysis, table.analysis)
+        table.tick()
+        self.assertIsNone(table.analysis)
+        # a series with one value has only a mean value
+        single = table.series()
+        self.assertEqual((None, None, (None, None), None), single.get_stats())
+        single.append(3.5)
+        self.assertEqual((3.5, None, (None, None), None), single.get_stats())
+
+    def test_running_stats(self):
+        """ Test that the accumulators give the same results as the batch computation at every tick,
+        when series are released and created. """
+        import random
+        from supvisors.statistics import SeriesTable
+        from supvisors.utils import get_stats
+        table = SeriesTable(7)
+        series = [table.series() for _ in range(40)]
+        for tick in range(30):
+            table.tick()
+            if tick % 4 == 3:
+                # replace a series
+                idx = random.randrange(len(series))
+                table.release(series[idx])
+                series[idx] = table.series()
+            for item in series:
+                item.append(random.uniform(0, 100))
+            for item in series:
+                check_stats(self, get_stats(item.tolist()), item.get_stats())
+
+    def test_drift(self):
+        """ Test that the accumulators do not drift on a long run of large values. """
+        import random
+        from supvisors.statistics import SeriesTable
+        from supvisors.utils import get_stats
+        table = SeriesTable(50)
+        series = [table.series() for _ in range(4)]
+        for tick in range(5017):
+            table.tick()
+            for item in series:
+                item.append(random.uniform(1e6, 1e6 + 1e3))
+        for item in series:
+            check_stats(self, get_stats(item.tolist()), item.get_stats())
+        self.assertEqual(16, table.row)
+        self.assertEqual(66, table.index)
+
+
 class StatisticsInstanceTest(unittest.TestCase):
     """ Test case for the StatisticsInstance class of the statistics module. """
 
     def test_create(self):
         """ Test the initialization of an instance. """
-        from supvisors.statistics import StatisticsInstance
+        from supvisors.statistics import RingBuffer, SeriesStore, StatisticsInstance, numpy
         instance = StatisticsInstance(17, 10)
+        self.assertEqual(numpy is not None, instance.vectorized)
+        instance = StatisticsInstance(17, 10, False)
         # check attributes
         self.assertEqual(3, instance.period)
         self.assertEqual(10, instance.depth)
-        self.assertEqual(-1, instance.counter)
+        self.assertFalse(instance.vectorized)
+        self.assertIs(SeriesStore, type(instance.store))
+        self.assertEqual(0, instance.counter)
         self.assertIsNone(instance.ref_stats)
         self.assertIs(list, type(instance.cpu))
         self.assertFalse(instance.cpu)
-        self.assertIs(list, type(instance.mem))
+        self.assertIs(RingBuffer, type(instance.mem))
+        self.assertEqual(10, instance.mem.capacity)
         self.assertFalse(instance.mem)
         self.assertIs(dict, type(instance.io))
         self.assertFalse(instance.io)
@@ -241,8 +663,9 @@ class StatisticsInstanceTest(unittest.TestCase):
 
     def test_clear(self):
         """ Test the clearance of an instance. """
-        from supvisors.statistics import StatisticsInstance
-        instance = StatisticsInstance(17, 10)
+        from supvisors.statistics import RingBuffer, StatisticsInstance
+        instance = StatisticsInstance(17, 10, False)
+        store = instance.store
         # change values
         instance.counter = 28
         instance.ref_stats = ('dummy', 0)
@@ -252,13 +675,15 @@ class StatisticsInstanceTest(unittest.TestCase):
         instance.proc = {('myself', 5888): (25.0, 12.5)}
         # check clearance
         instance.clear()
+        self.assertIsNot(store, instance.store)
         self.assertEqual(3, instance.period)
         self.assertEqual(10, instance.depth)
-        self.assertEqual(-1, instance.counter)
+        self.assertEqual(0, instance.counter)
         self.assertIsNone(instance.ref_stats)
         self.assertIs(list, type(instance.cpu))
         self.assertFalse(instance.cpu)
-        self.assertIs(list, type(instance.mem))
+        self.assertIs(RingBuffer, type(instance.mem))
+        self.assertEqual(10, instance.mem.capacity)
         self.assertFalse(instance.mem)
         self.assertIs(dict, type(instance.io))
         self.assertFalse(instance.io)
@@ -277,52 +702,49 @@ class StatisticsInstanceTest(unittest.TestCase):
         stats = instance.find_process_stats('myself')
         self.assertTupleEqual((25.0, 12.5), stats)
 
-    def test_trunc_depth(self):
+    def test_series(self):
         """ Test the history depth. """
-        from supvisors.statistics import StatisticsInstance
-        instance = StatisticsInstance(12, 5)
-        # test that the truc_depth method does nothing when less than 5 elements in list
-        test_list = [1, 2, 3, 4]
-        instance.trunc_depth(test_list)
-        self.assertListEqual([1, 2, 3, 4], test_list)
-        # test that the truc_depth method keeps only the last 5 elements in list
-        test_list = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
-        instance.trunc_depth(test_list)
-        self.assertListEqual([6, 7, 8, 9, 10], test_list)
+        from supvisors.statistics import RingBuffer, StatisticsInstance
+        instance = StatisticsInstance(12, 5, False)
+        # test that the series keeps all the elements when less than 5 elements are appended
+        series = instance.store.series()
+        self.assertIs(RingBuffer, type(series))
+        for value in range(1, 5):
+            instance.store.tick()
+            series.append(value)
+        self.assertListEqual([1, 2, 3, 4], series.tolist())
+        # test that the series keeps only the last 5 elements
+        for value in range(5, 11):
+            instance.store.tick()
+            series.append(value)
+        self.assertListEqual([6, 7, 8, 9, 10], series.tolist())
+        # release has no effect
+        instance.store.release(series)
+        self.assertListEqual([6, 7, 8, 9, 10], series.tolist())
 
     def test_push_statistics(self):
+        """ Test the storage of the instant statistics with the pure-Python store. """
+        from supvisors.statistics import RingBuffer
+        self.check_push_statistics(False, RingBuffer)
+
+    @unittest.skipIf(numpy is None, 'numpy not available')
+    def test_push_statistics_vectorized(self):
+        """ Test the storage of the instant statistics with the NumPy store. """
+        from supvisors.statistics import TableSeries
+        self.check_push_statistics(True, TableSeries)
+
+    def check_push_statistics(self, vectorized, series_class):
         """ Test the storage of the instant statistics. """
         from supvisors.statistics import StatisticsInstance
-        instance = StatisticsInstance(12, 2)
-        # push first set of measures
+        instance = StatisticsInstance(12, 2, vectorized)
+        # push first interval
         stats1 = (8.5, [(25, 400), (25, 125), (15, 150), (40, 400), (20, 200)],
             76.1, {'eth0': (1024, 2000), 'lo': (500, 500)}, {'myself': (118612, (0.15, 1.85))})
-        instance.push_statistics(stats1)
-        # check evolution of instance
-        self.assertEqual(0, instance.counter)
-        self.assertEqual(5, len(instance.cpu))
-        for cpu in instance.cpu:
-            self.assertFalse(cpu)
-        self.assertFalse(instance.mem)
-        self.assertItemsEqual(['eth0', 'lo'], instance.io.keys())
-        for recv, sent in instance.io.values():
-            self.assertIs(list, type(recv))
-            self.assertFalse(recv)
-            self.assertIs(list, type(sent))
-            self.assertFalse(sent)
-        self.assertEqual([('myself', 118612)], instance.proc.keys())
-        for cpu_list, mem_list in instance.proc.values():
-            self.assertIs(list, type(cpu_list))
-            self.assertFalse(cpu_list)
-            self.assertIs(list, type(mem_list))
-            self.assertFalse(mem_list)
-        self.assertIs(stats1, instance.ref_stats)
-        # push second set of measures
         stats2 = (18.52, [(30, 600), (40, 150), (30, 200), (41, 550), (20, 300)],
             76.2, {'eth0': (1250, 2200), 'lo': (620, 620)}, {'myself': (118612, (0.16, 1.84))})
-        instance.push_statistics(stats2)
+        instance.push_statistics(stats2, stats1)
         # counter is based a theoretical period of 5 seconds
-        # this update is not taken into account
+        # the data structures are initialized from the first reference but the period is not complete
         # check evolution of instance
         self.assertEqual(1, instance.counter)
         self.assertEqual(5, len(instance.cpu))
@@ -331,61 +753,61 @@ class StatisticsInstanceTest(unittest.TestCase):
         self.assertFalse(instance.mem)
         self.assertItemsEqual(['eth0', 'lo'], instance.io.keys())
         for recv, sent in instance.io.values():
-            self.assertIs(list, type(recv))
+            self.assertIs(series_class, type(recv))
             self.assertFalse(recv)
-            self.assertIs(list, type(sent))
+            self.assertIs(series_class, type(sent))
             self.assertFalse(sent)
         self.assertEqual([('myself', 118612)], instance.proc.keys())
         for cpu_list, mem_list in instance.proc.values():
-            self.assertIs(list, type(cpu_list))
+            self.assertIs(series_class, type(cpu_list))
             self.assertFalse(cpu_list)
-            self.assertIs(list, type(mem_list))
+            self.assertIs(series_class, type(mem_list))
             self.assertFalse(mem_list)
         self.assertIs(stats1, instance.ref_stats)
-        # push third set of measures
+        # push third interval
         stats3 = (28.5, [(45, 700), (50, 225), (40, 250), (42, 598), (20, 400)],
             76.1, {'eth0': (2048, 2512), 'lo': (756, 756)}, {'myself': (118612, (1.75, 1.9))})
-        instance.push_statistics(stats3)
+        instance.push_statistics(stats3, stats2)
         # this update is taken into account
         # check evolution of instance
         self.assertEqual(2, instance.counter)
         self.assertListEqual([[6.25], [20.0], [20.0], [1.0], [0.0]], instance.cpu)
-        self.assertListEqual([76.1], instance.mem)
+        self.assertListEqual([76.1], instance.mem.tolist())
         self.assertDictEqual({'eth0': ([0.4], [0.2]), 'lo': ([0.1], [0.1])}, instance.io)
         self.assertEqual({('myself', 118612): ([0.5], [1.9])}, instance.proc)
         self.assertIs(stats3, instance.ref_stats)
-        # push fourth set of measures (reuse stats2)
-        instance.push_statistics(stats2)
+        # push fourth interval (reuse stats2)
+        instance.push_statistics(stats2, stats3)
         # again,this update is not taken into account
         self.assertEqual(3, instance.counter)
         self.assertIs(stats3, instance.ref_stats)
-        # push fifth set of measures
+        # push fifth interval
         stats5 = (38.5, [(80, 985), (89, 386), (48, 292), (42, 635), (32, 468)],
             75.9, {'eth0': (3072, 2768), 'lo': (1780, 1780)}, {'myself': (118612, (11.75, 1.87))})
-        instance.push_statistics(stats5)
+        instance.push_statistics(stats5, stats2)
         # this update is taken into account
         # check evolution of instance
         self.assertEqual(4, instance.counter)
         self.assertListEqual([[6.25, 10.9375], [20.0, 19.5], [20.0, 16.0], [1.0, 0.0], [0.0, 15.0]], instance.cpu)
-        self.assertListEqual([76.1, 75.9], instance.mem)
+        self.assertListEqual([76.1, 75.9], instance.mem.tolist())
         self.assertDictEqual({'eth0': ([0.4, 0.8], [0.2, 0.2]), 'lo': ([0.1, 0.8], [0.1, 0.8])}, instance.io)
         self.assertEqual({('myself', 118612): ([0.5, 3.125], [1.9, 1.87])}, instance.proc)
         self.assertIs(stats5, instance.ref_stats)
-        # push sixth set of measures (reuse stats2)
-        instance.push_statistics(stats2)
+        # push sixth interval (reuse stats2)
+        instance.push_statistics(stats2, stats5)
         # this update is not taken into account
         # check evolution of instance
         self.assertEqual(5, instance.counter)
         self.assertIs(stats5, instance.ref_stats)
-        # push seventh set of measures
+        # push seventh interval
         stats7 = (48.5, [(84, 1061), (92, 413), (48, 480), (45, 832), (40, 1100)],
             74.7, {'eth0': (3584, 3792), 'lo': (1812, 1812)}, {'myself': (118612, (40.75, 2.34))})
-        instance.push_statistics(stats7)
+        instance.push_statistics(stats7, stats2)
         # this update is taken into account
         # check evolution of instance. max depth is reached so lists roll
         self.assertEqual(6, instance.counter)
         self.assertListEqual([[ 10.9375, 5.0], [19.5, 10.0], [16.0, 0.0], [0.0, 1.5], [15.0, 1.25]], instance.cpu)
-        self.assertListEqual([75.9, 74.7], instance.mem)
+        self.assertListEqual([75.9, 74.7], instance.mem.tolist())
         self.assertDictEqual({'eth0': ([0.8, 0.4], [0.2, 0.8]), 'lo': ([0.8, 0.025], [0.8, 0.025])}, instance.io)
         self.assertEqual({('myself', 118612): ([3.125, 36.25], [1.87, 2.34])}, instance.proc)
         self.assertIs(stats7, instance.ref_stats)
@@ -403,6 +825,8 @@ class StatisticsCompilerTest(unittest.TestCase):
         from supvisors.statistics import StatisticsCompiler, StatisticsInstance
         compiler = StatisticsCompiler(self.supvisors)
         # check compiler contents at initialisation
+        self.assertDictEqual({}, compiler.keyframes)
+        self.assertDictEqual({}, compiler.ref_stats)
         self.assertItemsEqual(self.supvisors.address_mapper.addresses, compiler.data.keys())
         for period_instance in compiler.data.values():
             self.assertItemsEqual(self.supvisors.options.stats_periods, period_instance.keys())
@@ -413,10 +837,11 @@ class StatisticsCompilerTest(unittest.TestCase):
 
     def test_clear(self):
         """ Test the clearance for statistics of all addresses. """
-        from supvisors.statistics import StatisticsCompiler
+        from supvisors.statistics import Series, StatisticsCompiler
         compiler = StatisticsCompiler(self.supvisors)
         # set data to a given address
         for address, period_instance in compiler.data.items():
+            compiler.ref_stats[address] = ('dummy', 0)
             for period, instance in period_instance.items():
                 instance.counter = 28
                 instance.ref_stats = ('dummy', 0)
@@ -428,20 +853,22 @@ class StatisticsCompilerTest(unittest.TestCase):
         compiler.clear('10.0.0.2')
         for address, period_instance in compiler.data.items():
             if address == '10.0.0.2':
+                self.assertNotIn(address, compiler.ref_stats)
                 for period, instance in period_instance.items():
                     self.assertEqual(period / 5, instance.period)
                     self.assertEqual(10, instance.depth)
-                    self.assertEqual(-1, instance.counter)
+                    self.assertEqual(0, instance.counter)
                     self.assertIsNone(instance.ref_stats)
                     self.assertIs(list, type(instance.cpu))
                     self.assertFalse(instance.cpu)
-                    self.assertIs(list, type(instance.mem))
+                    self.assertIsInstance(instance.mem, Series)
                     self.assertFalse(instance.mem)
                     self.assertIs(dict, type(instance.io))
                     self.assertFalse(instance.io)
                     self.assertIs(dict, type(instance.proc))
                     self.assertFalse(instance.proc)
             else:
+                self.assertTupleEqual(('dummy', 0), compiler.ref_stats[address])
                 for period, instance in period_instance.items():
                     self.assertEqual(period / 5, instance.period)
                     self.assertEqual(10, instance.depth)
@@ -455,25 +882,22 @@ class StatisticsCompilerTest(unittest.TestCase):
     def test_push_statistics(self):
         """ Test the storage of the instant statistics of an address. """
         from supvisors.statistics import StatisticsCompiler
+        from supvisors.utils import StatisticsFrames
         compiler = StatisticsCompiler(self.supvisors)
         # push statistics to a given address
         stats1 = (8.5, [(25, 400), (25, 125), (15, 150), (40, 400), (20, 200)],
             76.1, {'eth0': (1024, 2000), 'lo': (500, 500)}, {'myself': (118612, (0.15, 1.85))})
-        compiler.push_statistics('10.0.0.2', stats1)
-        # check compiler contents
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, 1, stats1))
+        # check compiler contents: the first snapshot is only the start of the first interval
+        self.assertDictEqual({'10.0.0.2': stats1}, compiler.ref_stats)
         for address, period_instance in compiler.data.items():
-            if address == '10.0.0.2':
-                for period, instance in period_instance.items():
-                    self.assertEqual(0, instance.counter)
-                    self.assertIs(stats1, instance.ref_stats)
-            else:
-                for period, instance in period_instance.items():
-                    self.assertEqual(-1, instance.counter)
-                    self.assertIsNone(instance.ref_stats)
+            for period, instance in period_instance.items():
+                self.assertEqual(0, instance.counter)
+                self.assertIsNone(instance.ref_stats)
         # push statistics to a given address
         stats2 = (28.5, [(45, 700), (50, 225), (40, 250), (42, 598), (20, 400)],
             76.1, {'eth0': (2048, 2512), 'lo': (756, 756)}, {'myself': (118612, (1.75, 1.9))})
-        compiler.push_statistics('10.0.0.2', stats2)
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, 2, stats2))
         # check compiler contents
         for address, period_instance in compiler.data.items():
             if address == '10.0.0.2':
@@ -485,12 +909,12 @@ class StatisticsCompilerTest(unittest.TestCase):
                         self.assertIs(stats1, instance.ref_stats)
             else:
                 for period, instance in period_instance.items():
-                    self.assertEqual(-1, instance.counter)
+                    self.assertEqual(0, instance.counter)
                     self.assertIsNone(instance.ref_stats)
         # push statistics to a given address
         stats3 = (38.5, [(80, 985), (89, 386), (48, 292), (42, 635), (32, 468)],
             75.9, {'eth0': (3072, 2768), 'lo': (1780, 1780)}, {'myself': (118612, (11.75, 1.87))})
-        compiler.push_statistics('10.0.0.2', stats3)
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, 3, stats3))
         # check compiler contents
         for address, period_instance in compiler.data.items():
             if address == '10.0.0.2':
@@ -502,12 +926,12 @@ class StatisticsCompilerTest(unittest.TestCase):
                         self.assertIs(stats1, instance.ref_stats)
             else:
                 for period, instance in period_instance.items():
-                    self.assertEqual(-1, instance.counter)
+                    self.assertEqual(0, instance.counter)
                     self.assertIsNone(instance.ref_stats)
         # push statistics to a given address
         stats4 = (48.5, [(84, 1061), (92, 413), (48, 480), (45, 832), (40, 1100)],
             74.7, {'eth0': (3584, 3792), 'lo': (1812, 1812)}, {'myself': (118612, (40.75, 2.34))})
-        compiler.push_statistics('10.0.0.2', stats4)
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, 4, stats4))
         # check compiler contents
         for address, period_instance in compiler.data.items():
             if address == '10.0.0.2':
@@ -519,9 +943,198 @@ class StatisticsCompilerTest(unittest.TestCase):
                         self.assertIs(stats1, instance.ref_stats)
             else:
                 for period, instance in period_instance.items():
-                    self.assertEqual(-1, instance.counter)
+                    self.assertEqual(0, instance.counter)
                     self.assertIsNone(instance.ref_stats)
 
+    def test_periods(self):
+        """ Test that the statistics of all the periods are derived from the same snapshots. """
+        from supvisors.statistics import StatisticsCompiler, statistics
+        from supvisors.utils import StatisticsFrames
+        self.supvisors.options.stats_periods = [5, 10, 15, 20, 30, 60]
+        compiler = StatisticsCompiler(self.supvisors)
+        snapshots = [(5.0 * idx, [(10 * idx * idx, 100 * idx)], 50.0 + idx, {'eth0': (128 * idx, 256 * idx)},
+            {'myself': (118612, (idx * idx / 2.0, 1.0 + idx))}) for idx in range(13)]
+        for sequence, stats in enumerate(snapshots):
+            compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, sequence, stats))
+        for period, instance in compiler.data['10.0.0.2'].items():
+            bounds = snapshots[::period / 5]
+            # the history is limited to the depth
+            expected = [statistics(last, ref) for ref, last in zip(bounds, bounds[1:])][-instance.depth:]
+            self.assertListEqual([stats[2] for stats in expected], instance.mem.tolist())
+            self.assertListEqual([stats[1][0] for stats in expected], instance.cpu[0].tolist())
+            self.assertListEqual([stats[3]['eth0'][0] for stats in expected], instance.io['eth0'][0].tolist())
+            self.assertListEqual([stats[4]['myself', 118612][0] for stats in expected],
+                instance.find_process_stats('myself')[0].tolist())
+            self.assertIs(bounds[-1], instance.ref_stats)
+
+    def test_push_delta_statistics(self):
+        """ Test the reconstruction of the snapshots from the statistics deltas. """
+        from supvisors.statistics import StatisticsCompiler
+        from supvisors.utils import StatisticsFrames
+        compiler = StatisticsCompiler(self.supvisors)
+        stats1 = (8.5, [(25, 400)], 76.1, {'eth0': (1024, 2000), 'lo': (500, 500)},
+            {'myself': (118612, (0.15, 1.85)), 'other': (0, (0, 0))})
+        delta2 = (13.5, [(45, 700)], 76.2, {'eth0': (2048, 2512)}, {'myself': (118612, (1.75, 1.9))}, [], ['other'])
+        # a delta received before any keyframe is ignored
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.DELTA, 3, delta2))
+        self.assertNotIn('10.0.0.2', compiler.keyframes)
+        self.assertNotIn('10.0.0.2', compiler.ref_stats)
+        for instance in compiler.data['10.0.0.2'].values():
+            self.assertEqual(0, instance.counter)
+        # push a keyframe then a delta related to it
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, 3, stats1))
+        self.assertTupleEqual((3, stats1), compiler.keyframes['10.0.0.2'])
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.DELTA, 3, delta2))
+        for instance in compiler.data['10.0.0.2'].values():
+            self.assertEqual(1, instance.counter)
+        self.assertTupleEqual((13.5, [(45, 700)], 76.2, {'eth0': (2048, 2512), 'lo': (500, 500)},
+            {'myself': (118612, (1.75, 1.9))}), compiler.ref_stats['10.0.0.2'])
+        self.assertIs(compiler.ref_stats['10.0.0.2'], compiler.data['10.0.0.2'][5].ref_stats)
+        # the keyframe is not modified by the reconstruction
+        self.assertTupleEqual((3, stats1), compiler.keyframes['10.0.0.2'])
+        # a delta related to a missed keyframe is ignored until the next keyframe
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.DELTA, 4, delta2))
+        for instance in compiler.data['10.0.0.2'].values():
+            self.assertEqual(1, instance.counter)
+        stats3 = (18.5, [(80, 985)], 75.9, {'eth0': (3072, 2768), 'lo': (1780, 1780)},
+            {'myself': (118612, (11.75, 1.87))})
+        delta4 = (23.5, [(84, 1061)], 74.7, {'eth0': (3584, 3792)}, {}, [], [])
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.KEYFRAME, 5, stats3))
+        compiler.push_statistics('10.0.0.2', (StatisticsFrames.DELTA, 5, delta4))
+        for instance in compiler.data['10.0.0.2'].values():
+            self.assertEqual(3, instance.counter)
+        # the keyframe is forgotten when the address is cleared
+        compiler.clear('10.0.0.2')
+        self.assertNotIn('10.0.0.2', compiler.keyframes)
+
+
+class StatisticsEncoderTest(unittest.TestCase):
+    """ Test case for the delta encoding of the statistics. """
+
+    def test_delta_statistics(self):
+        """ Test the computation and the application of the differences between two snapshots. """
+        from supvisors.statistics import apply_delta_statistics, delta_statistics
+        keyframe = (8.5, [(25, 400)], 76.1, {'eth0': (1024, 2000), 'lo': (500, 500)},
+            {'myself': (118612, (0.15, 1.85)), 'other': (0, (0, 0)), 'idle': (1234, (1.0, 0.5))})
+        stats = (13.5, [(45, 700)], 76.2, {'eth0': (2048, 2512), 'lo': (500, 500), 'eth1': (10, 20)},
+            {'myself': (118612, (1.75, 1.9)), 'idle': (1234, (1.0, 0.5)), 'new': (4321, (0.1, 0.1))})
+        delta = delta_statistics(stats, keyframe)
+        self.assertEqual(13.5, delta[0])
+        self.assertListEqual([(45, 700)], delta[1])
+        self.assertEqual(76.2, delta[2])
+        self.assertDictEqual({'eth0': (2048, 2512), 'eth1': (10, 20)}, delta[3])
+        self.assertDictEqual({'myself': (118612, (1.75, 1.9)), 'new': (4321, (0.1, 0.1))}, delta[4])
+        self.assertListEqual([], delta[5])
+        self.assertListEqual(['other'], delta[6])
+        self.assertTupleEqual(stats, apply_delta_statistics(keyframe, delta))
+        # interface removal
+        delta = delta_statistics((13.5, [], 76.2, {}, {}), keyframe)
+        self.assertItemsEqual(['eth0', 'lo'], delta[5])
+        self.assertItemsEqual(['myself', 'other', 'idle'], delta[6])
+        self.assertTupleEqual((13.5, [], 76.2, {}, {}), apply_delta_statistics(keyframe, delta))
+
+    def test_encode(self):
+        """ Test the sequencing of keyframes and deltas. """
+        from supvisors.statistics import StatisticsEncoder
+        from supvisors.utils import StatisticsFrames
+        encoder = StatisticsEncoder(3)
+        stats = [(5.0 * idx, [(idx, idx)], 50.0, {'lo': (idx, idx)}, {'myself': (1234, (idx, 1.0))})
+            for idx in range(7)]
+        frames = [encoder.encode(snapshot) for snapshot in stats]
+        self.assertListEqual([(StatisticsFrames.KEYFRAME, 0), (StatisticsFrames.DELTA, 0), (StatisticsFrames.DELTA, 0),
+            (StatisticsFrames.KEYFRAME, 1), (StatisticsFrames.DELTA, 1), (StatisticsFrames.DELTA, 1),
+            (StatisticsFrames.KEYFRAME, 2)], [frame[:2] for frame in frames])
+        self.assertIs(stats[3], frames[3][2])
+        self.assertIs(stats[6], encoder.keyframe)
+        self.assertTupleEqual((20.0, [(4, 4)], 50.0, {'lo': (4, 4)}, {'myself': (1234, (4, 1.0))}, [], []),
+            frames[4][2])
+        # a period of 1 disables the deltas
+        encoder = StatisticsEncoder(1)
+        self.assertListEqual([(StatisticsFrames.KEYFRAME, idx) for idx in range(3)],
+            [encoder.encode(snapshot)[:2] for snapshot in stats[:3]])
+
+
+class SamplingCountersTest(unittest.TestCase):
+    """ Test case for the SamplingCounters class of the statistics module. """
+
+    def test_counters(self):
+        """ Test the accumulation and the serialization of the counters. """
+        from supvisors.statistics import SamplingCounters
+        counters = SamplingCounters()
+        self.assertDictEqual({'samples': 0, 'errors': 0, 'skipped': 0, 'last_ms': 0.0, 'mean_ms': 0.0,
+            'max_ms': 0.0}, counters.serial())
+        counters.add(0.2)
+        counters.add(0.1)
+        counters.errors += 1
+        self.assertDictEqual({'samples': 2, 'errors': 1, 'skipped': 0, 'last_ms': 100.0, 'mean_ms': 150.0,
+            'max_ms': 200.0}, counters.serial())
+        counters.clear()
+        self.assertEqual(0, counters.serial()['samples'])
+
+
+class StatisticsCollectorTest(unittest.TestCase):
+    """ Test case for the StatisticsCollector class of the statistics module. """
+
+    def setUp(self):
+        """ Create a collector storing its publications. """
+        from supvisors.statistics import StatisticsCollector
+        self.publications = []
+        self.collector = StatisticsCollector(0.1, 2, self.publications.append)
+
+    def tearDown(self):
+        """ Stop the collector. """
+        self.collector.stop()
+
+    def test_create(self):
+        """ Test the values set at construction. """
+        from supvisors.statistics import SamplingCounters, StatisticsEncoder
+        self.assertTrue(self.collector.daemon)
+        self.assertEqual(0.1, self.collector.period)
+        self.assertIs(StatisticsEncoder, type(self.collector.encoder))
+        self.assertEqual(2, self.collector.encoder.keyframe_period)
+        self.assertListEqual([], self.collector.named_pids)
+        self.assertIs(SamplingCounters, type(self.collector.counters))
+        self.assertFalse(self.collector.stop_event.is_set())
+
+    def test_sample(self):
+        """ Test the snapshots taken on demand. """
+        import os
+        from supvisors.utils import StatisticsFrames
+        self.collector.set_processes([('myself', os.getpid())])
+        self.collector.sample()
+        self.collector.sample()
+        self.assertListEqual([(StatisticsFrames.KEYFRAME, 0), (StatisticsFrames.DELTA, 0)],
+            [publication[:2] for publication in self.publications])
+        self.assertListEqual(['myself'], self.publications[0][2][4].keys())
+        self.assertEqual(2, self.collector.counters.samples)
+        self.assertGreater(self.collector.counters.last_duration, 0)
+        # a failure is counted and nothing is published
+        self.collector.set_processes(None)
+        self.collector.sample()
+        self.assertEqual(2, len(self.publications))
+        self.assertEqual(1, self.collector.counters.errors)
+
+    def test_run(self):
+        """ Test the periodic sampling in the thread. """
+        import time
+        self.collector.start()
+        time.sleep(0.55)
+        self.collector.stop()
+        self.assertFalse(self.collector.is_alive())
+        self.assertGreaterEqual(len(self.publications), 4)
+        self.assertLessEqual(len(self.publications), 6)
+        self.assertEqual(len(self.publications), self.collector.counters.samples)
+
+    def test_skipped(self):
+        """ Test that the dates missed by a long sampling are skipped. """
+        import time
+        self.collector.callback = lambda publication: time.sleep(0.25)
+        self.collector.start()
+        time.sleep(0.5)
+        self.collector.stop()
+        self.assertGreaterEqual(self.collector.counters.skipped, 2)
+
+
 
 
 def test_suite():
@@ -17,6 +17,7 @@
 # limitations under the License.
 # ======================================================================
 
+import json
 import os
 import psutil
 import sys
@@ -85,7 +86,14 @@ class ZmqSocketTest(unittest.TestCase):
         subscriber = InternalEventSubscriber(self.zmq_context, self.supvisors)
         # check that the ZMQ sockets are ready
         self.assertFalse(publisher.socket.closed)
+        self.assertFalse(publisher.stats_socket.closed)
         self.assertFalse(subscriber.socket.closed)
+        self.assertFalse(subscriber.stats_socket.closed)
+        # check the high-water marks
+        self.assertEqual(self.supvisors.options.internal_hwm, publisher.socket.getsockopt(zmq.SNDHWM))
+        self.assertEqual(self.supvisors.options.stats_hwm, publisher.stats_socket.getsockopt(zmq.SNDHWM))
+        self.assertEqual(self.supvisors.options.internal_hwm, subscriber.socket.getsockopt(zmq.RCVHWM))
+        self.assertEqual(self.supvisors.options.stats_hwm, subscriber.stats_socket.getsockopt(zmq.RCVHWM))
         # keep pid
         pid = os.getpid()
         # check the TCP connections
@@ -118,7 +126,9 @@ class ZmqSocketTest(unittest.TestCase):
         subscriber.close()
         # check that the ZMQ socket are closed
         self.assertTrue(publisher.socket.closed)
+        self.assertTrue(publisher.stats_socket.closed)
         self.assertTrue(subscriber.socket.closed)
+        self.assertTrue(subscriber.stats_socket.closed)
         # check that the TCP socket is closed
         listen, laddr, raddr = get_connections(port)
         self.assertFalse(listen)
@@ -209,6 +219,7 @@ class InternalEventTest(unittest.TestCase):
         # socket configuration is meant to be blocking
         # however, a failure would block the unit test, so a timeout is set for reception
         self.subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
+        self.subscriber.stats_socket.setsockopt(zmq.RCVTIMEO, 1000)
         # publisher does not wait for subscriber clients to work, so give some time for connections
         time.sleep(1)
 
@@ -227,6 +238,14 @@ class InternalEventTest(unittest.TestCase):
         except zmq.Again:
             self.fail('Failed to get {} event'. format(event_type))
 
+    def receive_statistics(self):
+        """ This method performs a checked reception of statistics on the subscriber. """
+        from supvisors.codec import decode_event
+        try:
+            return decode_event(self.subscriber.receive_statistics())
+        except zmq.Again:
+            self.fail('Failed to get Statistics event')
+
     def test_disconnection(self):
         """ Test the disconnection of subscribers. """
         from supvisors.utils import InternalEventHeaders
@@ -236,7 +255,7 @@ class InternalEventTest(unittest.TestCase):
         address = next(address for address in self.supvisors.address_mapper.addresses if address != local_address)
         self.subscriber.disconnect([address])
         # send a tick event from the local publisher
-        payload = {'date': 1000}
+        payload = {'when': 1000}
         self.publisher.send_tick_event(payload)
         # check the reception of the tick event
         msg = self.receive('Tick')
@@ -255,7 +274,7 @@ class InternalEventTest(unittest.TestCase):
         # get the local address
         local_address = self.supvisors.address_mapper.local_address
         # send a tick event
-        payload = {'date': 1000}
+        payload = {'when': 1000}
         self.publisher.send_tick_event(payload)
         # check the reception of the tick event
         msg = self.receive('Tick')
@@ -267,7 +286,8 @@ class InternalEventTest(unittest.TestCase):
         # get the local address
         local_address = self.supvisors.address_mapper.local_address
         # send a process event
-        payload = {'name': 'dummy_program', 'state': 'running'}
+        payload = {'processname': 'dummy_program', 'groupname': 'dummy_group', 'state': 20,
+            'now': 1000, 'pid': 1234, 'expected': True}
         self.publisher.send_process_event(payload)
         # check the reception of the process event
         msg = self.receive('Process')
@@ -275,15 +295,50 @@ class InternalEventTest(unittest.TestCase):
 
     def test_statistics(self):
         """ Test the publication and subscription of the statistics messages. """
-        from supvisors.utils import InternalEventHeaders
+        from supvisors.utils import InternalEventHeaders, StatisticsFrames
         # get the local address
         local_address = self.supvisors.address_mapper.local_address
         # send a statistics event
-        payload = {'cpu': 15, 'mem': 5, 'io': (1234, 4321)}
+        payload = (StatisticsFrames.KEYFRAME, 0, (8.5, [(25, 400), (25, 125)], 76.1,
+            {'eth0': (1024, 2000), 'lo': (500, 500)}, {'dummy_group:dummy_program': (118612, (0.15, 1.85))}))
+        self.publisher.send_statistics(payload)
+        # check the reception of the statistics event, on the dedicated socket
+        msg = self.receive_statistics()
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS, local_address), msg[:2])
+        self.assertEqual(payload, msg[2])
+        # statistics are not received on the socket used for the other events
+        with self.assertRaises(zmq.Again):
+            self.subscriber.receive(zmq.NOBLOCK)
+
+    def test_statistics_filtering(self):
+        """ Test the filtering of the statistics messages according to the stats_addresses option. """
+        from supvisors.supvisorszmq import InternalEventSubscriber
+        from supvisors.utils import InternalEventHeaders, StatisticsFrames
+        local_address = self.supvisors.address_mapper.local_address
+        payload = (StatisticsFrames.KEYFRAME, 0, (8.5, [(25, 400)], 76.1, {}, {}))
+        # replace the subscriber with one that does not select the local address
+        self.subscriber.close()
+        self.supvisors.options.stats_addresses = ['10.0.0.1']
+        self.subscriber = InternalEventSubscriber(self.zmq_context, self.supvisors)
+        self.subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
+        self.subscriber.stats_socket.setsockopt(zmq.RCVTIMEO, 1000)
+        time.sleep(1)
+        # the statistics are filtered whereas the tick is received
         self.publisher.send_statistics(payload)
-        # check the reception of the statistics event
-        msg = self.receive('Statistics')
-        self.assertTupleEqual((InternalEventHeaders.STATISTICS, local_address, payload), msg)
+        self.publisher.send_tick_event({'when': 1000})
+        msg = self.receive('Tick')
+        self.assertTupleEqual((InternalEventHeaders.TICK, local_address, {'when': 1000}), msg)
+        with self.assertRaises(zmq.Again):
+            self.subscriber.receive_statistics(zmq.NOBLOCK)
+        # select the local address
+        self.subscriber.close()
+        self.supvisors.options.stats_addresses = [local_address]
+        self.subscriber = InternalEventSubscriber(self.zmq_context, self.supvisors)
+        self.subscriber.stats_socket.setsockopt(zmq.RCVTIMEO, 1000)
+        time.sleep(1)
+        self.publisher.send_statistics(payload)
+        msg = self.receive_statistics()
+        self.assertTupleEqual((InternalEventHeaders.STATISTICS, local_address), msg[:2])
 
 
 class RequestTest(unittest.TestCase):
@@ -368,6 +423,8 @@ class Payload:
         self.data = data
     def serial(self):
         return self.data 
+    def namespec(self):
+        return self.data.get('process_name')
 
 
 class EventTest(unittest.TestCase):
@@ -390,8 +447,11 @@ class EventTest(unittest.TestCase):
         self.subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
         # create test payloads
         self.supvisors_payload = Payload({'state': 'running', 'version': '1.0'})
-        self.address_payload = Payload({'state': 'silent', 'name': 'cliche01', 'date': 1234})
-        self.application_payload = Payload({'state': 'starting', 'name': 'supvisors'})
+        from supvisors.address import AddressStatus
+        self.address_payload = AddressStatus('cliche01', self.supvisors.logger)
+        self.address_payload.update_times(1234, 1250)
+        from supvisors.application import ApplicationStatus
+        self.application_payload = ApplicationStatus('supvisors', self.supvisors.logger)
         self.process_payload = Payload({'state': 'running', 'process_name': 'plugin',
             'application_name': 'supvisors', 'date': 1230})
 
@@ -407,7 +467,7 @@ class EventTest(unittest.TestCase):
                 msg = self.subscriber.receive()
             except zmq.Again:
                 self.fail('Failed to get {} status'.format(header))
-            self.assertTupleEqual((header, data), msg)
+            self.assertTupleEqual((header, data), (msg[0], msg[2]))
         else:
             # check the non-reception of the Supvisors status
             with self.assertRaises(zmq.Again):
@@ -429,7 +489,7 @@ class EventTest(unittest.TestCase):
         from supvisors.utils import EventHeaders
         self.publisher.send_address_status(self.address_payload)
         if subscribed:
-            self.check_reception(EventHeaders.ADDRESS, self.address_payload.data)
+            self.check_reception(EventHeaders.ADDRESS, self.address_payload.serial())
         else:
             self.check_reception()
 
@@ -437,9 +497,11 @@ class EventTest(unittest.TestCase):
         """ The method tests the emission and reception of an Application status,
         depending on the subscription status. """
         from supvisors.utils import EventHeaders
+        # change the status as unchanged application status are not published
+        self.application_payload.minor_failure = not self.application_payload.minor_failure
         self.publisher.send_application_status(self.application_payload)
         if subscribed:
-            self.check_reception(EventHeaders.APPLICATION, self.application_payload.data)
+            self.check_reception(EventHeaders.APPLICATION, self.application_payload.serial())
         else:
             self.check_reception()
 
@@ -458,6 +520,13 @@ class EventTest(unittest.TestCase):
         """ The method tests the emission and reception of all status,
         depending on their subscription status. """
         time.sleep(1)
+        # the status deferred while not subscribed are published upon subscription
+        self.publisher.update_subscriptions()
+        try:
+            while True:
+                self.subscriber.receive()
+        except zmq.Again:
+            pass
         self.check_supvisors_status(supvisors_subscribed)
         self.check_address_status(address_subscribed)
         self.check_application_status(application_subscribed)
@@ -504,6 +573,307 @@ class EventTest(unittest.TestCase):
         self.subscriber.unsubscribe_process_status()
         self.check_subscription(False, False, False, False)
 
+    def test_sequences(self):
+        """ Test the sequence numbers of the events, incremented per header. """
+        from supvisors.utils import EventHeaders
+        self.subscriber.subscribe_all()
+        time.sleep(1)
+        for sequence in range(1, 3):
+            self.publisher.send_supvisors_status(self.supvisors_payload)
+            self.publisher.send_process_status(self.process_payload)
+            self.assertTupleEqual((EventHeaders.SUPVISORS, sequence, self.supvisors_payload.data),
+                self.subscriber.receive())
+            self.assertTupleEqual((EventHeaders.PROCESS, sequence, self.process_payload.data),
+                self.subscriber.receive())
+        self.assertDictEqual({EventHeaders.SUPVISORS: 2, EventHeaders.PROCESS: 2}, self.publisher.sequences)
+
+    def test_snapshot(self):
+        """ Test the snapshot of the last values published. """
+        from threading import Thread
+        from supvisors.supvisorszmq import EventSubscriber, SnapshotServer
+        from supvisors.utils import EventHeaders
+        server = SnapshotServer(self.zmq_context, self.publisher, self.supvisors)
+        subscriber = EventSubscriber(self.zmq_context, self.supvisors.options.event_port, self.supvisors.logger,
+            self.supvisors.options.snapshot_port)
+        subscriber.subscribe_all()
+        time.sleep(1)
+        # publish the same entities several times
+        self.publisher.send_supvisors_status(self.supvisors_payload)
+        self.publisher.send_address_status(self.address_payload)
+        self.publisher.send_process_status(self.process_payload)
+        self.address_payload.update_times(1240, 1255)
+        self.publisher.send_address_status(self.address_payload)
+        # the snapshot includes the last value of each entity and the sequence numbers
+        thread = Thread(target=server.serve)
+        thread.start()
+        sequences, entries = subscriber.snapshot(2000)
+        thread.join()
+        self.assertDictEqual({EventHeaders.SUPVISORS: 1, EventHeaders.ADDRESS: 2, EventHeaders.PROCESS: 1}, sequences)
+        self.assertListEqual([(EventHeaders.SUPVISORS, self.supvisors_payload.data),
+            (EventHeaders.ADDRESS, self.address_payload.serial()),
+            (EventHeaders.PROCESS, self.process_payload.data)], entries)
+        # no snapshot without reply
+        self.assertIsNone(subscriber.snapshot(100))
+        # the reply to the outdated request is discarded
+        thread = Thread(target=server.serve)
+        thread.start()
+        self.assertIsNone(subscriber.snapshot(100))
+        thread.join()
+        # no snapshot without snapshot port
+        self.assertIsNone(self.subscriber.snapshot(100))
+        subscriber.close()
+        server.close()
+
+    def test_snapshot_deferred(self):
+        """ Test that the snapshot includes the status deferred before any subscription. """
+        from threading import Thread
+        from supvisors.supvisorszmq import EventSubscriber, SnapshotServer
+        from supvisors.utils import EventHeaders
+        server = SnapshotServer(self.zmq_context, self.publisher, self.supvisors)
+        # nothing is subscribed so the publications are deferred
+        self.publisher.send_supvisors_status(self.supvisors_payload)
+        self.publisher.send_address_status(self.address_payload)
+        self.publisher.send_process_status(self.process_payload)
+        self.assertEqual(3, len(self.publisher.pending))
+        # subscribe and request a snapshot before any other publication
+        subscriber = EventSubscriber(self.zmq_context, self.supvisors.options.event_port, self.supvisors.logger,
+            self.supvisors.options.snapshot_port)
+        subscriber.subscribe_all()
+        time.sleep(1)
+        thread = Thread(target=server.serve)
+        thread.start()
+        sequences, entries = subscriber.snapshot(2000)
+        thread.join()
+        self.assertDictEqual({}, sequences)
+        self.assertListEqual([(EventHeaders.SUPVISORS, self.supvisors_payload.data),
+            (EventHeaders.ADDRESS, self.address_payload.serial()),
+            (EventHeaders.PROCESS, self.process_payload.data)], entries)
+        # same for a client that only requests snapshots
+        snapshot_client = EventSubscriber(self.zmq_context, self.supvisors.options.event_port,
+            self.supvisors.logger, self.supvisors.options.snapshot_port)
+        thread = Thread(target=server.serve)
+        thread.start()
+        self.assertEqual(3, len(snapshot_client.snapshot(2000)[1]))
+        thread.join()
+        snapshot_client.close()
+        subscriber.close()
+        server.close()
+
+    def test_replay(self):
+        """ Test the replay of the last events published. """
+        from threading import Thread
+        from supvisors.supvisorszmq import EventSubscriber, SnapshotServer
+        from supvisors.utils import EventHeaders
+        server = SnapshotServer(self.zmq_context, self.publisher, self.supvisors)
+        subscriber = EventSubscriber(self.zmq_context, self.supvisors.options.event_port, self.supvisors.logger,
+            self.supvisors.options.snapshot_port)
+        subscriber.subscribe_all()
+        time.sleep(1)
+        self.publisher.update_subscriptions()
+        for process_name in ['xclock', 'xfontsel', 'xlogo']:
+            self.process_payload.data['process_name'] = process_name
+            self.publisher.send_process_status(self.process_payload)
+            self.publisher.send_supvisors_status(self.supvisors_payload)
+        # the events published after the sequence numbers are replayed in order of publication
+        thread = Thread(target=server.serve)
+        thread.start()
+        events = subscriber.replay({EventHeaders.PROCESS: 1, EventHeaders.SUPVISORS: 2}, 2000)
+        thread.join()
+        self.assertListEqual([(EventHeaders.PROCESS, 2, dict(self.process_payload.data, process_name='xfontsel')),
+            (EventHeaders.PROCESS, 3, self.process_payload.data),
+            (EventHeaders.SUPVISORS, 3, self.supvisors_payload.data)], events)
+        # nothing to replay
+        thread = Thread(target=server.serve)
+        thread.start()
+        self.assertListEqual([], subscriber.replay({EventHeaders.PROCESS: 3}, 2000))
+        thread.join()
+        # the buffer is limited in size, so the oldest events are not available anymore
+        self.assertEqual(6, len(self.publisher.replay_buffer))
+        self.supvisors.options.event_replay_size = self.publisher.replay_bytes
+        self.publisher.send_supvisors_status(self.supvisors_payload)
+        self.assertEqual(6, len(self.publisher.replay_buffer))
+        self.assertDictEqual({EventHeaders.PROCESS: 1}, self.publisher.replay_dropped)
+        thread = Thread(target=server.serve)
+        thread.start()
+        self.assertIsNone(subscriber.replay({EventHeaders.PROCESS: 0}, 2000))
+        thread.join()
+        self.assertListEqual(['1', EventHeaders.PROCESS.encode('utf-8'), '3', json.dumps(self.process_payload.data)],
+            self.publisher.replay({EventHeaders.PROCESS: 2}))
+        # no replay without snapshot port
+        self.assertIsNone(self.subscriber.replay({EventHeaders.PROCESS: 1}, 100))
+        subscriber.close()
+        server.close()
+
+    def test_compact(self):
+        """ Test the publication and the reception of the compact events. """
+        from supvisors.supvisorszmq import EventSubscriber
+        from supvisors.utils import EventHeaders
+        subscriber = EventSubscriber(self.zmq_context, self.supvisors.options.compact_event_port,
+            self.supvisors.logger, compact=True)
+        subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
+        subscriber.subscribe_process_status()
+        self.subscriber.subscribe_process_status()
+        time.sleep(1)
+        self.publisher.update_subscriptions()
+        self.assertTupleEqual((True, True), self.publisher.formats(EventHeaders.PROCESS))
+        self.assertTupleEqual((False, False), self.publisher.formats(EventHeaders.ADDRESS))
+        payloads = [Payload({'application_name': 'sample', 'process_name': process_name, 'statecode': 20,
+                'statename': 'RUNNING', 'expected_exit': True, 'last_event_time': 1234, 'addresses': ['10.0.0.1']})
+            for process_name in ['xclock', 'xfontsel', 'xlogo']]
+        for payload in payloads:
+            self.publisher.send_process_status(payload)
+        # the JSON events are sent immediately
+        for sequence, payload in enumerate(payloads, 1):
+            self.assertTupleEqual((EventHeaders.PROCESS, sequence, payload.data), self.subscriber.receive())
+        # the compact events are batched until the flush, then decoded into the same serial forms
+        self.assertFalse(subscriber.ready())
+        self.publisher.flush()
+        for sequence, payload in enumerate(payloads, 1):
+            self.assertTupleEqual((EventHeaders.PROCESS, sequence, payload.data), subscriber.receive())
+            self.assertEqual(sequence < 3, subscriber.ready())
+        self.assertDictEqual({}, self.publisher.compact_batches)
+        # the JSON subscriber does not receive the compact events
+        with self.assertRaises(zmq.Again):
+            self.subscriber.receive()
+        # a batch is sent when the sequence numbers are not consecutive anymore
+        self.publisher.send_process_status(payloads[0])
+        self.publisher.sequences[EventHeaders.PROCESS] += 1
+        self.publisher.send_process_status(payloads[1])
+        self.publisher.flush()
+        self.assertTupleEqual((EventHeaders.PROCESS, 4, payloads[0].data), subscriber.receive())
+        self.assertTupleEqual((EventHeaders.PROCESS, 6, payloads[1].data), subscriber.receive())
+        subscriber.close()
+
+    def test_compact_and_json(self):
+        """ Test that the JSON and the compact clients connected at the same time receive every event once. """
+        from supvisors.supvisorszmq import EventSubscriber
+        from supvisors.utils import EventHeaders
+        subscriber = EventSubscriber(self.zmq_context, self.supvisors.options.compact_event_port,
+            self.supvisors.logger, compact=True)
+        subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
+        subscriber.subscribe_all()
+        self.subscriber.subscribe_all()
+        time.sleep(1)
+        self.publisher.update_subscriptions()
+        self.assertSetEqual({''}, self.publisher.topics)
+        self.assertSetEqual({'~'}, self.publisher.compact_topics)
+        payloads = [Payload({'application_name': 'sample', 'process_name': process_name, 'statecode': 20,
+                'statename': 'RUNNING', 'expected_exit': True, 'last_event_time': 1234, 'addresses': ['10.0.0.1']})
+            for process_name in ['xclock', 'xfontsel']]
+        for payload in payloads:
+            self.publisher.send_process_status(payload)
+        self.publisher.flush()
+        for client in [self.subscriber, subscriber]:
+            for sequence, payload in enumerate(payloads, 1):
+                self.assertTupleEqual((EventHeaders.PROCESS, sequence, payload.data), client.receive())
+            with self.assertRaises(zmq.Again):
+                client.receive()
+        subscriber.close()
+
+    def test_unexpected_format(self):
+        """ Test that the events that are not in the format of the subscriber are discarded. """
+        from supvisors.supvisorszmq import EventSubscriber
+        from supvisors.utils import EventHeaders
+        # a JSON subscriber connected to the compact event port
+        subscriber = EventSubscriber(self.zmq_context, self.supvisors.options.compact_event_port,
+            self.supvisors.logger)
+        subscriber.socket.setsockopt(zmq.RCVTIMEO, 1000)
+        subscriber.socket.setsockopt(zmq.SUBSCRIBE, '')
+        time.sleep(1)
+        self.publisher.update_subscriptions()
+        self.publisher.send_process_status(Payload({'application_name': 'sample', 'process_name': 'xclock',
+            'statecode': 20, 'statename': 'RUNNING', 'expected_exit': True, 'last_event_time': 1234,
+            'addresses': ['10.0.0.1']}))
+        self.publisher.flush()
+        with self.assertRaises(zmq.Again):
+            subscriber.receive()
+        self.assertIn(('debug', 'discard event ~process in unexpected format'), self.supvisors.logger.messages)
+        subscriber.close()
+
+    def test_lazy_publication(self):
+        """ Test that the events are not published while nothing is subscribed to them. """
+        from supvisors.utils import EventHeaders
+        self.publisher.send_process_status(self.process_payload)
+        self.publisher.send_process_status(self.process_payload)
+        self.assertDictEqual({EventHeaders.PROCESS: {'published': 0, 'bytes': 0, 'skipped': 2}},
+            self.publisher.counters.serial())
+        self.assertListEqual([(EventHeaders.PROCESS, 'plugin')], self.publisher.pending.keys())
+        self.assertDictEqual({}, self.publisher.sequences)
+        self.assertFalse(self.publisher.replay_buffer)
+        # the status is kept for the snapshots
+        self.assertDictEqual({(EventHeaders.PROCESS, 'plugin'): json.dumps(self.process_payload.data)},
+            self.publisher.last_values)
+        # the pending status is published on subscription
+        self.subscriber.subscribe_process_status()
+        time.sleep(1)
+        self.publisher.update_subscriptions()
+        self.assertTrue(self.publisher.subscribed(EventHeaders.PROCESS))
+        self.assertFalse(self.publisher.subscribed(EventHeaders.APPLICATION))
+        self.check_reception(EventHeaders.PROCESS, self.process_payload.data)
+        self.assertDictEqual({}, self.publisher.pending)
+        counters = self.publisher.counters.serial()[EventHeaders.PROCESS]
+        self.assertEqual(1, counters['published'])
+        self.assertGreater(counters['bytes'], 0)
+        # the publication is skipped again after unsubscription
+        self.subscriber.unsubscribe_process_status()
+        time.sleep(1)
+        self.publisher.send_process_status(self.process_payload)
+        self.assertEqual(3, self.publisher.counters.serial()[EventHeaders.PROCESS]['skipped'])
+
+    def test_unchanged_application_status(self):
+        """ Test that an unchanged Application status is not published again. """
+        from supvisors.utils import EventHeaders
+        self.subscriber.subscribe_application_status()
+        time.sleep(1)
+        self.check_application_status(True)
+        self.publisher.send_application_status(self.application_payload)
+        self.check_reception()
+
+    def test_heartbeat(self):
+        """ Test the replacement of an unchanged Address status by a heartbeat. """
+        from supvisors.ttypes import AddressStates
+        from supvisors.utils import EventHeaders
+        self.subscriber.subscribe_address_status()
+        self.subscriber.subscribe_heartbeat()
+        time.sleep(1)
+        # without the option, the Address status is always published
+        self.check_address_status(True)
+        self.check_address_status(True)
+        # with the option, an unchanged Address status is replaced by a heartbeat
+        self.supvisors.options.event_heartbeat = True
+        self.address_payload.update_times(1239, 1255)
+        self.publisher.send_address_status(self.address_payload)
+        self.check_reception(EventHeaders.HEARTBEAT, {'address_name': 'cliche01',
+            'remote_time': 1239, 'local_time': 1255})
+        # a new version is published in full
+        self.address_payload.state = AddressStates.CHECKING
+        self.check_address_status(True)
+        # heartbeat not received without subscription
+        self.subscriber.unsubscribe_heartbeat()
+        time.sleep(1)
+        self.publisher.send_address_status(self.address_payload)
+        self.check_reception()
+
+    def test_heartbeat_replay(self):
+        """ Test that the heartbeats are not kept for replay but update the times of the last value. """
+        from supvisors.utils import EventHeaders
+        self.subscriber.subscribe_all()
+        time.sleep(1)
+        self.supvisors.options.event_heartbeat = True
+        self.publisher.send_address_status(self.address_payload)
+        replay_buffer = list(self.publisher.replay_buffer)
+        replay_bytes = self.publisher.replay_bytes
+        for remote_time in range(1240, 1250):
+            self.address_payload.update_times(remote_time, remote_time + 20)
+            self.publisher.send_address_status(self.address_payload)
+        self.assertDictEqual({EventHeaders.ADDRESS: 1, EventHeaders.HEARTBEAT: 10}, self.publisher.sequences)
+        self.assertListEqual(replay_buffer, list(self.publisher.replay_buffer))
+        self.assertEqual(replay_bytes, self.publisher.replay_bytes)
+        self.assertListEqual([(EventHeaders.ADDRESS, 'cliche01')], self.publisher.last_values.keys())
+        self.assertDictEqual(self.address_payload.serial(),
+            json.loads(self.publisher.last_values[EventHeaders.ADDRESS, 'cliche01']))
+        self.assertEqual(1249, json.loads(self.publisher.last_values[EventHeaders.ADDRESS, 'cliche01'])['remote_time'])
+
     def test_subscription_all_status(self):
         """ Test the reception of all status messages when related subscription is set. """
         # subscribe to every status
@@ -542,7 +912,7 @@ class SupvisorsZmqTest(unittest.TestCase):
 
     def test_creation_closure(self):
         """ Test the types of the attributes created. """
-        from supvisors.supvisorszmq import (SupvisorsZmq, EventPublisher,
+        from supvisors.supvisorszmq import (SupvisorsZmq, EventPublisher, SnapshotServer,
             InternalEventSubscriber, InternalEventPublisher, RequestPuller, RequestPusher)
         sockets = SupvisorsZmq(self.supvisors)
         # test all attribute types
@@ -550,6 +920,8 @@ class SupvisorsZmqTest(unittest.TestCase):
         self.assertFalse(sockets.zmq_context.closed)
         self.assertIsInstance(sockets.publisher, EventPublisher)
         self.assertFalse(sockets.publisher.socket.closed)
+        self.assertIsInstance(sockets.snapshot_server, SnapshotServer)
+        self.assertFalse(sockets.snapshot_server.socket.closed)
         self.assertIsInstance(sockets.internal_subscriber, InternalEventSubscriber)
         self.assertFalse(sockets.internal_subscriber.socket.closed)
         self.assertIsInstance(sockets.internal_publisher, InternalEventPublisher)
@@ -562,6 +934,7 @@ class SupvisorsZmqTest(unittest.TestCase):
         sockets.close()
         self.assertTrue(sockets.zmq_context.closed)
         self.assertTrue(sockets.publisher.socket.closed)
+        self.assertTrue(sockets.snapshot_server.socket.closed)
         self.assertTrue(sockets.internal_subscriber.socket.closed)
         self.assertTrue(sockets.internal_publisher.socket.closed)
         self.assertTrue(sockets.puller.socket.closed)
@@ -25,12 +25,18 @@ class InternalEventHeaders:
     """ Enumeration class for the headers in messages between Listener and MainLoop. """
     TICK, PROCESS, STATISTICS = range(3)
 
+class StatisticsFrames:
+    """ Enumeration class for the kinds of statistics publication between Listener and MainLoop. """
+    KEYFRAME, DELTA = range(2)
+
 class RemoteCommEvents:
-    """ Strings used for remote communication between the Supvisors main loop and the listener. """
+    """ Strings used for the in-process communication between the Supvisors main loop and the listener. """
     SUPVISORS_AUTH = u'auth'
     SUPVISORS_EVENT = u'event'
     SUPVISORS_INFO = u'info'
+    SUPVISORS_RESULT = u'result'
     SUPVISORS_TASK = u'task'
+    SUPVISORS_STATISTICS = u'statistics'
 
 class EventHeaders:
     """ Strings used as headers in messages between EventPublisher and Supvisors' Client. """
@@ -38,14 +44,16 @@ class EventHeaders:
     ADDRESS = u'address'
     APPLICATION = u'application'
     PROCESS = u'process'
+    HEARTBEAT = u'heartbeat'
 
 
 # for deferred XML-RPC requests
 IPC_NAME = '/tmp/supvisors-ipc'
 
 class DeferredRequestHeaders:
-    """ Enumeration class for the headers of deferred XML-RPC messages sent to MainLoop."""
-    CHECK_ADDRESS, ISOLATE_ADDRESSES, START_PROCESS, STOP_PROCESS, RESTART, SHUTDOWN = range(6)
+    """ Enumeration class for the headers of deferred XML-RPC messages sent to MainLoop.
+    MULTICALL is internal to MainLoop and stands for START_PROCESS / STOP_PROCESS requests coalesced per address. """
+    CHECK_ADDRESS, ISOLATE_ADDRESSES, START_PROCESS, STOP_PROCESS, RESTART, SHUTDOWN, MULTICALL = range(7)
 
 
 # used to convert enumeration-like value to string and vice-versa
@@ -142,7 +150,10 @@ def get_stats(lst):
     - the mean value,
     - the instant rate between the two last values,
     - the coefficients of the linear regression,
-    - the standard deviation, """
+    - the standard deviation.
+    A series able to compute its own statistics (see statistics.SeriesTable) is delegated to. """
+    if hasattr(lst, 'get_stats'):
+        return lst.get_stats()
     rate, a, b, dev = (None, )*4
     # calculate mean value
     avg = mean(lst)